@@ -1,3 +1,4 @@
 from .user import User
 from .event import Event
-from .comment import Comment
\ No newline at end of file
+from .comment import Comment
+from .change import Change, ChangeCompaction
\ No newline at end of file
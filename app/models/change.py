@@ -0,0 +1,30 @@
+from app.services import Base
+from app.services.database import utcnow
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Index, false
+
+
+class Change(Base):
+    __tablename__ = 'changes'
+    __table_args__ = (
+        # Compaction looks for a later entry of the same entity.
+        Index('ix_changes_entity_entity_id_id', 'entity', 'entity_id', 'id'),
+        # Compaction finds the tombstones past their retention.
+        Index('ix_changes_deleted_changed_at', 'deleted', 'changed_at'),
+        # Token values are never reused, even after the latest entries were compacted away.
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True)  # The change token
+    entity = Column(String(16), nullable=False)  # See app.schemas.sync.ChangeEntity
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False, server_default=false())  # A tombstone
+    changed_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+class ChangeCompaction(Base):
+    __tablename__ = 'change_compactions'
+
+    id = Column(Integer, primary_key=True)
+    compacted_at = Column(DateTime, nullable=False, default=utcnow)
+    # Tombstones up to this token were purged; older tokens can no longer be synced from. Only the latest row is kept.
+    horizon = Column(Integer, nullable=False, default=0, server_default="0")
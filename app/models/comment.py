@@ -1,19 +1,22 @@
-from app.services import Base, engine
-from sqlalchemy import Column, Integer, String, ForeignKey
+from app.services import Base
+from app.services.database import utcnow
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 
 
 class Comment(Base):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # Serves comment listings (event_id = ? ORDER BY id) and event cascade deletes.
+        Index('ix_comments_event_id_id', 'event_id', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     content = Column(String, nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     event_id = Column(Integer, ForeignKey('events.id'))
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
 
     # Relationships
     author = relationship("User", back_populates="comments")  # Many Comments are authored by one User
     event = relationship("Event", back_populates="comments")  # Many Comments belong to one Event
-
-
-#Base.metadata.create_all(engine)
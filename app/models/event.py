@@ -1,10 +1,22 @@
-from app.services import Base, engine
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from app.services import Base
+from app.services.database import utcnow
+from app.services.search import attach_search_index
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Index, func
 from sqlalchemy.orm import relationship
 
 
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (
+        # Time window, location and creator filters, each ordered by (date_time, id) for keyset pagination.
+        Index('ix_events_date_time_id', 'date_time', 'id'),
+        Index('ix_events_location_date_time_id', 'location', 'date_time', 'id'),
+        Index('ix_events_creator_id_date_time_id', 'creator_id', 'date_time', 'id'),
+        # Radius queries scan geo_cell ranges and check the bounding box on the index entries.
+        Index('ix_events_geo_cell', 'geo_cell', 'latitude', 'longitude'),
+        # sort=popular walks this index backwards.
+        Index('ix_events_comment_count_activity_id', 'comment_count', 'last_activity_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
@@ -12,10 +24,18 @@ class Event(Base):
     date_time = Column(DateTime, nullable=False)
     location = Column(String, nullable=False)
     creator_id = Column(Integer, ForeignKey('users.id'))
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geo_cell = Column(Integer, nullable=True)  # Grid cell of (latitude, longitude), see app.services.geo
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
+    # Maintained by every write to comments, see crud_event.adjust_comment_counts
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, nullable=False, default=utcnow, server_default=func.now())
 
     # Relationships
     creator = relationship("User", back_populates="events")  # Many Events are created by one User
-    comments = relationship("Comment", back_populates="event",
+    comments = relationship("Comment", back_populates="event", order_by="Comment.id",
                             cascade="all, delete-orphan")  # One Event can have many Comments
 
-# Base.metadata.create_all(engine)
+
+attach_search_index(Event.__table__)
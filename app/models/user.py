@@ -1,4 +1,4 @@
-from app.services import Base, engine
+from app.services import Base
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import relationship
 
@@ -10,9 +10,8 @@ class User(Base):
     username = Column(String(100), unique=True, nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     hashed_password = Column(String(256), nullable=False)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped to revoke issued tokens
 
     # Relationships
     events = relationship("Event", back_populates="creator", cascade="all, delete-orphan")  # One User can create many Events
     comments = relationship("Comment", back_populates="author", cascade="all, delete-orphan")  # One User can author many Comments
-
-#Base.metadata.create_all(engine)
@@ -1,3 +1,5 @@
 from .user_routes import *
 from .event_routes import *
-from .comment_routes import *
\ No newline at end of file
+from .comment_routes import *
+from .export_routes import *
+from .sync_routes import *
\ No newline at end of file
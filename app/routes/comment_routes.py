@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import app.schemas.comment as comment_schemas
-from app.schemas.user import UserInDB
-from app.services import crud_comment, authentication, database
+from app.schemas.bulk import BulkCreate, BulkCreateResult
+from app.schemas.user import UserIdentity
+from app.services import bulk, crud_comment, crud_event, authentication, conditional, database, projection
+from app.services.pubsub import TooManySubscribers, comment_hub
 from app.models.comment import Comment
+from app.services.pagination import MAX_PAGE_SIZE
 
 
 
@@ -16,7 +21,7 @@ router = APIRouter(
 
 
 @router.post("/", response_model=comment_schemas.Comment)
-async def create_comment_for_event(comment: comment_schemas.CommentCreate, db: Session = Depends(database.get_db), current_user: UserInDB = Depends(authentication.get_current_user)):
+async def create_comment_for_event(comment: comment_schemas.CommentCreate, db: AsyncSession = Depends(database.get_db), current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
         Create a new comment for a specific event.
 
@@ -25,34 +30,166 @@ async def create_comment_for_event(comment: comment_schemas.CommentCreate, db: S
 
         Args:
             comment (CommentCreate): The content of the comment to be created, along with associated event ID.
-            db (Session, optional): The database session dependency.
-            current_user (UserInDB, optional): The current authenticated user's information.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
 
         Returns:
             Comment: The created Comment object as confirmation.
     """
-    return crud_comment.create_comment(db=db, comment=comment, user_id=current_user.id)
+    return await crud_comment.create_comment(db=db, comment=comment, user_id=current_user.id)
 
 
-@router.get("/event/{event_id}", response_model=List[comment_schemas.Comment])
-async def read_comments_for_event(event_id: int, db: Session = Depends(database.get_db)):
+@router.post("/bulk", response_model=BulkCreateResult)
+async def create_comments_bulk(batch: BulkCreate, db: AsyncSession = Depends(database.get_db), current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
-        Retrieve all comments associated with a specific event.
+        Create many comments at once.
 
-        This endpoint allows users to view all comments for a given event, identified by its ID.
+        Every item is validated on its own; the valid ones are written in a single transaction, while invalid items
+        and comments on events that don't exist are reported without failing the batch.
+
+        Args:
+            batch (BulkCreate): The comments to be created, each with the fields of ``CommentCreate``.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
+
+        Returns:
+            BulkCreateResult: The number of comments created and, for every item in order, its new ID or its errors.
+    """
+    valid, errors = bulk.validate_items(comment_schemas.CommentCreate, batch.items)
+    ids = await crud_comment.create_comments(db=db, comments=[comment for _, comment in valid],
+                                             user_id=current_user.id)
+    created = {}
+    for (index, _), comment_id in zip(valid, ids):
+        if comment_id is None:
+            errors[index] = ["event_id: Event not found"]
+        else:
+            created[index] = comment_id
+    return bulk.bulk_result(len(batch.items), created, errors)
+
+
+@router.get("/event/{event_id}", response_model=comment_schemas.CommentPage)
+async def read_comments_for_event(event_id: int, request: Request, after: Optional[str] = None,
+                                  limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                                  db: AsyncSession = Depends(database.get_read_db)):
+    """
+        Retrieve a page of the comments associated with a specific event.
+
+        This endpoint allows users to view the comments for a given event, identified by its ID, oldest first.
+        Pass the ``next_cursor`` of a page as ``after`` to fetch the following page.
+
+        The response carries ``ETag`` and ``Last-Modified`` headers. A request whose ``If-None-Match`` header
+        matches the current version gets an empty 304 response, decided without loading the comments.
+        ``If-Modified-Since`` is not honoured here: deleting a comment does not move the listing's
+        Last-Modified date.
 
         Args:
             event_id (int): The ID of the event for which to retrieve comments.
-            db (Session, optional): The database session dependency.
+            request (Request): The incoming request, for its conditional headers.
+            after (Optional[str], optional): The cursor returned with the previous page.
+            limit (int, optional): The maximum number of items to return.
+            db (AsyncSession, optional): The database session dependency.
 
         Returns:
-            List[Comment]: A list of all comments associated with the specified event.
+            CommentPage: The comments of the page and the cursor of the next page, if any.
+    """
+    count, last_id, last_updated = await crud_comment.get_comments_version_cached(db=db, event_id=event_id)
+    headers = conditional.validators(conditional.make_etag("comments", event_id, after, limit, count, last_id,
+                                                           last_updated), last_updated)
+    if conditional.is_not_modified(request, headers["ETag"]):
+        return conditional.not_modified(headers)
+
+    body = await crud_comment.get_comments_for_events_cached(db=db, event_id=event_id, after=after, limit=limit)
+    return projection.json_response(body, headers)
+
+
+async def _check_stream(event_id: int):
+    """
+        Refuse a comment stream for an event that doesn't exist, or when the worker holds too many streams.
+    """
+    # A short-lived session: the stream itself must not hold a database connection.
+    async with database.SessionLocal() as db:
+        if await crud_event.get_event_version_cached(db=db, event_id=event_id) is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+    if comment_hub.full:
+        raise HTTPException(status_code=503, detail="Too many streams, please retry shortly",
+                            headers={"Retry-After": "5"})
+
+
+async def _server_sent_events(event_id: int):
+    try:
+        async for data in comment_hub.stream(f"comments:{event_id}"):
+            yield ": keep-alive\n\n" if data is None else f"data: {data}\n\n"
+    except TooManySubscribers:
+        return
+
+
+@router.get("/event/{event_id}/stream", response_class=StreamingResponse)
+async def stream_comments_for_event(event_id: int):
+    """
+        Stream the comments created on and deleted from an event as Server-Sent Events.
+
+        Every event's ``data`` is a JSON message: ``stream.subscribed`` once the stream is live, then
+        ``{"type": "comment.created", "comment": {...}}`` and ``{"type": "comment.deleted", "comment": {"id": ...,
+        "event_id": ...}}``. To build a complete view, wait for ``stream.subscribed`` and then fetch
+        ``GET /comments/event/{event_id}``. A client that falls too far behind gets ``stream.evicted`` and the stream
+        ends; it should reconnect and fetch again. Idle streams carry a keep-alive comment every
+        ``PUBSUB_HEARTBEAT_SECONDS``. The same messages are served over a WebSocket at this path.
+
+        Args:
+            event_id (int): The ID of the event whose comments are streamed.
+
+        Raises:
+            HTTPException: 404 error if the event doesn't exist, 503 error if the worker holds too many streams.
+
+        Returns:
+            StreamingResponse: The ``text/event-stream`` response.
+    """
+    await _check_stream(event_id)
+    return StreamingResponse(_server_sent_events(event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/event/{event_id}/stream")
+async def stream_comments_for_event_websocket(websocket: WebSocket, event_id: int):
+    """
+        Stream the comments created on and deleted from an event over a WebSocket, one JSON text message each.
+
+        The messages are those of the Server-Sent Events stream, without keep-alives (the server pings WebSockets
+        itself). The connection is refused with code 1008 if the event doesn't exist and closed with code 1013
+        (try again later) when the worker holds too many streams or the client was evicted for falling behind.
+
+        Args:
+            websocket (WebSocket): The client connection.
+            event_id (int): The ID of the event whose comments are streamed.
     """
-    return crud_comment.get_comments_for_events(db=db, event_id=event_id)
+    try:
+        await _check_stream(event_id)
+    except HTTPException as error:
+        code = status.WS_1008_POLICY_VIOLATION if error.status_code == 404 else status.WS_1013_TRY_AGAIN_LATER
+        await websocket.close(code=code, reason=error.detail)
+        return
+    await websocket.accept()
+
+    async def forward():
+        try:
+            async for data in comment_hub.stream(f"comments:{event_id}"):
+                if data is not None:
+                    await websocket.send_text(data)
+        except TooManySubscribers:
+            pass
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    sender = asyncio.create_task(forward())
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass  # Clients have nothing to say; reading only notices when they leave.
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
 
 
 @router.delete("/{comment_id}")
-async def delete_comment(comment_id: int, db: Session = Depends(database.get_db), current_user: UserInDB = Depends(authentication.get_current_user)):
+async def delete_comment(comment_id: int, db: AsyncSession = Depends(database.get_db), current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
         Delete a specific comment.
 
@@ -61,8 +198,8 @@ async def delete_comment(comment_id: int, db: Session = Depends(database.get_db)
 
         Args:
             comment_id (int): The ID of the comment to be deleted.
-            db (Session, optional): The database session dependency.
-            current_user (UserInDB, optional): The current authenticated user's information.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
 
         Returns:
             dict: A confirmation message indicating successful deletion.
@@ -70,7 +207,7 @@ async def delete_comment(comment_id: int, db: Session = Depends(database.get_db)
         Raises:
             HTTPException: If the comment is not found or the user is not authorized to delete it.
     """
-    success = crud_comment.delete_comment(db=db, comment_id=comment_id, user_id=current_user.id)
+    success = await crud_comment.delete_comment(db=db, comment_id=comment_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Comment not fount or not authorized to delete")
     return {'message': "Comment deleted successfully"}
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from datetime import datetime
+from typing import List, Optional, Set
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import event as event_schemas
-from app.schemas.user import UserInDB
-from app.services import crud_event
-from app.services.database import get_db
+from app.schemas.bulk import BulkCreate, BulkCreateResult
+from app.schemas.user import UserIdentity
+from app.services import bulk, conditional, crud_event, projection
+from app.services.database import get_db, get_read_db
+from app.services.pagination import MAX_PAGE_SIZE
 import app.services.authentication as authentication
 
 router = APIRouter(
@@ -15,8 +18,8 @@ router = APIRouter(
 
 
 @router.post("/", response_model=event_schemas.Event)
-async def create_event(event: event_schemas.EventCreate, db: Session = Depends(get_db),
-                       current_user: UserInDB = Depends(authentication.get_current_user)):
+async def create_event(event: event_schemas.EventCreate, db: AsyncSession = Depends(get_db),
+                       current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
         Create a new event.
 
@@ -25,60 +28,192 @@ async def create_event(event: event_schemas.EventCreate, db: Session = Depends(g
 
         Args:
             event (EventCreate): The details of the event to be created.
-            db (Session, optional): The database session dependency.
-            current_user (UserInDB, optional): The current authenticated user's information.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
 
         Returns:
             Event: The created Event object with details.
     """
-    return crud_event.create_event(db=db, event=event, user_id=current_user.id)
+    return await crud_event.create_event(db=db, event=event, user_id=current_user.id)
 
 
-@router.get("/", response_model=List[event_schemas.Event])
-async def read_events(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkCreateResult)
+async def create_events_bulk(batch: BulkCreate, db: AsyncSession = Depends(get_db),
+                             current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
-        Retrieve a list of events, with optional pagination.
+        Create many events at once.
 
-        Provides a list of all available events, supporting pagination via skip and limit parameters.
+        Every item is validated on its own; the valid ones are written in a single transaction and invalid ones are
+        reported without failing the batch. The current user becomes the creator of every event.
 
         Args:
-            skip (int, optional): The number of items to skip before starting to collect the result set.
+            batch (BulkCreate): The events to be created, each with the fields of ``EventCreate``.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
+
+        Returns:
+            BulkCreateResult: The number of events created and, for every item in order, its new ID or its errors.
+    """
+    valid, errors = bulk.validate_items(event_schemas.EventCreate, batch.items)
+    ids = await crud_event.create_events(db=db, events=[event for _, event in valid], user_id=current_user.id)
+    return bulk.bulk_result(len(batch.items), dict(zip([index for index, _ in valid], ids)), errors)
+
+
+@router.get("/", response_model=event_schemas.EventPage)
+async def read_events(after: Optional[str] = None, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                      starts_after: Optional[datetime] = None, starts_before: Optional[datetime] = None,
+                      location: Optional[str] = None, creator_id: Optional[int] = None,
+                      sort: event_schemas.EventSort = event_schemas.EventSort.id,
+                      db: AsyncSession = Depends(get_read_db)):
+    """
+        Retrieve a page of events, optionally filtered by time window, location and creator.
+
+        Events are returned in a stable order using keyset pagination: pass the ``next_cursor`` of a page
+        as ``after`` to fetch the following page. Every page costs the same, however deep the client pages.
+        Use ``sort=date`` with ``starts_after``/``starts_before`` for "upcoming events" style queries, and
+        ``sort=popular`` for the most discussed events: by comment count, then latest comment activity, descending.
+
+        Args:
+            after (Optional[str], optional): The cursor returned with the previous page.
             limit (int, optional): The maximum number of items to return.
-            db (Session, optional): The database session dependency.
+            starts_after (Optional[datetime], optional): Only return events starting at or after this time.
+            starts_before (Optional[datetime], optional): Only return events starting before this time.
+            location (Optional[str], optional): Only return events at exactly this location.
+            creator_id (Optional[int], optional): Only return events created by this user.
+            sort (EventSort, optional): Order by ID (``id``, the default), by start time (``date``) or by comment
+                count and then latest comment activity, most active first (``popular``).
+            db (AsyncSession, optional): The database session dependency.
 
         Returns:
-            List[Event]: A list of Event objects.
+            EventPage: The events of the page and the cursor of the next page, if any.
     """
-    events = crud_event.get_events(db=db, skip=skip, limit=limit)
-    return events
+    body = await crud_event.get_events_cached(db=db, after=after, limit=limit, starts_after=starts_after,
+                                              starts_before=starts_before, location=location,
+                                              creator_id=creator_id, sort=sort)
+    return projection.json_response(body)
 
 
-@router.get("/{event_id}", response_model=event_schemas.Event)
-async def read_event(event_id: int, db: Session = Depends(get_db)):
+@router.get("/search", response_model=List[event_schemas.Event])
+async def search_events(q: str = Query(..., min_length=1, max_length=200),
+                        limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_read_db)):
+    """
+        Search events by title and description.
+
+        Returns the best matching events first. Every word of the query must appear in the title or description,
+        either whole or as the beginning of a word.
+
+        Args:
+            q (str): The search query.
+            limit (int, optional): The maximum number of items to return.
+            db (AsyncSession, optional): The database session dependency.
+
+        Returns:
+            List[Event]: The matching events, ranked by relevance.
+    """
+    return await crud_event.search_events(db=db, q=q, limit=limit)
+
+
+@router.get("/nearby", response_model=List[event_schemas.EventNearby])
+async def read_events_nearby(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                             radius_km: float = Query(5, gt=0, le=100),
+                             limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                             db: AsyncSession = Depends(get_read_db)):
+    """
+        Retrieve the events within a radius of a point, nearest first.
+
+        Only events that have coordinates are considered. Each result carries its distance from the point.
+
+        Args:
+            lat (float): The latitude of the point in degrees.
+            lon (float): The longitude of the point in degrees.
+            radius_km (float, optional): The search radius in kilometres (at most 100).
+            limit (int, optional): The maximum number of items to return.
+            db (AsyncSession, optional): The database session dependency.
+
+        Returns:
+            List[EventNearby]: The events within the radius with their distance in kilometres.
+    """
+    nearby = await crud_event.get_events_nearby(db=db, latitude=lat, longitude=lon, radius_km=radius_km, limit=limit)
+    return [{**event_schemas.Event.model_validate(db_event, from_attributes=True).model_dump(), "distance_km": distance}
+            for db_event, distance in nearby]
+
+
+def parse_include(include: Optional[str]) -> Set[event_schemas.EventInclude]:
+    """
+        Parse the comma separated ``include`` query parameter of the event detail endpoint.
+
+        Raises:
+            HTTPException: 400 error if it names anything other than ``comments`` and ``creator``.
+    """
+    names = {name.strip() for name in (include or "").split(",") if name.strip()}
+    unknown = names - {option.value for option in event_schemas.EventInclude}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return {event_schemas.EventInclude(name) for name in names}
+
+
+@router.get("/{event_id}", response_model=event_schemas.EventDetail, response_model_exclude_unset=True)
+async def read_event(event_id: int, request: Request, response: Response, include: Optional[str] = None,
+                     db: AsyncSession = Depends(get_read_db)):
     """
         Retrieve a single event by its ID.
 
-        Provides the details of a specific event, identified by its unique ID.
+        Provides the details of a specific event, identified by its unique ID. The response carries ``ETag`` and
+        ``Last-Modified`` headers; a request whose ``If-None-Match`` or ``If-Modified-Since`` header matches the
+        current version gets an empty 304 response, decided without loading the event.
+
+        ``include=comments,creator`` expands the event with its creator and all of its comments (oldest first),
+        built from at most two queries. The expanded view is always read fresh and carries no validators.
 
         Args:
             event_id (int): The unique identifier of the event to retrieve.
-            db (Session, optional): The database session dependency.
+            request (Request): The incoming request, for its conditional headers.
+            response (Response): The outgoing response, for the validator headers.
+            include (Optional[str], optional): Comma separated related data to include: ``comments``, ``creator``.
+            db (AsyncSession, optional): The database session dependency.
 
         Raises:
-            HTTPException: 404 error if the event is not found.
+            HTTPException: 404 error if the event is not found, 400 if ``include`` names unknown data.
 
         Returns:
-            Event: The Event object with details if found.
+            EventDetail: The Event object with details if found, expanded as requested.
     """
-    db_event = crud_event.get_event(db=db, event_id=event_id)
+    expand = parse_include(include)
+    if expand:
+        db_event = await crud_event.get_event_expanded(db=db, event_id=event_id, include=expand)
+        if db_event is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return db_event
+
+    updated_at = await crud_event.get_event_version_cached(db=db, event_id=event_id)
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    headers = conditional.validators(conditional.make_etag("event", event_id, updated_at), updated_at)
+    if conditional.is_not_modified(request, headers["ETag"], updated_at):
+        return conditional.not_modified(headers)
+
+    db_event = await crud_event.get_event_cached(db=db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
+    response.headers.update(headers)
     return db_event
 
 
+async def write_refused(db: AsyncSession, event_id: int, action: str) -> HTTPException:
+    """
+        Explain why a write restricted to the event's creator matched no row.
+
+        Returns:
+            HTTPException: 404 error if the event doesn't exist, 403 error if another user created it.
+    """
+    if await crud_event.get_event_creator_id(db, event_id) is None:
+        return HTTPException(status_code=404, detail="Event not found")
+    return HTTPException(status_code=403, detail=f"Not authorized to {action} this event")
+
+
 @router.put("/{event_id}", response_model=event_schemas.Event)
-async def update_event(event_id: int, event: event_schemas.EventUpdate, db: Session = Depends(get_db),
-                       current_user: UserInDB = Depends(authentication.get_current_user)):
+async def update_event(event_id: int, event: event_schemas.EventUpdate, db: AsyncSession = Depends(get_db),
+                       current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
        Update the details of an existing event.
 
@@ -87,8 +222,8 @@ async def update_event(event_id: int, event: event_schemas.EventUpdate, db: Sess
        Args:
            event_id (int): The ID of the event to update.
            event (EventUpdate): The updated details of the event.
-           db (Session, optional): The database session dependency.
-           current_user (UserInDB, optional): The current authenticated user's information.
+           db (AsyncSession, optional): The database session dependency.
+           current_user (UserIdentity, optional): The current authenticated user's information.
 
        Raises:
            HTTPException: 404 error if the event is not found or 403 if the user is not authorized to update it.
@@ -96,17 +231,15 @@ async def update_event(event_id: int, event: event_schemas.EventUpdate, db: Sess
        Returns:
            Event: The updated Event object with new details.
     """
-    db_event = crud_event.get_event(db=db, event_id=event_id)
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    if db_event.creator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this event")
-    return crud_event.update_event(db=db, event_id=event_id, event=event)
+    db_event = await crud_event.update_event(db=db, event_id=event_id, event=event, creator_id=current_user.id)
+    if db_event is None:
+        raise await write_refused(db, event_id, "update")
+    return db_event
 
 
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_event(event_id: int, db: Session = Depends(get_db),
-                       current_user: UserInDB = Depends(authentication.get_current_user)):
+async def delete_event(event_id: int, db: AsyncSession = Depends(get_db),
+                       current_user: UserIdentity = Depends(authentication.get_current_user)):
     """
         Delete an event.
 
@@ -114,18 +247,14 @@ async def delete_event(event_id: int, db: Session = Depends(get_db),
 
         Args:
             event_id (int): The ID of the event to delete.
-            db (Session, optional): The database session dependency.
-            current_user (UserInDB, optional): The current authenticated user's information.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
 
         Raises:
             HTTPException: 404 error if the event is not found or 403 if the user is not authorized to delete it.
 
         Returns:
-            dict: A confirmation message indicating successful deletion.
+            None: A 204 response with an empty body.
     """
-    db_event = crud_event.get_event(db=db, event_id=event_id)
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    if db_event.creator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this event")
-    return crud_event.delete_event(db, event_id=event_id)
+    if not await crud_event.delete_event(db, event_id=event_id, creator_id=current_user.id):
+        raise await write_refused(db, event_id, "delete")
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from app.schemas.user import UserIdentity
+from app.services import authentication
+from app.services.export import ExportTable, export_ndjson
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+
+@router.get("/{table}", response_class=StreamingResponse)
+async def export_table(table: ExportTable, current_user: UserIdentity = Depends(authentication.get_current_user)):
+    """
+        Stream every row of a table as NDJSON.
+
+        The export is read through a server-side cursor and sent as it is read, one JSON object per line, so it
+        can be used for full dumps of tables of any size. Only the fields of the public API are included.
+
+        Args:
+            table (ExportTable): The table to export: ``events``, ``comments`` or ``users``.
+            current_user (UserIdentity, optional): The current authenticated user's information.
+
+        Returns:
+            StreamingResponse: The ``application/x-ndjson`` stream of rows, in ID order.
+    """
+    return StreamingResponse(export_ndjson(table), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{table.value}.ndjson"'})
@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas import sync as sync_schemas
+from app.schemas.user import UserIdentity
+from app.services import authentication, changes, projection
+from app.services.database import get_read_db
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+)
+
+
+@router.get("/changes", response_model=sync_schemas.ChangeFeed)
+async def read_changes(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=changes.MAX_CHANGES_PAGE),
+                       horizon: Optional[int] = Query(None, ge=0), db: AsyncSession = Depends(get_read_db),
+                       current_user: UserIdentity = Depends(authentication.get_current_user)):
+    """
+        Retrieve the events, comments and users created, updated or deleted after a change token.
+
+        Created and updated rows are returned once, with their current fields; deleted rows are returned as
+        tombstones (``op`` ``delete``, no ``data``). Clients apply the changes in order, then ask again with
+        ``since=next_token`` and ``horizon`` until ``has_more`` is false, and keep ``next_token`` for their next sync.
+
+        Args:
+            since (int, optional): The ``next_token`` of the previous sync, or 0 to list every row.
+            limit (int, optional): The maximum number of change log entries to read.
+            horizon (Optional[int], optional): The ``horizon`` of the previous page, which lets a sync from token 0
+                continue below it.
+            db (AsyncSession, optional): The database session dependency.
+            current_user (UserIdentity, optional): The current authenticated user's information.
+
+        Raises:
+            HTTPException: 410 error if the token is older than the compacted change log; sync again from 0.
+
+        Returns:
+            ChangeFeed: The changes, the token to continue from and whether more changes follow.
+    """
+    feed = await changes.get_changes(db, since=since, limit=limit, horizon=horizon)
+    return projection.json_response(projection.dumps(feed))
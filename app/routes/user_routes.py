@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import user as user_schema
-from app.services import crud_user, authentication
-from app.services.database import get_db
+from app.services import crud_user, authentication, projection
+from app.services.database import get_db, get_read_db
+from app.services.pagination import MAX_PAGE_SIZE
 
 router = APIRouter(
     prefix='/users',
@@ -14,53 +15,53 @@ router = APIRouter(
 
 
 @router.post("/register", response_model=user_schema.User)
-async def create_user(user: user_schema.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: user_schema.UserCreate, db: AsyncSession = Depends(get_db)):
     """
         Register a new user.
 
-        This endpoint allows anyone to register a new user with a username and password. It checks if the username already exists and, if not, creates a new user.
+        This endpoint allows anyone to register a new user with a username and password. A username or email that is already taken is rejected.
 
         Args:
             user (UserCreate): The user information including username and password.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Raises:
-            HTTPException: 400 error if the username is already taken.
+            HTTPException: 400 error if the username or email is already taken.
 
         Returns:
             User: The newly created User object with public information.
     """
-    db_user = crud_user.get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="User already registered")
-    return crud_user.create_user(db=db, user=user)
+    return await crud_user.create_user(db=db, user=user)
 
 
-@router.get("/", response_model=List[user_schema.User])
-async def read_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+@router.get("/", response_model=user_schema.UserPage)
+async def read_users(after: Optional[str] = None, limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+                     db: AsyncSession = Depends(get_read_db)):
     """
-        Retrieve a list of all registered users with optional pagination.
+        Retrieve a page of registered users, using keyset pagination.
+
+        The users are read as rows of the ``User`` schema's columns and encoded straight to the response body.
 
         Args:
-            skip (int, optional): The number of items to skip before starting to collect the result set.
+            after (Optional[str], optional): The cursor returned with the previous page.
             limit (int, optional): The maximum number of items to return.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Returns:
-            List[User]: A list of User objects.
+            UserPage: The users of the page and the cursor of the next page, if any.
     """
-    users = crud_user.get_users(db, skip=skip, limit=limit)
-    return users
+    users, next_cursor = await crud_user.get_users(db, after=after, limit=limit, columns=crud_user.USER_COLUMNS)
+    return projection.json_response(projection.page_body(users, next_cursor))
 
 
 @router.get("/{user_id}", response_model=user_schema.User)
-async def read_user(user_id: int, db: Session = Depends(get_db)):
+async def read_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """
         Retrieve a specific user by their user ID.
 
         Args:
             user_id (int): The unique identifier of the user to retrieve.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Raises:
             HTTPException: 404 error if the user is not found.
@@ -68,53 +69,53 @@ async def read_user(user_id: int, db: Session = Depends(get_db)):
         Returns:
             User: The requested User object if found.
     """
-    db_user = crud_user.get_user(db, user_id=user_id)
+    db_user = await crud_user.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @router.put("/{user_id}", response_model=user_schema.User)
-async def update_user(user_id: int, user: user_schema.UserCreate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user: user_schema.UserCreate, db: AsyncSession = Depends(get_db)):
     """
         Update an existing user's information.
 
         Args:
             user_id (int): The ID of the user to update.
             user (UserCreate): The updated user information.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Returns:
             User: The updated User object if the operation was successful.
     """
 
-    return crud_user.update_user(db=db, user_id=user_id, user=user)
+    return await crud_user.update_user(db=db, user_id=user_id, user=user)
 
 
 @router.delete("/{user_id}", response_model=user_schema.User)
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """
         Delete a user by their user ID.
 
         Args:
             user_id (int): The unique identifier of the user to delete.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Returns:
             User: The deleted User object if the operation was successful.
     """
-    return crud_user.delete_user(db=db, user_id=user_id)
+    return await crud_user.delete_user(db=db, user_id=user_id)
 
 
 @router.post("/login")
-async def login(user: user_schema.UserLogin, db: Session = Depends(get_db)):
+async def login(user: user_schema.UserLogin, db: AsyncSession = Depends(get_db)):
     """
         Authenticate a user and provide an access token for future requests.
         This endpoint verifies the user's credentials and, if valid, generates a new access token for the user.
 
         Args:
             user (UserLogin): The user's login information including username and password.
-            db (Session, optional): The database session dependency.
+            db (AsyncSession, optional): The database session dependency.
 
         Raises:
             HTTPException: 401 error if the username or password is incorrect.
@@ -123,7 +124,7 @@ async def login(user: user_schema.UserLogin, db: Session = Depends(get_db)):
             dict: An object containing the access token and token type.
     """
     # Authenticate the user
-    user = authentication.authenticate_user(db, user.username, user.password)
+    user = await authentication.authenticate_user(db, user.username, user.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -132,5 +133,6 @@ async def login(user: user_schema.UserLogin, db: Session = Depends(get_db)):
         )
 
     # Create a new access token
-    access_token = authentication.create_access_token(data={"sub": user.username})
+    access_token = authentication.create_access_token(
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version})
     return {"access_token": access_token, "token_type": "bearer"}
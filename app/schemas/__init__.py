@@ -1,3 +1,5 @@
-from .user import User, UserCreate, UserBase
-from .event import Event, EventBase, EventCreate
-from .comment import Comment, CommentBase, CommentCreate
\ No newline at end of file
+from .user import User, UserCreate, UserBase, UserPage
+from .event import Event, EventBase, EventCreate, EventPage
+from .comment import Comment, CommentBase, CommentCreate, CommentPage
+from .bulk import BulkCreate, BulkItemResult, BulkCreateResult
+from .sync import Change, ChangeEntity, ChangeFeed
\ No newline at end of file
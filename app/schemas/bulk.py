@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+MAX_BULK_SIZE = 1000
+
+
+class BulkCreate(BaseModel):
+    # Items are validated one by one so that a bad item is reported without rejecting the whole batch.
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BULK_SIZE)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    errors: Optional[List[str]] = None
+
+
+class BulkCreateResult(BaseModel):
+    created: int
+    results: List[BulkItemResult]
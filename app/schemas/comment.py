@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
 
 
 class CommentBase(BaseModel):
@@ -13,7 +15,12 @@ class CommentCreate(CommentBase):
 class Comment(CommentBase):
     id: int
     user_id: int
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
+
+class CommentPage(BaseModel):
+    items: List[Comment]
+    next_cursor: Optional[str] = None
@@ -1,6 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
+from app.schemas.comment import Comment
+from app.schemas.user import User
 
 
 class EventBase(BaseModel):
@@ -8,6 +11,8 @@ class EventBase(BaseModel):
     description: Optional[str] = None
     date_time: datetime
     location: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 
 class EventCreate(EventBase):
@@ -21,6 +26,35 @@ class EventUpdate(EventBase):
 class Event(EventBase):
     id: int
     creator_id: int
+    updated_at: Optional[datetime] = None
+    comment_count: int = 0
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+
+
+class EventDetail(Event):
+    # Only present when requested with ?include=
+    creator: Optional[User] = None
+    comments: Optional[List[Comment]] = None
+
+
+class EventInclude(str, Enum):
+    comments = "comments"
+    creator = "creator"
+
+
+class EventNearby(Event):
+    distance_km: float
+
+
+class EventSort(str, Enum):
+    id = "id"
+    date = "date"
+    popular = "popular"
+
+
+class EventPage(BaseModel):
+    items: List[Event]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+
+class ChangeEntity(str, Enum):
+    event = "event"
+    comment = "comment"
+    user = "user"
+
+
+class ChangeOp(str, Enum):
+    upsert = "upsert"
+    delete = "delete"
+
+
+class Change(BaseModel):
+    token: int
+    type: ChangeEntity
+    id: int
+    op: ChangeOp
+    # The row's current fields, in the shape of its list endpoint; absent for deletions
+    data: Optional[Dict[str, Any]] = None
+
+
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    next_token: int
+    has_more: bool
+    # The compaction horizon, sent back with next_token while syncing from token 0
+    horizon: int
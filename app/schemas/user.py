@@ -34,3 +34,16 @@ class User(UserBase):
 
     class Config:
         orm_mode = True
+
+
+class UserIdentity(UserBase):
+    id: int
+    token_version: int
+
+    class Config:
+        from_attributes = True
+
+
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None
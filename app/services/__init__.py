@@ -1 +1 @@
-from .database import SessionLocal, Base, engine
+from .database import SessionLocal, Base, get_engine
@@ -0,0 +1,261 @@
+"""
+This module sheds load before it reaches the database, so that an overloaded server answers quickly instead of
+queueing every request until it times out.
+
+``AdmissionMiddleware`` sorts requests into three route classes:
+    * ``auth``: registration and login, which spend ~0.2 s of bcrypt CPU each,
+    * ``reads``: ``GET`` and ``HEAD`` requests,
+    * ``writes``: everything else.
+
+Each class has
+    * a concurrency limit: requests beyond it wait in a bounded queue for at most ``ADMISSION_QUEUE_TIMEOUT_MS``;
+      when the queue is full or the wait times out the request gets ``503 Service Unavailable``,
+    * a token bucket per client: a client that exhausts its bucket gets ``429 Too Many Requests``. Clients with a
+      valid bearer token are identified by their user id (the identity ``get_current_user`` resolves the token to),
+      other clients by their IP address.
+
+Independently of the queues, while the recent connection checkout wait of the database pool (a time-decayed moving
+average) exceeds ``ADMISSION_MAX_POOL_WAIT_MS``, new database-bound requests get ``503`` straight away. Every refusal
+carries a ``Retry-After`` header. ``/metrics`` is never shed, so the server stays observable under overload.
+Long-lived ``.../stream`` requests are rate limited but take no concurrency slot; ``pubsub`` bounds their number.
+
+Concurrency limits should leave the pool enough connections: with the defaults, reads and writes together may hold
+up to 48 requests, which queue on ``DB_POOL_SIZE + DB_MAX_OVERFLOW`` connections only briefly.
+
+Configuration (environment variables, read into ``app.settings.Settings`` and passed in by ``main.create_app``),
+``<CLASS>`` being ``AUTH``, ``READS`` or ``WRITES``:
+    ADMISSION_CONTROL: Set to ``false`` to turn the middleware off (default true).
+    ADMISSION_<CLASS>_CONCURRENCY: Requests of the class served at once (defaults 8, 32, 16).
+    ADMISSION_<CLASS>_QUEUE: Requests of the class allowed to wait for a slot (defaults 16, 64, 32).
+    ADMISSION_<CLASS>_RATE: Requests per second each client may sustain (defaults 2, 50, 10; 0 disables the limit).
+    ADMISSION_<CLASS>_BURST: Requests a client may send in a burst on top of the rate (defaults 10, 100, 20).
+    ADMISSION_QUEUE_TIMEOUT_MS: Longest wait for a slot (default 500).
+    ADMISSION_MAX_POOL_WAIT_MS: Recent pool checkout wait above which requests are shed (default 200).
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from app.services import authentication
+from app.services.cache import LRUCache
+from app.services.metrics import Counter, observe_checkout_wait, registry
+from app.settings import ADMISSION_LIMITS, Settings
+
+AUTH_PATHS = frozenset({"/users/login", "/users/register"})
+EXEMPT_PATHS = frozenset({"/metrics"})
+STREAM_SUFFIX = "/stream"
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+shed_requests = registry.register(Counter(
+    "admission_shed_requests", "Requests refused by admission control.", ("route_class", "reason")))
+
+
+def route_class(method: str, path: str) -> str:
+    """
+        Return the route class (``auth``, ``reads`` or ``writes``) of a request.
+    """
+    if path in AUTH_PATHS:
+        return "auth"
+    return "reads" if method in READ_METHODS else "writes"
+
+
+class ConcurrencyLimiter:
+    """
+        Admits up to ``limit`` requests at once; up to ``queue_limit`` more may wait ``queue_timeout`` for a slot.
+
+        Args:
+            limit (int): The number of requests served at the same time.
+            queue_limit (int): The number of requests allowed to wait.
+            queue_timeout (float): The longest wait in seconds.
+    """
+
+    def __init__(self, limit: int, queue_limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> Optional[str]:
+        """
+            Wait for a slot.
+
+            Returns:
+                Optional[str]: None once a slot is held, otherwise why the request is refused (``queue_full`` or
+                ``queue_timeout``).
+        """
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return None
+        if self.waiting >= self.queue_limit:
+            return "queue_full"
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+        return None
+
+    def release(self):
+        self._semaphore.release()
+
+
+class TokenBucket:
+    """
+        Per-client token buckets refilled at ``rate`` tokens per second up to ``burst`` tokens.
+
+        Buckets of clients that were idle long enough to refill completely are dropped, as are the least recently
+        used ones beyond ``maxsize``; a client without a bucket starts with a full one.
+
+        Args:
+            rate (float): The sustained number of requests per second.
+            burst (float): The bucket capacity.
+            maxsize (int, optional): The number of clients tracked.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = LRUCache(maxsize=maxsize, ttl=burst / rate)
+
+    def take(self, client: str) -> float:
+        """
+            Take a token from a client's bucket.
+
+            Returns:
+                float: 0 if a token was taken, otherwise the seconds until the next token is available.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens < 1:
+            self._buckets.set(client, (tokens, now))
+            return (1 - tokens) / self.rate
+        self._buckets.set(client, (tokens - 1, now))
+        return 0
+
+
+class PoolWaitMonitor:
+    """
+        A moving average of connection checkout waits that decays while no checkouts happen.
+
+        The decay matters: while requests are shed nothing checks out a connection, and an average frozen above the
+        threshold would shed traffic forever.
+
+        Args:
+            half_life (float, optional): Seconds after which an observation (or the idle average) counts half.
+    """
+
+    def __init__(self, half_life: float = 1.0):
+        self.half_life = half_life
+        self.average = 0.0
+        self.updated = time.monotonic()
+
+    def _decayed(self, now: float) -> float:
+        return self.average * math.pow(0.5, (now - self.updated) / self.half_life)
+
+    def observe(self, seconds: float):
+        now = time.monotonic()
+        weight = 1 - math.pow(0.5, max(now - self.updated, 0.001) / self.half_life)
+        self.average = self.average * (1 - weight) + seconds * weight
+        self.updated = now
+
+    def current(self) -> float:
+        return self._decayed(time.monotonic())
+
+
+def client_key(scope) -> str:
+    """
+        Identify the client of a request: ``user:<id>`` for a valid bearer token, ``ip:<address>`` otherwise.
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                payload = authentication.decode_token(token)
+                if payload is not None and payload.get("uid") is not None:
+                    return f"user:{payload['uid']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """
+        ASGI middleware applying per route class concurrency limits, per client rate limits and pool wait shedding.
+
+        Args:
+            app: The ASGI application to wrap.
+            engine (optional): The database engine whose pool checkout wait is watched, or a function returning it
+                (called when the middleware is built, on the application's first request or startup); None disables
+                the check.
+            limits (Optional[Dict[str, tuple]], optional): ``(concurrency, queue, rate, burst)`` per route class;
+                ``app.settings.ADMISSION_LIMITS`` for the classes left out.
+            queue_timeout_ms (float, optional): The longest wait for a slot.
+            max_pool_wait_ms (float, optional): The pool checkout wait above which requests are shed.
+    """
+
+    def __init__(self, app, engine=None, limits: Optional[Dict[str, tuple]] = None,
+                 queue_timeout_ms: float = Settings.admission_queue_timeout_ms,
+                 max_pool_wait_ms: float = Settings.admission_max_pool_wait_ms):
+        self.app = app
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.buckets: Dict[str, Optional[TokenBucket]] = {}
+        for name, defaults in ADMISSION_LIMITS.items():
+            concurrency, queue, rate, burst = (limits or {}).get(name, defaults)
+            self.limiters[name] = ConcurrencyLimiter(int(concurrency), int(queue), queue_timeout_ms / 1000)
+            self.buckets[name] = TokenBucket(rate, burst) if rate > 0 else None
+        self.max_pool_wait = max_pool_wait_ms / 1000
+        self.pool_wait = PoolWaitMonitor()
+        if callable(engine):
+            engine = engine()
+        if engine is not None:
+            observe_checkout_wait(engine, self.pool_wait.observe)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        bucket = self.buckets[name]
+        if bucket is not None:
+            retry_after = bucket.take(client_key(scope))
+            if retry_after:
+                await self._refuse(scope, receive, send, name, "rate_limited", 429, retry_after)
+                return
+        if self.pool_wait.current() > self.max_pool_wait:
+            await self._refuse(scope, receive, send, name, "pool_wait", 503, 1)
+            return
+
+        if scope["path"].endswith(STREAM_SUFFIX):
+            # A stream holds its connection for as long as the client listens; the pub/sub hub bounds their number.
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[name]
+        refused = await limiter.acquire()
+        if refused:
+            await self._refuse(scope, receive, send, name, refused, 503, 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _refuse(scope, receive, send, name: str, reason: str, status_code: int, retry_after: float):
+        shed_requests.inc(name, reason)
+        detail = "Too many requests" if status_code == 429 else "Server is overloaded, please retry shortly"
+        response = JSONResponse({"detail": detail}, status_code=status_code,
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        await response(scope, receive, send)
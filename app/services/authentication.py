@@ -3,39 +3,35 @@ This module handles user authentication for the FastAPI application, including p
 token generation, and user authentication based on tokens.
 
 It utilizes the Passlib library for password hashing and the python-jose library for creating and verifying JWT tokens.
+Password hashing and verification are delegated to the bounded process pool in ``app.services.hashing``.
+
+Configuration (environment variables, read into ``app.settings.Settings``):
+    SECRET_KEY: The key access tokens are signed with.
+    ALGORITHM: The JWT signing algorithm, e.g. ``HS256``.
+    ACCESS_TOKEN_EXPIRE_MINUTES: The lifetime of an access token (default 15).
 """
 
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import HTTPException, status, Depends
-from app.services.database import get_db
-from .crud_user import get_user_by_email, get_user_by_username
+from app.services.database import get_db, get_settings
+from .crud_user import get_user, get_user_by_email, get_user_by_username
+from .cache import identity_cache
+from .hashing import password_hasher
 from app.models.user import User
-from app.schemas.user import UserInDB
-
-from dotenv import load_dotenv
-import os
+from app.schemas.user import UserInDB, UserIdentity
 
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def verify_password(plain_password, hashed_password):
+async def verify_password(plain_password, hashed_password):
     """
         Verify a password against a hashed version.
 
@@ -45,11 +41,14 @@ def verify_password(plain_password, hashed_password):
 
         Returns:
             bool: True if the password is correct, False otherwise.
+
+        Raises:
+            HTTPException: 503 error if the password hashing pool is saturated.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password):
+async def get_password_hash(password):
     """
         Hash a password using bcrypt.
 
@@ -58,26 +57,29 @@ def get_password_hash(password):
 
         Returns:
             str: The hashed password.
+
+        Raises:
+            HTTPException: 503 error if the password hashing pool is saturated.
     """
-    return pwd_context.hash(password)
+    return await password_hasher.hash(password)
 
 
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """
         Authenticate a user by username and password.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             username (str): The username of the user to authenticate.
             password (str): The password of the user to authenticate.
 
         Returns:
             User: The authenticated User object, or False if authentication failed.
     """
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -87,20 +89,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         Create a JWT access token.
 
         Args:
-            data (dict): The data to encode in the token (e.g., the username).
-            expires_delta (Optional[timedelta], optional): The time delta in which the token will expire.
+            data (dict): The data to encode in the token (the username as ``sub``, the user id as ``uid``
+                and the user's token version as ``ver``).
+            expires_delta (Optional[timedelta], optional): The time delta in which the token will expire;
+                ``ACCESS_TOKEN_EXPIRE_MINUTES`` by default.
 
         Returns:
             str: The encoded JWT token.
     """
+    settings = get_settings()
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
+        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
 
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
@@ -115,25 +120,30 @@ def decode_token(token: str) -> Optional[dict]:
             Optional[dict]: The decoded token data, or None if the token is invalid.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        settings = get_settings()
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         return payload
     except JWTError:
         return None
 
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UserInDB:
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UserIdentity:
     """
        Retrieve the current user based on the JWT token.
 
+       Tokens carry the user's id (``uid``) and token version (``ver``). Verified identities are kept in
+       ``identity_cache``, so the database is only queried on a cache miss or when the token's version does not
+       match the cached one. Bumping a user's token version revokes all tokens issued before it.
+
        Args:
-           db (Session): The database session to use for the operation.
+           db (AsyncSession): The database session to use on a cache miss.
            token (str): The JWT token to authenticate.
 
        Raises:
-           HTTPException: 401 error if the token is invalid or the user does not exist.
+           HTTPException: 401 error if the token is invalid, revoked, or the user does not exist.
 
        Returns:
-           UserInDB: The authenticated User object.
+           UserIdentity: The authenticated user's identity.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -141,24 +151,36 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         headers={"WWW-Authenticate": "Bearer"}
     )
 
-    logger.info("Attempting to authenticate user")
     payload = decode_token(token)
 
     if payload is None:
         logger.warning("Token payload could not be decoded")
         raise credentials_exception
 
-    username: str = payload.get('sub')
+    user_id = payload.get('uid')
+    token_version = payload.get('ver')
 
-    if username is None:
-        logger.warning("Username not found in token payload")
+    if user_id is None or token_version is None:
+        logger.warning("User id or token version not found in token payload")
         raise credentials_exception
 
-    user = get_user_by_username(db=db, username=username)
+    identity = identity_cache.get(user_id)
+    if identity is not None and identity.token_version == token_version:
+        return identity
+
+    user = await get_user(db=db, user_id=user_id)
 
     if user is None:
-        logger.warning(f"User with username {username} not found")
+        logger.warning(f"User with id {user_id} not found")
+        identity_cache.delete(user_id)
         raise credentials_exception
 
-    logger.info(f"User {username} successfully authenticated")
-    return user
+    identity = UserIdentity.model_validate(user)
+    identity_cache.set(user_id, identity)
+
+    if identity.token_version != token_version:
+        logger.warning(f"Revoked token presented for user {user_id}")
+        raise credentials_exception
+
+    logger.debug(f"User {identity.username} authenticated from the database")
+    return identity
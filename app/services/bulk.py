@@ -0,0 +1,50 @@
+"""
+This module holds the helpers shared by the bulk create endpoints.
+
+A batch is validated item by item: valid items are written together in one multi-row ``INSERT ... RETURNING``
+statement by the ``create_*s`` functions of the CRUD modules, and every item gets its own result (the new ID, or
+the reasons it was rejected) in the order it was sent.
+"""
+
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.schemas.bulk import BulkCreateResult, BulkItemResult
+
+
+def validate_items(schema: Type[BaseModel], items: List[Dict[str, Any]]):
+    """
+        Validate the items of a batch against a create schema.
+
+        Args:
+            schema (Type[BaseModel]): The schema each item must satisfy, e.g. ``EventCreate``.
+            items (List[Dict[str, Any]]): The raw items of the batch.
+
+        Returns:
+            Tuple[List[Tuple[int, BaseModel]], Dict[int, List[str]]]: The valid items with their index in the batch,
+            and the validation errors of the invalid items by index.
+    """
+    valid, errors = [], {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            errors[index] = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+    return valid, errors
+
+
+def bulk_result(size: int, created: Dict[int, int], errors: Dict[int, List[str]]) -> BulkCreateResult:
+    """
+        Assemble the per-item report of a batch.
+
+        Args:
+            size (int): The number of items in the batch.
+            created (Dict[int, int]): The IDs of the created rows by item index.
+            errors (Dict[int, List[str]]): The errors of the rejected items by item index.
+
+        Returns:
+            BulkCreateResult: One result per item, in the order the items were sent.
+    """
+    results = [BulkItemResult(index=index, id=created.get(index), errors=errors.get(index)) for index in range(size)]
+    return BulkCreateResult(created=len(created), results=results)
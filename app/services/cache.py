@@ -0,0 +1,263 @@
+"""
+This module provides the caches used to keep hot lookups off the database.
+
+``identity_cache`` holds the verified identity of recently authenticated users, keyed by user id, so that
+``authentication.get_current_user`` can answer most requests without a query. Entries carry the user's token
+version; ``crud_user`` evicts them whenever a user is updated or deleted.
+
+``read_cache`` is a read-through cache in front of the event and comment reads in ``crud_event`` and
+``crud_comment``. It stores JSON-compatible response data in a pluggable ``CacheBackend`` (an in-process LRU with a
+TTL by default), collapses concurrent misses on the same key into a single load, and counts hits and misses.
+Writes invalidate it precisely: single entries are deleted, and listings are grouped under a namespace whose version
+is bumped, which orphans every listing page cached under the previous version. Both record when they happened, so a
+load from a lagging read replica shortly after an invalidation, which may still return the old row, is served but
+not cached.
+
+Configuration (environment variables, read into ``app.settings.Settings`` and applied by ``configure``):
+    AUTH_CACHE_SIZE: Maximum number of cached identities (default 10000).
+    AUTH_CACHE_TTL_SECONDS: Lifetime of a cached identity in seconds (default 60). This also bounds how long
+        another worker may keep accepting a revoked token.
+    READ_CACHE_SIZE: Maximum number of cached reads (default 10000).
+    READ_CACHE_TTL_SECONDS: Lifetime of a cached read in seconds (default 30).
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.settings import Settings
+
+# The namespace version inside a key built by ``ReadThroughCache.namespaced``.
+_NAMESPACE_VERSION = re.compile(r":v(\d+):")
+
+
+class LRUCache:
+    """
+        A bounded least-recently-used cache whose entries expire after a fixed time to live.
+
+        Args:
+            maxsize (int): The maximum number of entries kept; the least recently used entry is evicted first.
+            ttl (float): The number of seconds an entry stays valid after it was set.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+            Return the cached value for a key, or None if it is missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+            Store a value, evicting the least recently used entry if the cache is full.
+        """
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """
+            Remove a key from the cache if present.
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """
+            Remove every entry from the cache.
+        """
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend:
+    """
+        Storage interface of ``ReadThroughCache``.
+
+        Values are JSON-compatible (dicts, lists, strings, numbers), so an out-of-process backend such as Redis or
+        memcached only has to serialize them. Implementations must treat a missing or expired key as None.
+    """
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+        In-process ``CacheBackend`` backed by an ``LRUCache``.
+
+        Args:
+            maxsize (int): The maximum number of entries kept.
+            ttl (float): The number of seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any):
+        self.cache.set(key, value)
+
+    async def delete(self, key: str):
+        self.cache.delete(key)
+
+    async def clear(self):
+        self.cache.clear()
+
+
+class ReadThroughCache:
+    """
+        Read-through cache with single-flight loading, namespace invalidation and hit/miss counters.
+
+        Args:
+            backend (CacheBackend): Where cached values and namespace versions are stored.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # The load of every key being loaded, with the lag of its data.
+        self._inflight: Dict[str, Tuple[asyncio.Future, float]] = {}
+
+    async def namespaced(self, namespace: str, key: str) -> str:
+        """
+            Return ``key`` qualified with the current version of ``namespace``, the time of its last invalidation in
+            nanoseconds (0 if it was never invalidated).
+        """
+        version = await self.backend.get(f"ns:{namespace}") or 0
+        return f"{namespace}:v{version}:{key}"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], lag_seconds: float = 0) -> Any:
+        """
+            Return the cached value for ``key``, loading and caching it on a miss.
+
+            Concurrent misses on the same key share a single call to ``loader``, unless the one in flight reads more
+            lagging data than the caller accepts; the caller's load then replaces it. None results are returned but
+            not cached.
+
+            Args:
+                key (str): The cache key.
+                loader (Callable[[], Awaitable[Any]]): Coroutine function producing the JSON-compatible value.
+                lag_seconds (float, optional): How far the data ``loader`` reads may lag behind the latest writes,
+                    see ``database.replication_lag``. A value loaded less than this long after the key or its
+                    namespace was invalidated may predate the write; it is returned but not cached.
+
+            Returns:
+                Any: The cached or freshly loaded value.
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] <= lag_seconds:
+            self.coalesced += 1
+            return await asyncio.shield(inflight[0])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (future, lag_seconds)
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._inflight.get(key, (None,))[0] is future:
+                del self._inflight[key]
+            future.set_exception(e)
+            # Nobody else may be waiting; retrieve the exception so asyncio does not log it as unhandled.
+            future.exception()
+            raise
+        # An invalidation that happened while loading removed the in-flight entry; the value may be stale then.
+        if self._inflight.get(key, (None,))[0] is future:
+            del self._inflight[key]
+            if value is not None and not await self._invalidated_within(key, lag_seconds):
+                await self.backend.set(key, value)
+        future.set_result(value)
+        return value
+
+    async def _invalidated_within(self, key: str, seconds: float) -> bool:
+        if seconds <= 0:
+            return False
+        version = _NAMESPACE_VERSION.search(key)
+        invalidated_at = max(int(version.group(1)) if version else 0,
+                             await self.backend.get(f"invalidated:{key}") or 0)
+        return time.time_ns() - invalidated_at < seconds * 1e9
+
+    async def invalidate(self, key: str):
+        """
+            Drop a single cached key.
+        """
+        self._inflight.pop(key, None)
+        await self.backend.delete(key)
+        await self.backend.set(f"invalidated:{key}", time.time_ns())
+
+    async def invalidate_namespace(self, namespace: str):
+        """
+            Orphan every key cached under ``namespace`` by moving it to a new version.
+        """
+        # A fresh, time based version rather than a counter: the version entry itself may be evicted and must
+        # never come back as a number that older keys were cached under.
+        await self.backend.set(f"ns:{namespace}", time.time_ns())
+        prefix = f"{namespace}:"
+        for key in [key for key in self._inflight if key.startswith(prefix)]:
+            del self._inflight[key]
+
+    async def clear(self):
+        """
+            Drop every cached value and reset the counters.
+        """
+        self._inflight.clear()
+        await self.backend.clear()
+        self.hits = self.misses = self.coalesced = 0
+
+    def stats(self) -> dict:
+        """
+            Return the hit, miss and coalesced-miss counters.
+        """
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+identity_cache = LRUCache(maxsize=Settings.auth_cache_size, ttl=Settings.auth_cache_ttl_seconds)
+read_cache = ReadThroughCache(MemoryCacheBackend(maxsize=Settings.read_cache_size, ttl=Settings.read_cache_ttl_seconds))
+
+
+def configure(settings: Settings):
+    """
+        Apply the cache sizes and lifetimes; entries already cached keep their expiry time.
+
+        Args:
+            settings (Settings): The application settings.
+    """
+    identity_cache.maxsize, identity_cache.ttl = settings.auth_cache_size, settings.auth_cache_ttl_seconds
+    if isinstance(read_cache.backend, MemoryCacheBackend):
+        read_cache.backend.cache.maxsize = settings.read_cache_size
+        read_cache.backend.cache.ttl = settings.read_cache_ttl_seconds
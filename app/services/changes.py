@@ -0,0 +1,180 @@
+"""
+This module keeps the change log behind ``GET /sync/changes``, the incremental feed of offline-first clients.
+
+Every write to events, comments and users appends an entry per changed row to the ``changes`` table, in the same
+transaction as the write, so the log commits or rolls back with it. The entry's ID is the change token: it only ever
+grows, and a client that has applied the feed up to token ``T`` asks for the changes after ``T``. The feed returns
+each changed row once, with its current fields, or a tombstone for a deleted row, so a resync costs as much as the
+changes since the last one rather than the size of the tables. Syncing from token 0 lists every row.
+
+The log is kept bounded by ``compact_changes`` (``python cli.py compact-changes``):
+
+* An entry followed by a later entry of the same row is dropped, as the feed would only return the later one. Once
+  compacted, the log holds at most one entry per row, plus the tombstones.
+* Tombstones older than ``SYNC_TOMBSTONE_RETENTION_DAYS`` are purged. The highest purged token is recorded as the
+  horizon; a client whose token is below it may have missed a deletion and is answered with ``410 Gone``, after
+  which it syncs again from token 0.
+
+A sync from token 0 passes through tokens below the horizon too. Every page reports the current ``horizon``, and a
+client that sends it back along with such a token is let through: it started after the last compaction, so nothing
+it saw was purged. Once another compaction raises the horizon, the old value no longer matches and it gets the 410.
+
+Tokens are assigned when a row is written but become visible when its transaction commits, which on PostgreSQL
+happens in any order across concurrent transactions. The feed therefore stops short of entries younger than
+``SYNC_SETTLE_SECONDS``, which must exceed the duration of the write transactions. SQLite runs one write
+transaction at a time, so nothing is held back there.
+
+Configuration (environment variables, read into ``app.settings.Settings``):
+    SYNC_TOMBSTONE_RETENTION_DAYS: How long the tombstones of deleted rows are kept (default 30).
+    SYNC_SETTLE_SECONDS: Age below which entries are not served yet, except on SQLite (default 2).
+"""
+
+from datetime import timedelta
+from typing import Iterable, Mapping, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, exists, func, insert, select
+
+from app.models.change import Change, ChangeCompaction
+from app.models.comment import Comment
+from app.models.event import Event
+from app.models.user import User
+from app.schemas import comment as comment_schemas, event as event_schemas, user as user_schemas
+from app.schemas.sync import ChangeEntity, ChangeOp
+from app.services import projection
+from app.services.database import get_settings, utcnow
+
+MAX_CHANGES_PAGE = 1000
+
+# The model and the columns of the list endpoint's schema of every entity in the feed.
+FEED_ENTITIES = {
+    ChangeEntity.user: (User, projection.schema_columns(User, user_schemas.User)),
+    ChangeEntity.event: (Event, projection.schema_columns(Event, event_schemas.Event)),
+    ChangeEntity.comment: (Comment, projection.schema_columns(Comment, comment_schemas.Comment)),
+}
+
+
+async def _horizon(db) -> int:
+    result = await db.execute(select(ChangeCompaction.horizon).order_by(ChangeCompaction.id.desc()).limit(1))
+    return result.scalar() or 0
+
+
+async def record_changes(db, upserted: Optional[Mapping[ChangeEntity, Iterable[int]]] = None,
+                         deleted: Optional[Mapping[ChangeEntity, Iterable[int]]] = None):
+    """
+        Append the rows written by a transaction to the change log, in the caller's transaction and with a single
+        ``INSERT``.
+
+        Args:
+            db (AsyncSession | AsyncConnection): The session or connection of the writing transaction.
+            upserted (Optional[Mapping[ChangeEntity, Iterable[int]]], optional): The IDs of the rows created or
+                updated, by entity.
+            deleted (Optional[Mapping[ChangeEntity, Iterable[int]]], optional): The IDs of the rows deleted, by
+                entity.
+    """
+    now = utcnow()
+    rows = [{"entity": entity.value, "entity_id": entity_id, "deleted": is_deleted, "changed_at": now}
+            for changed, is_deleted in ((upserted or {}, False), (deleted or {}, True))
+            for entity, ids in changed.items() for entity_id in ids]
+    if rows:
+        await db.execute(insert(Change.__table__), rows)
+
+
+async def get_changes(db, since: int = 0, limit: int = 100, horizon: Optional[int] = None) -> dict:
+    """
+        Retrieve the rows changed after a change token, oldest change first.
+
+        Entries of the same row within the page are merged into its latest one. Created and updated rows are
+        returned with their current fields, read with one query per entity; a row that no longer exists is left out,
+        as its tombstone follows.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            since (int, optional): The ``next_token`` of the previous page, or 0 to list every row.
+            limit (int, optional): The maximum number of log entries to read (capped at ``MAX_CHANGES_PAGE``).
+            horizon (Optional[int], optional): The ``horizon`` reported with ``since``; a token below the current
+                horizon is only accepted along with it.
+
+        Raises:
+            HTTPException: 410 error if tombstones after ``since`` may have been purged by compaction.
+
+        Returns:
+            dict: The ``changes``, the ``next_token`` to continue from, whether there are more (``has_more``) and the
+            current ``horizon``.
+    """
+    limit = max(1, min(limit, MAX_CHANGES_PAGE))
+    current_horizon = await _horizon(db)
+    if 0 < since < current_horizon and horizon != current_horizon:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Change token expired, sync again from token 0")
+    query = (select(Change.id, Change.entity, Change.entity_id, Change.deleted).filter(Change.id > since)
+             .order_by(Change.id).limit(limit + 1))
+    settle_seconds = get_settings().sync_settle_seconds
+    if settle_seconds > 0 and db.bind.dialect.name != "sqlite":
+        query = query.filter(Change.changed_at <= utcnow() - timedelta(seconds=settle_seconds))
+    entries = (await db.execute(query)).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {(entry.entity, entry.entity_id): entry for entry in entries}
+    rows = {}
+    for entity, (model, columns) in FEED_ENTITIES.items():
+        ids = [entity_id for (name, entity_id), entry in latest.items() if name == entity.value and not entry.deleted]
+        if ids:
+            result = await db.execute(select(*columns).filter(model.id.in_(ids)))
+            rows.update(((entity.value, row["id"]), dict(row)) for row in result.mappings())
+
+    changes = []
+    for entry in sorted(latest.values(), key=lambda entry: entry.id):
+        change = {"token": entry.id, "type": entry.entity, "id": entry.entity_id}
+        if entry.deleted:
+            changes.append(dict(change, op=ChangeOp.delete.value))
+        elif (entry.entity, entry.entity_id) in rows:
+            changes.append(dict(change, op=ChangeOp.upsert.value, data=rows[entry.entity, entry.entity_id]))
+    return {"changes": changes, "next_token": entries[-1].id if entries else since, "has_more": has_more,
+            "horizon": current_horizon}
+
+
+async def compact_changes(db, retention_days: Optional[float] = None, batch_size: int = 10000) -> dict:
+    """
+        Drop the change log entries that a later entry of the same row supersedes, and purge old tombstones.
+
+        Superseded entries are removed in token ranges of ``batch_size``, one transaction per range; dropping them
+        changes nothing for any client. The tombstones are purged in one transaction that also raises the horizon
+        below which tokens are refused.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            retention_days (Optional[float], optional): The age after which tombstones are purged;
+                ``SYNC_TOMBSTONE_RETENTION_DAYS`` by default.
+            batch_size (int, optional): The number of tokens covered per transaction.
+
+        Returns:
+            dict: The number of ``superseded`` entries and ``tombstones`` removed, and the ``horizon``.
+    """
+    changes = Change.__table__
+    later = changes.alias("later")
+    superseded = exists().where(later.c.entity == changes.c.entity, later.c.entity_id == changes.c.entity_id,
+                                later.c.id > changes.c.id)
+    last_id = (await db.execute(select(func.max(Change.id)))).scalar() or 0
+    removed = 0
+    for start in range(0, last_id, batch_size):
+        result = await db.execute(delete(changes).where(changes.c.id > start, changes.c.id <= start + batch_size,
+                                                        superseded))
+        await db.commit()
+        removed += result.rowcount
+
+    if retention_days is None:
+        retention_days = get_settings().sync_tombstone_retention_days
+    cutoff = utcnow() - timedelta(days=retention_days)
+    horizon = await db.scalar(select(func.max(Change.id)).filter(Change.deleted, Change.changed_at < cutoff))
+    purged = 0
+    if horizon is not None:
+        result = await db.execute(delete(changes).where(changes.c.deleted, changes.c.id <= horizon))
+        purged = result.rowcount
+        compaction_id = await db.scalar(insert(ChangeCompaction).values(horizon=horizon)
+                                        .returning(ChangeCompaction.id))
+        await db.execute(delete(ChangeCompaction).where(ChangeCompaction.id < compaction_id))
+        await db.commit()
+    else:
+        horizon = await _horizon(db)
+    return {"superseded": removed, "tombstones": purged, "horizon": horizon}
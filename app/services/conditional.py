@@ -0,0 +1,106 @@
+"""
+This module implements conditional GET (RFC 9110 validators) for read endpoints that clients poll.
+
+A route first fetches a cheap version of the resource (a primary key lookup of ``updated_at``, or an aggregate over
+an index) and derives an ETag and Last-Modified date from it with ``validators``. If the request's
+``If-None-Match`` / ``If-Modified-Since`` headers show the client already holds that version (``is_not_modified``),
+the route answers with an empty 304 (``not_modified``) before any row is loaded or serialized; otherwise the
+validators are attached to the full response.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+# Clients may store responses but must revalidate them before reuse.
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+        Build a strong ETag from the parts identifying a version of a resource.
+
+        Args:
+            *parts: Values that change whenever the representation changes (IDs, counts, timestamps, query params).
+
+        Returns:
+            str: The quoted entity tag.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """
+        Format a stored (naive UTC) timestamp as an HTTP date.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """
+        Return the ETag, Last-Modified and Cache-Control headers of a response.
+
+        Args:
+            etag (str): The entity tag, as returned by ``make_etag``.
+            last_modified (Optional[datetime], optional): When the resource last changed, if known.
+
+        Returns:
+            Dict[str, str]: The response headers.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: a W/ prefix is ignored.
+    candidates = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+        Evaluate the request's ``If-None-Match`` and ``If-Modified-Since`` preconditions.
+
+        ``If-Modified-Since`` is only considered when ``If-None-Match`` is absent, and only with a known
+        ``last_modified``. HTTP dates have one second resolution, so the comparison truncates ``last_modified``.
+
+        Args:
+            request (Request): The incoming request.
+            etag (str): The current entity tag of the resource.
+            last_modified (Optional[datetime], optional): When the resource last changed, if known.
+
+        Returns:
+            bool: True if the client's copy is current and a 304 should be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """
+        Build an empty 304 response carrying the resource's validators.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -1,14 +1,31 @@
-from sqlalchemy.orm import Session
+import json
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas import comment as comment_schemas
 from app.schemas.comment import CommentCreate
+from app.schemas.sync import ChangeEntity
 from app.models.comment import Comment
+from app.models.event import Event
+from app.services.pagination import paginate
+from app.services.cache import read_cache
+from app.services.database import replication_lag
+from app.services import projection
+from app.services.pubsub import publish_comment
+from app.services.changes import record_changes
+from app.services.crud_event import adjust_comment_counts, ids_in_row_order, invalidate_event
 
+COMMENT_COLUMNS = projection.schema_columns(Comment, comment_schemas.Comment)
 
-def create_comment(db: Session, comment: CommentCreate, user_id: int):
+
+async def create_comment(db: AsyncSession, comment: CommentCreate, user_id: int):
     """
-        Create a new comment in the database.
+        Create a new comment in the database with a single ``INSERT ... RETURNING``.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             comment (CommentCreate): A CommentCreate schema object containing the content of the comment.
             user_id (int): The ID of the user who is creating the comment.
 
@@ -16,42 +33,158 @@ def create_comment(db: Session, comment: CommentCreate, user_id: int):
             Comment: The newly created Comment object.
     """
 
-    db_comment = Comment(**comment.dict(), user_id=user_id)
-    db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    db_comment = await db.scalar(insert(Comment).values(**comment.model_dump(), user_id=user_id).returning(Comment))
+    await adjust_comment_counts(db, {comment.event_id: 1})
+    await record_changes(db, upserted={ChangeEntity.comment: [db_comment.id], ChangeEntity.event: [comment.event_id]})
+    await db.commit()
+    await read_cache.invalidate_namespace(f"comments:{db_comment.event_id}")
+    await invalidate_event(db_comment.event_id)
+    await publish_comment("created", {column.key: getattr(db_comment, column.key) for column in COMMENT_COLUMNS})
     return db_comment
 
 
-def get_comments_for_events(db: Session, event_id: int):
+async def create_comments(db: AsyncSession, comments: List[CommentCreate], user_id: int) -> List[Optional[int]]:
+    """
+        Create many comments in one transaction with a single multi-row ``INSERT ... RETURNING``.
+
+        Comments on events that don't exist are skipped.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            comments (List[CommentCreate]): The contents of the comments to be created.
+            user_id (int): The ID of the user who is creating the comments.
+
+        Returns:
+            List[Optional[int]]: The IDs of the new comments in the order of ``comments``, None for skipped ones.
+    """
+    event_ids = {comment.event_id for comment in comments}
+    if not event_ids:
+        return []
+    result = await db.execute(select(Event.id).filter(Event.id.in_(event_ids)))
+    existing = set(result.scalars())
+    rows = [dict(comment.model_dump(), user_id=user_id) for comment in comments if comment.event_id in existing]
+    ids = []
+    if rows:
+        result = await db.execute(insert(Comment.__table__).returning(*COMMENT_COLUMNS), rows)
+        created_rows = sorted((dict(row) for row in result.mappings()), key=lambda row: row["id"])
+        ids = ids_in_row_order(rows, created_rows, list(CommentCreate.model_fields))
+        counts = Counter(row["event_id"] for row in rows)
+        await adjust_comment_counts(db, counts)
+        await record_changes(db, upserted={ChangeEntity.comment: ids, ChangeEntity.event: counts})
+        await db.commit()
+        for event_id in existing:
+            await read_cache.invalidate_namespace(f"comments:{event_id}")
+            await invalidate_event(event_id)
+        for row in created_rows:
+            await publish_comment("created", row)
+    created = iter(ids)
+    return [next(created) if comment.event_id in existing else None for comment in comments]
+
+
+async def get_comments_for_events(db: AsyncSession, event_id: int, after: Optional[str] = None, limit: int = 10,
+                                  columns: Optional[Sequence] = None):
     """
-        Retrieve all comments associated with a specific event from the database.
+        Retrieve a page of the comments associated with a specific event, oldest first, using keyset pagination.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             event_id (int): The ID of the event for which to retrieve comments.
+            after (Optional[str], optional): The cursor returned with the previous page.
+            limit (int, optional): The maximum number of items to return.
+            columns (Optional[Sequence], optional): Select only these columns (which must include the ID) and return
+                rows instead of Comment objects.
+
+        Returns:
+            Tuple[List[Comment], Optional[str]]: A list of Comment objects (or row mappings) associated with the
+            specified event and the cursor of the next page, if any.
+    """
+    query = (select(Comment) if columns is None else select(*columns)).filter(Comment.event_id == event_id)
+    return await paginate(db, query, [Comment.id], after=after, limit=limit, rows=columns is not None)
+
+
+async def get_comments_version(db: AsyncSession, event_id: int) -> Tuple[int, Optional[int], Optional[datetime]]:
+    """
+        Retrieve a summary of an event's comments that changes whenever a comment is added, edited or deleted,
+        without loading the comments.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            event_id (int): The ID of the event.
 
         Returns:
-            List[Comment]: A list of Comment objects associated with the specified event.
+            Tuple[int, Optional[int], Optional[datetime]]: The number of comments, the highest comment ID and the
+            latest ``updated_at``; the last two are None when the event has no comments.
     """
-    return db.query(Comment).filter(Comment.event_id == event_id).all()
+    result = await db.execute(select(func.count(Comment.id), func.max(Comment.id), func.max(Comment.updated_at))
+                              .filter(Comment.event_id == event_id))
+    count, last_id, last_updated = result.one()
+    return count, last_id, last_updated
+
+
+async def get_comments_version_cached(db: AsyncSession, event_id: int) -> Tuple[int, Optional[int], Optional[datetime]]:
+    """
+        Retrieve the summary of an event's comments through the read cache. Takes the same arguments as
+        ``get_comments_version``.
+
+        Returns:
+            Tuple[int, Optional[int], Optional[datetime]]: The number of comments, the highest comment ID and the
+            latest ``updated_at``.
+    """
+    key = await read_cache.namespaced(f"comments:{event_id}", "version")
+
+    async def load():
+        count, last_id, last_updated = await get_comments_version(db=db, event_id=event_id)
+        return [count, last_id, None if last_updated is None else last_updated.isoformat()]
+
+    count, last_id, last_updated = await read_cache.get_or_load(key, load, replication_lag(db))
+    return count, last_id, None if last_updated is None else datetime.fromisoformat(last_updated)
+
+
+async def get_comments_for_events_cached(db: AsyncSession, event_id: int, after: Optional[str] = None,
+                                        limit: int = 10):
+    """
+        Retrieve a page of an event's comments through the read cache. Takes the same arguments as
+        ``get_comments_for_events``.
+
+        The page is read as rows of the ``Comment`` schema's columns and cached as its encoded response body, see
+        ``projection``.
+
+        Returns:
+            str: The page's JSON response body, with ``items`` and ``next_cursor``.
+    """
+    key = await read_cache.namespaced(f"comments:{event_id}", json.dumps([after, limit]))
+
+    async def load():
+        comments, next_cursor = await get_comments_for_events(db=db, event_id=event_id, after=after, limit=limit,
+                                                              columns=COMMENT_COLUMNS)
+        return projection.page_body(comments, next_cursor)
+
+    return await read_cache.get_or_load(key, load, replication_lag(db))
 
 
-def delete_comment(db: Session, comment_id: int, user_id: int):
+async def delete_comment(db: AsyncSession, comment_id: int, user_id: int):
     """
         Delete a comment from the database if the user is the author.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             comment_id (int): The ID of the comment to be deleted.
             user_id (int): The ID of the user attempting to delete the comment.
 
         Returns:
             bool: True if the comment was successfully deleted, False otherwise.
     """
-    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.user_id == user_id).first()
-    if comment:
-        db.delete(comment)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+    query = (delete(Comment).filter(Comment.id == comment_id, Comment.user_id == user_id).returning(Comment.event_id)
+             .execution_options(synchronize_session=False))
+    result = await db.execute(query)
+    row = result.first()
+    if row is None:
+        return False
+    event_id = row.event_id
+    await adjust_comment_counts(db, {event_id: -1})
+    await record_changes(db, upserted={ChangeEntity.event: [event_id]}, deleted={ChangeEntity.comment: [comment_id]})
+    await db.commit()
+    await read_cache.invalidate_namespace(f"comments:{event_id}")
+    await invalidate_event(event_id)
+    await publish_comment("deleted", {"id": comment_id, "event_id": event_id})
+    return True
@@ -1,93 +1,505 @@
-from sqlalchemy.orm import Session
+from collections import defaultdict, deque
+from datetime import datetime
+import json
+from math import cos, radians
+from typing import Collection, Iterable, List, Mapping, Optional, Sequence
+from sqlalchemy import bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.event import Event
-from app.schemas.event import EventCreate, EventUpdate
+from app.schemas import event as event_schemas
+from app.schemas import comment as comment_schemas, user as user_schemas
+from app.schemas.event import EventCreate, EventUpdate, EventSort, EventInclude
+from app.schemas.sync import ChangeEntity
+from app.services.pagination import paginate, MAX_PAGE_SIZE
+from app.services.search import apply_search, search_terms
+from app.services import geo, projection
+from app.services.changes import record_changes
+from app.services.cache import read_cache
+from app.services.database import replication_lag, utcnow
+from app.services.pubsub import publish_comment
+from app.models.comment import Comment
 
+EVENT_COLUMNS = projection.schema_columns(Event, event_schemas.Event)
 
-def create_event(db: Session, event: EventCreate, user_id: int):
+# Candidates loaded per requested result by a radius query, and the factor they grow by when too few.
+NEARBY_CANDIDATES_PER_RESULT = 4
+
+
+async def create_event(db: AsyncSession, event: EventCreate, user_id: int):
     """
-        Create a new event in the database.
+        Create a new event in the database with a single ``INSERT ... RETURNING``.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             event (EventCreate): A schema object containing the details of the event to be created.
             user_id (int): The ID of the user creating the event.
 
         Returns:
             Event: The newly created Event object.
     """
-    db_event = Event(**event.dict(), creator_id=user_id)
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    values = dict(event.model_dump(), creator_id=user_id, geo_cell=geo.cell_for(event.latitude, event.longitude))
+    db_event = await db.scalar(insert(Event).values(**values).returning(Event))
+    await record_changes(db, upserted={ChangeEntity.event: [db_event.id]})
+    await db.commit()
+    await read_cache.invalidate_namespace("events")
     return db_event
 
 
-def get_event(db: Session, event_id: int):
+async def create_events(db: AsyncSession, events: List[EventCreate], user_id: int) -> List[int]:
+    """
+        Create many events in one transaction with a single multi-row ``INSERT ... RETURNING``.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            events (List[EventCreate]): The details of the events to be created.
+            user_id (int): The ID of the user creating the events.
+
+        Returns:
+            List[int]: The IDs of the new events, in the order of ``events``.
+    """
+    if not events:
+        return []
+    rows = [dict(event.model_dump(), creator_id=user_id, geo_cell=geo.cell_for(event.latitude, event.longitude))
+            for event in events]
+    columns = list(EventCreate.model_fields)
+    result = await db.execute(insert(Event.__table__).returning(Event.id, *(Event.__table__.c[c] for c in columns)),
+                              rows)
+    ids = ids_in_row_order(rows, result.mappings(), columns)
+    await record_changes(db, upserted={ChangeEntity.event: ids})
+    await db.commit()
+    await read_cache.invalidate_namespace("events")
+    return ids
+
+
+def ids_in_row_order(rows: Sequence[dict], returned: Iterable[Mapping], columns: Sequence[str]) -> List[int]:
+    """
+        Match the rows returned by a multi-row ``INSERT ... RETURNING`` to the inserted rows.
+
+        Neither PostgreSQL nor SQLite guarantees that ``RETURNING`` follows ``VALUES`` order (and asking SQLAlchemy to
+        sort by parameter order makes it fall back to one statement per row on SQLite), so every returned row is
+        matched by its values in ``columns``. Rows with the same values are interchangeable and get their IDs in
+        ascending order. Datetimes are compared without their time zone, which the ``DateTime`` columns drop.
+
+        Args:
+            rows (Sequence[dict]): The inserted rows, in ``VALUES`` order.
+            returned (Iterable[Mapping]): The returned rows, with ``id`` and ``columns``.
+            columns (Sequence[str]): The inserted columns identifying a row.
+
+        Returns:
+            List[int]: The ID of each inserted row, in the order of ``rows``.
+    """
+    def key(row):
+        return tuple(row[column].replace(tzinfo=None) if isinstance(row[column], datetime) else row[column]
+                     for column in columns)
+
+    ids = defaultdict(deque)
+    for row in sorted(returned, key=lambda row: row["id"]):
+        ids[key(row)].append(row["id"])
+    return [ids[key(row)].popleft() for row in rows]
+
+
+async def get_event(db: AsyncSession, event_id: int):
     """
         Retrieve a single event by its ID.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             event_id (int): The ID of the event to retrieve.
 
         Returns:
             Event: The Event object if found, otherwise None.
     """
-    return db.query(Event).filter(Event.id == event_id).first()
+    result = await db.execute(select(Event).filter(Event.id == event_id))
+    return result.scalars().first()
+
+
+async def get_events(db: AsyncSession, after: Optional[str] = None, limit: int = 10,
+                     starts_after: Optional[datetime] = None, starts_before: Optional[datetime] = None,
+                     location: Optional[str] = None, creator_id: Optional[int] = None,
+                     sort: EventSort = EventSort.id, columns: Optional[Sequence] = None):
+    """
+        Retrieve a page of events, optionally filtered by time window, location and creator, using keyset pagination.
+
+        The filters are served by the ``(location, date_time, id)``, ``(creator_id, date_time, id)`` and
+        ``(date_time, id)`` indexes, so a time window query is an index range scan.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            after (Optional[str], optional): The cursor returned with the previous page.
+            limit (int, optional): The maximum number of items to return.
+            starts_after (Optional[datetime], optional): Only return events starting at or after this time.
+            starts_before (Optional[datetime], optional): Only return events starting before this time.
+            location (Optional[str], optional): Only return events at exactly this location.
+            creator_id (Optional[int], optional): Only return events created by this user.
+            sort (EventSort, optional): Order by ID (``id``), by start time (``date``) or by comment count and
+                latest comment activity, most active first (``popular``).
+            columns (Optional[Sequence], optional): Select only these columns (which must include the sort key) and
+                return rows instead of Event objects.
+
+        Returns:
+            Tuple[List[Event], Optional[str]]: A list of Event objects (or row mappings) and the cursor of the next
+            page, if any.
+    """
+    query = select(Event) if columns is None else select(*columns)
+    if starts_after is not None:
+        query = query.filter(Event.date_time >= starts_after)
+    if starts_before is not None:
+        query = query.filter(Event.date_time < starts_before)
+    if location is not None:
+        query = query.filter(Event.location == location)
+    if creator_id is not None:
+        query = query.filter(Event.creator_id == creator_id)
+    if sort == EventSort.popular:
+        order_by = [Event.comment_count, Event.last_activity_at, Event.id]
+    elif sort == EventSort.date:
+        order_by = [Event.date_time, Event.id]
+    else:
+        order_by = [Event.id]
+    return await paginate(db, query, order_by, after=after, limit=limit, descending=sort == EventSort.popular,
+                          rows=columns is not None)
+
+
+async def get_event_expanded(db: AsyncSession, event_id: int, include: Collection[EventInclude]):
+    """
+        Retrieve a single event together with its creator and/or comments.
+
+        The creator is joined into the event query and the comments are fetched with one ``SELECT ... IN`` query,
+        so the response takes at most two queries whatever the number of comments.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            event_id (int): The ID of the event to retrieve.
+            include (Collection[EventInclude]): The related data to include.
+
+        Returns:
+            dict: The event's response data with the requested ``creator`` and ``comments``, or None if the event
+            doesn't exist.
+    """
+    query = select(Event).filter(Event.id == event_id)
+    if EventInclude.creator in include:
+        query = query.options(joinedload(Event.creator))
+    if EventInclude.comments in include:
+        query = query.options(selectinload(Event.comments))
+    db_event = (await db.execute(query)).scalars().first()
+    if db_event is None:
+        return None
+    data = _event_data(db_event)
+    if EventInclude.creator in include:
+        creator = user_schemas.User.model_validate(db_event.creator, from_attributes=True)
+        data["creator"] = creator.model_dump(mode="json")
+    if EventInclude.comments in include:
+        data["comments"] = [comment_schemas.Comment.model_validate(c, from_attributes=True).model_dump(mode="json")
+                            for c in db_event.comments]
+    return data
+
+
+async def get_event_version(db: AsyncSession, event_id: int) -> Optional[datetime]:
+    """
+        Retrieve when an event last changed, without loading the event.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            event_id (int): The ID of the event.
+
+        Returns:
+            Optional[datetime]: The event's ``updated_at``, or None if the event doesn't exist.
+    """
+    result = await db.execute(select(Event.updated_at).filter(Event.id == event_id))
+    return result.scalar()
+
+
+async def get_event_version_cached(db: AsyncSession, event_id: int) -> Optional[datetime]:
+    """
+        Retrieve when an event last changed through the read cache. Takes the same arguments as
+        ``get_event_version``.
+
+        Returns:
+            Optional[datetime]: The event's ``updated_at``, or None if the event doesn't exist.
+    """
+    async def load():
+        updated_at = await get_event_version(db=db, event_id=event_id)
+        return None if updated_at is None else updated_at.isoformat()
+
+    version = await read_cache.get_or_load(f"event-version:{event_id}", load, replication_lag(db))
+    return None if version is None else datetime.fromisoformat(version)
+
+
+def _event_data(db_event: Event) -> dict:
+    return event_schemas.Event.model_validate(db_event, from_attributes=True).model_dump(mode="json")
+
+
+async def get_event_cached(db: AsyncSession, event_id: int):
+    """
+        Retrieve a single event by its ID through the read cache.
+
+        Args:
+            db (AsyncSession): The database session to use on a cache miss.
+            event_id (int): The ID of the event to retrieve.
+
+        Returns:
+            dict: The event's response data if found, otherwise None.
+    """
+    async def load():
+        db_event = await get_event(db=db, event_id=event_id)
+        return None if db_event is None else _event_data(db_event)
+
+    return await read_cache.get_or_load(f"event:{event_id}", load, replication_lag(db))
+
+
+async def get_events_cached(db: AsyncSession, after: Optional[str] = None, limit: int = 10,
+                            starts_after: Optional[datetime] = None, starts_before: Optional[datetime] = None,
+                            location: Optional[str] = None, creator_id: Optional[int] = None,
+                            sort: EventSort = EventSort.id):
+    """
+        Retrieve a page of events through the read cache. Takes the same arguments as ``get_events``.
+
+        The page is read as rows of the ``Event`` schema's columns and cached as its encoded response body, see
+        ``projection``.
+
+        Returns:
+            str: The page's JSON response body, with ``items`` and ``next_cursor``.
+    """
+    params = [after, limit, starts_after, starts_before, location, creator_id, EventSort(sort).value]
+    key = await read_cache.namespaced("events", json.dumps(params, default=str))
+
+    async def load():
+        events, next_cursor = await get_events(db=db, after=after, limit=limit, starts_after=starts_after,
+                                               starts_before=starts_before, location=location,
+                                               creator_id=creator_id, sort=sort, columns=EVENT_COLUMNS)
+        return projection.page_body(events, next_cursor)
 
+    return await read_cache.get_or_load(key, load, replication_lag(db))
 
-def get_events(db: Session, skip: int = 0, limit: int = 10):
+
+async def invalidate_event(event_id: int):
     """
-        Retrieve a list of events, with optional pagination.
+        Drop a changed event from the read cache, along with every cached event listing.
 
         Args:
-            db (Session): The database session to use for the operation.
-            skip (int, optional): The number of items to skip before starting to collect the result set.
+            event_id (int): The ID of the event that changed.
+    """
+    await read_cache.invalidate(f"event:{event_id}")
+    await read_cache.invalidate(f"event-version:{event_id}")
+    await read_cache.invalidate_namespace("events")
+
+
+async def adjust_comment_counts(db, deltas: Mapping[int, int]):
+    """
+        Add to the ``comment_count`` of events and mark them as active now, in the caller's transaction.
+
+        Every write to comments calls this before committing, so the counts change atomically with the comments.
+        The caller records the events in the change log along with the comments, and invalidates them in the read
+        cache after the commit.
+
+        Args:
+            db (AsyncSession | AsyncConnection): The session or connection of the writing transaction.
+            deltas (Mapping[int, int]): The change in the number of comments, by event ID.
+    """
+    events = Event.__table__
+    params = [{"b_event_id": event_id, "b_delta": delta, "b_now": utcnow()}
+              for event_id, delta in deltas.items() if delta]
+    if not params:
+        return
+    await db.execute(update(events).where(events.c.id == bindparam("b_event_id"))
+                     .values(comment_count=events.c.comment_count + bindparam("b_delta"),
+                             last_activity_at=bindparam("b_now")), params)
+
+
+async def repair_comment_counts(db: AsyncSession, batch_size: int = 10000) -> int:
+    """
+        Recompute ``comment_count`` from the comments table where it has drifted, e.g. after writes that bypassed
+        ``adjust_comment_counts``. ``last_activity_at`` is moved forward to the latest comment where that is later.
+        The repaired events are recorded in the change log.
+
+        The events table is walked in ID ranges of ``batch_size``, one transaction per range. Event listings are
+        dropped from the read cache; cached single events expire with its TTL.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            batch_size (int, optional): The number of event IDs covered per transaction.
+
+        Returns:
+            int: The number of events that were repaired.
+    """
+    events = Event.__table__
+    count = (select(func.count(Comment.id)).where(Comment.event_id == events.c.id).scalar_subquery())
+    latest = (select(func.max(Comment.updated_at)).where(Comment.event_id == events.c.id).scalar_subquery())
+    last_id = (await db.execute(select(func.max(Event.id)))).scalar() or 0
+    repaired = 0
+    for start in range(0, last_id, batch_size):
+        in_range = (events.c.id > start) & (events.c.id <= start + batch_size)
+        result = await db.execute(
+            update(events).where(in_range, events.c.comment_count != count)
+            .values(comment_count=count,
+                    last_activity_at=case((latest > events.c.last_activity_at, latest),
+                                          else_=events.c.last_activity_at))
+            .returning(events.c.id))
+        ids = list(result.scalars())
+        await record_changes(db, upserted={ChangeEntity.event: ids})
+        await db.commit()
+        repaired += len(ids)
+    await read_cache.invalidate_namespace("events")
+    return repaired
+
+
+async def search_events(db: AsyncSession, q: str, limit: int = 10):
+    """
+        Full-text search over event titles and descriptions, best matches first.
+
+        Every word of the query must match (as a word prefix). The lookup goes through the maintained search index
+        (see ``app.services.search``), so its cost does not grow with the size of the events table.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            q (str): The search query.
+            limit (int, optional): The maximum number of items to return.
+
+        Returns:
+            List[Event]: The matching Event objects, ranked by relevance.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+    query = apply_search(select(Event), Event, terms, db.bind.dialect.name)
+    result = await db.execute(query.limit(max(1, min(limit, MAX_PAGE_SIZE))))
+    return result.scalars().all()
+
+
+def _bounding_box_filter(box) -> list:
+    min_lat, max_lat, lon_ranges = box
+    return [
+        or_(*(Event.geo_cell.between(first, last) for first, last in geo.cell_ranges(min_lat, max_lat, lon_ranges))),
+        Event.latitude.between(min_lat, max_lat),
+        or_(*(Event.longitude.between(min_lon, max_lon) for min_lon, max_lon in lon_ranges)),
+    ]
+
+
+async def get_events_nearby(db: AsyncSession, latitude: float, longitude: float, radius_km: float,
+                            limit: int = 10):
+    """
+        Retrieve the events within a radius of a point, nearest first.
+
+        Candidates are fetched through the ``geo_cell`` grid index restricted to the circle's bounding box, then
+        refined with the exact haversine distance (see ``app.services.geo``). The database orders them by their
+        flat-earth distance, which is cheap and close to the true order, and only ``NEARBY_CANDIDATES_PER_RESULT``
+        times ``limit`` of them are loaded, however many events the box holds. When that cap is reached, an
+        index-only count checks that the box around the ``limit``-th nearest candidate holds no other event; if it
+        does (e.g. across the antimeridian, where the flat distance is wrong), the cap grows and the query runs
+        again. The result is always exact.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            latitude (float): The latitude of the centre in degrees.
+            longitude (float): The longitude of the centre in degrees.
+            radius_km (float): The search radius in kilometres.
             limit (int, optional): The maximum number of items to return.
 
         Returns:
-            List[Event]: A list of Event objects.
+            List[Tuple[Event, float]]: The events within the radius and their distance in kilometres, nearest first.
     """
-    return db.query(Event).offset(skip).limit(limit).all()
+    d_lat = Event.latitude - latitude
+    d_lon = (Event.longitude - longitude) * cos(radians(latitude))
+    query = (select(Event).filter(*_bounding_box_filter(geo.bounding_box(latitude, longitude, radius_km)))
+             .order_by(d_lat * d_lat + d_lon * d_lon, Event.id))
+    cap = limit * NEARBY_CANDIDATES_PER_RESULT
+    while True:
+        candidates = (await db.execute(query.limit(cap))).scalars().all()
+        distances = ((db_event, geo.haversine_km(latitude, longitude, db_event.latitude, db_event.longitude))
+                     for db_event in candidates)
+        nearby = sorted((pair for pair in distances if pair[1] <= radius_km), key=lambda pair: pair[1])
+        if len(candidates) < cap:
+            return nearby[:limit]
+        # Every event as near as the limit-th nearest candidate lies in that distance's box; none was missed if
+        # the box holds no event beyond the candidates.
+        reach = nearby[limit - 1][1] if len(nearby) >= limit else radius_km
+        box = geo.bounding_box(latitude, longitude, reach)
+        seen = sum(geo.in_bounding_box(db_event.latitude, db_event.longitude, box) for db_event in candidates)
+        if await db.scalar(select(func.count()).select_from(Event).filter(*_bounding_box_filter(box))) <= seen:
+            return nearby[:limit]
+        cap *= NEARBY_CANDIDATES_PER_RESULT
 
 
-def update_event(db: Session, event_id: int, event: EventUpdate):
+async def get_event_creator_id(db: AsyncSession, event_id: int) -> Optional[int]:
     """
-        Update the details of an existing event.
+        Retrieve the ID of the user who created an event.
+
+        Used to tell a missing event from one the user may not change after a conditional write matched no row.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
+            event_id (int): The ID of the event.
+
+        Returns:
+            Optional[int]: The creator's user ID, or None if the event doesn't exist.
+    """
+    return await db.scalar(select(Event.creator_id).filter(Event.id == event_id))
+
+
+async def update_event(db: AsyncSession, event_id: int, event: EventUpdate, creator_id: Optional[int] = None):
+    """
+        Update the details of an existing event with a single ``UPDATE ... RETURNING``.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
             event_id (int): The ID of the event to update.
             event (EventUpdate): A schema object containing the updated details of the event.
+            creator_id (Optional[int], optional): Only update the event if this user created it.
 
         Returns:
-            Event: The updated Event object, or None if the event doesn't exist.
+            Event: The updated Event object, or None if no event matched.
     """
-    db_event = get_event(db=db, event_id=event_id)
-    if db_event:
-        update_data = event.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_event, key, value)
-        db.commit()
-        db.refresh(db_event)
-        return db_event
-    return None
+    values = event.dict(exclude_unset=True)
+    if "latitude" in values and "longitude" in values:
+        values["geo_cell"] = geo.cell_for(values["latitude"], values["longitude"])
+    query = update(Event).filter(Event.id == event_id).values(**values).returning(Event)
+    if creator_id is not None:
+        query = query.filter(Event.creator_id == creator_id)
+    db_event = (await db.scalars(query.execution_options(synchronize_session=False))).first()
+    if db_event is None:
+        return None
+    geo_cell = geo.cell_for(db_event.latitude, db_event.longitude)
+    if geo_cell != db_event.geo_cell:
+        # Only one coordinate changed, so the cell also depends on the stored one.
+        await db.execute(update(Event).filter(Event.id == event_id).values(geo_cell=geo_cell)
+                         .execution_options(synchronize_session=False))
+        set_committed_value(db_event, "geo_cell", geo_cell)
+    await record_changes(db, upserted={ChangeEntity.event: [event_id]})
+    await db.commit()
+    await invalidate_event(event_id)
+    return db_event
 
 
-def delete_event(db: Session, event_id: int):
+async def delete_event(db: AsyncSession, event_id: int, creator_id: Optional[int] = None) -> bool:
     """
-        Delete an event from the database.
+        Delete an event and its comments, with one ``DELETE`` per table whatever the number of comments, record
+        their tombstones in the change log and tell the event's stream subscribers about the deleted comments.
+
+        The comments go first, as they reference the event. Their ``DELETE`` carries the same conditions as the
+        event's, so a refused delete removes nothing and is not committed.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             event_id (int): The ID of the event to delete.
+            creator_id (Optional[int], optional): Only delete the event if this user created it.
 
         Returns:
-            Event: The deleted Event object, or None if the event doesn't exist.
+            bool: True if the event was deleted, False if no event matched.
     """
-    db_event = get_event(db=db, event_id=event_id)
-    if db_event:
-        db.delete(db_event)
-        db.commit()
-        return db_event
-    return None
+    conditions = [Event.id == event_id]
+    if creator_id is not None:
+        conditions.append(Event.creator_id == creator_id)
+    result = await db.execute(delete(Comment).filter(Comment.event_id == event_id, select(Event.id).filter(
+        *conditions).exists()).returning(Comment.id).execution_options(synchronize_session=False))
+    comment_ids = list(result.scalars())
+    query = delete(Event).filter(*conditions).returning(Event.id)
+    if await db.scalar(query.execution_options(synchronize_session=False)) is None:
+        return False
+    await record_changes(db, deleted={ChangeEntity.event: [event_id], ChangeEntity.comment: comment_ids})
+    await db.commit()
+    await invalidate_event(event_id)
+    await read_cache.invalidate_namespace(f"comments:{event_id}")
+    for comment_id in comment_ids:
+        await publish_comment("deleted", {"id": comment_id, "event_id": event_id})
+    return True
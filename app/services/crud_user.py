@@ -1,134 +1,187 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from passlib.context import CryptContext
+from collections import Counter
+from typing import Optional, Sequence
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app.models.user import User
+from app.schemas import user as user_schemas
 from app.schemas.user import UserCreate
+from app.schemas.sync import ChangeEntity
+from app.services.hashing import password_hasher
+from app.services.cache import identity_cache, read_cache
+from app.services.changes import record_changes
+from app.services.crud_event import adjust_comment_counts, invalidate_event
+from app.services.pagination import paginate
+from app.services.pubsub import publish_comment
+from app.services import projection
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+USER_COLUMNS = projection.schema_columns(User, user_schemas.User)
 
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """
         Retrieve a user by their username.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             username (str): The username of the user to retrieve.
 
         Returns:
             User: The User object if found, otherwise None.
     """
-    return db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).filter(User.username == username))
+    return result.scalars().first()
 
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """
         Retrieve a user by their email.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             email (str): The email of the user to retrieve.
 
         Returns:
             User: The User object if found, otherwise None.
     """
-    return db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalars().first()
 
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     """
-        Create a new user in the database.
+        Create a new user in the database with a single ``INSERT ... RETURNING``.
+
+        Uniqueness of the username and email is left to the table's unique constraints rather than checked with a
+        query beforehand, which would also leave a window for a concurrent registration.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             user (UserCreate): A schema object containing the details of the user to be created.
 
         Returns:
             User: The newly created User object.
 
         Raises:
+            HTTPException: 400 error if the username or email is already registered, 503 error if the password
+                hashing pool is saturated.
             SQLAlchemyError: If there is an issue committing to the database.
     """
-    hashed_password_ = pwd_context.hash(user.password)
-    db_user = User(username=user.username, email=user.email, hashed_password=hashed_password_)
-    db.add(db_user)
+    hashed_password_ = await password_hasher.hash(user.password)
+    query = insert(User).values(username=user.username, email=user.email, hashed_password=hashed_password_)
     try:
-        db.commit()
-        db.refresh(db_user)
+        db_user = await db.scalar(query.returning(User))
+        await record_changes(db, upserted={ChangeEntity.user: [db_user.id]})
+        await db.commit()
         return db_user
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="User already registered")
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
 
-def get_user(db: Session, user_id: int):
+async def get_user(db: AsyncSession, user_id: int):
     """
         Retrieve a user by their user ID.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             user_id (int): The ID of the user to retrieve.
 
         Returns:
             User: The User object if found, otherwise None.
     """
-    return db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).filter(User.id == user_id))
+    return result.scalars().first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 10):
+async def get_users(db: AsyncSession, after: Optional[str] = None, limit: int = 10,
+                    columns: Optional[Sequence] = None):
     """
-        Retrieve a list of users, with optional pagination.
+        Retrieve a page of users ordered by ID, using keyset pagination.
 
         Args:
-            db (Session): The database session to use for the operation.
-            skip (int, optional): The number of items to skip before starting to collect the result set.
+            db (AsyncSession): The database session to use for the operation.
+            after (Optional[str], optional): The cursor returned with the previous page.
             limit (int, optional): The maximum number of items to return.
+            columns (Optional[Sequence], optional): Select only these columns (which must include the ID) and return
+                rows instead of User objects.
 
         Returns:
-            List[User]: A list of User objects.
+            Tuple[List[User], Optional[str]]: A list of User objects (or row mappings) and the cursor of the next
+            page, if any.
     """
-    return db.query(User).offset(skip).limit(limit).all()
+    query = select(User) if columns is None else select(*columns)
+    return await paginate(db, query, [User.id], after=after, limit=limit, rows=columns is not None)
 
 
-def update_user(db: Session, user_id: int, user: UserCreate):
+async def update_user(db: AsyncSession, user_id: int, user: UserCreate):
     """
         Update the details of an existing user.
 
+        Bumps the user's token version, which revokes every access token issued before the update,
+        and evicts the user from the authentication identity cache.
+
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             user_id (int): The ID of the user to update.
             user (UserCreate): A schema object containing the updated details of the user.
 
         Returns:
             User: The updated User object, or None if the user doesn't exist.
     """
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         return None
     for var, value in vars(user).items():
         setattr(db_user, var, value) if value else None
+    db_user.token_version = User.token_version + 1
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await record_changes(db, upserted={ChangeEntity.user: [user_id]})
+    await db.commit()
+    await db.refresh(db_user)
+    identity_cache.delete(user_id)
     return db_user
 
 
-def delete_user(db: Session, user_id: int):
+async def delete_user(db: AsyncSession, user_id: int):
     """
-        Delete a user from the database.
+        Delete a user from the database and evict it from the authentication identity cache.
+
+        The user's events and comments are deleted with it, so they are dropped from the read cache as well, the
+        change log records tombstones for all of them, and the stream subscribers of their events are told about the
+        deleted comments.
 
         Args:
-            db (Session): The database session to use for the operation.
+            db (AsyncSession): The database session to use for the operation.
             user_id (int): The ID of the user to delete.
 
         Returns:
             User: The deleted User object, or None if the user doesn't exist.
     """
-    db_user = get_user(db, user_id)
+    db_user = await get_user(db, user_id)
     if not db_user:
         return None
 
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    # The cascade has loaded the user's events and comments, and the events' comments, to delete them.
+    event_ids = {db_event.id for db_event in db_user.events}
+    removed = Counter(db_comment.event_id for db_comment in db_user.comments if db_comment.event_id not in event_ids)
+    comments = {db_comment.id: db_comment.event_id for db_comment in db_user.comments}
+    comments.update((db_comment.id, db_event.id) for db_event in db_user.events for db_comment in db_event.comments)
+    await adjust_comment_counts(db, {event_id: -count for event_id, count in removed.items()})
+    await record_changes(db, upserted={ChangeEntity.event: removed},
+                         deleted={ChangeEntity.user: [user_id], ChangeEntity.event: event_ids,
+                                  ChangeEntity.comment: comments})
+    await db.commit()
+    identity_cache.delete(user_id)
+    for event_id in event_ids.union(removed):
+        await invalidate_event(event_id)
+        await read_cache.invalidate_namespace(f"comments:{event_id}")
+    for comment_id, event_id in comments.items():
+        await publish_comment("deleted", {"id": comment_id, "event_id": event_id})
     return db_user
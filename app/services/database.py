@@ -1,36 +1,363 @@
 """
 This script sets up the database connection and session management for the application.
 It utilizes SQLAlchemy for ORM and database interaction, leveraging environment variables to manage configuration securely.
+
+The application talks to the database through SQLAlchemy's asyncio extension so that route handlers never block
+the event loop while a query is in flight. ``DATABASE_URL`` may be given with a synchronous driver
+(e.g. ``postgresql://`` or ``sqlite:///``); it is mapped to the matching async driver (asyncpg / aiosqlite).
+
+Read-only routes take their session from ``get_read_db``, which sends them round-robin to the read replicas listed in
+``DATABASE_REPLICA_URLS`` and falls back to the next replica, then to the primary, when one cannot be reached. A
+client that has just committed a write reads from the primary for ``READ_YOUR_WRITES_SECONDS``, so it sees its own
+changes despite replication lag. Clients are told apart by the ``uid`` claim of their bearer token, which is only
+used for routing here and is verified by ``authentication`` as usual. The replica engines go through the same
+``on_engine_created`` callbacks as the primary, so their statements and pools are instrumented too.
+
+Configuration (environment variables, read into ``app.settings.Settings``):
+    DATABASE_URL: The primary database.
+    DATABASE_REPLICA_URLS: Comma separated read replica URLs (default: none, every read goes to the primary).
+    DB_POOL_SIZE: Connections kept open per engine (default 5).
+    DB_MAX_OVERFLOW: Connections opened beyond the pool size under load (default 10).
+    DB_POOL_TIMEOUT: Seconds to wait for a connection before failing (default 30).
+    DB_POOL_RECYCLE: Replace connections older than this many seconds; -1 never does (default -1).
+    DB_POOL_PRE_PING: Test each connection with a round trip when it is checked out (default false).
+    READ_YOUR_WRITES_SECONDS: How long a client's reads stay on the primary after it writes (default 5).
+
+SQLite databases do not use a sized connection pool, so the size, overflow and timeout settings only apply to
+server databases.
+
+Importing this module has no side effects and reads no configuration: ``main.create_app`` passes its settings to
+``configure``, and scripts that use the sessions without the application get ``Settings.from_env()`` on first use.
+The engines are created on first use too (``get_engine``, or the first session). Neither opens a connection, and
+the schema is never created implicitly; deployed databases are migrated with Alembic (``alembic upgrade head``) and
+``init_db`` serves tests and throwaway databases.
 """
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
+from sqlalchemy.orm import Session
+from app.services.cache import LRUCache
+from app.settings import Settings
+import logging
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url) -> URL:
+    """
+        Map a database URL onto the equivalent asyncio driver.
+
+        Args:
+            url (str | URL): The configured database URL.
+
+        Returns:
+            URL: The URL using an async driver. URLs that already name an async driver are returned unchanged.
+    """
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def utcnow() -> datetime:
+    """
+        Return the current UTC time as a naive datetime, the form timestamps are stored in.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options(url, settings: Optional[Settings] = None) -> dict:
+    """
+        Build the connection pool arguments of ``create_async_engine`` from the configuration.
+
+        Args:
+            url (str | URL): The database URL the engine is created for.
+            settings (Optional[Settings], optional): The pool settings; the configured ones by default.
+
+        Returns:
+            dict: The pool keyword arguments; SQLite URLs only get pre-ping and recycle.
+    """
+    settings = settings or get_settings()
+    options = {"pool_pre_ping": settings.db_pool_pre_ping, "pool_recycle": settings.db_pool_recycle}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow,
+                       pool_timeout=settings.db_pool_timeout)
+    return options
+
+
+class PrimarySession(Session):
+    """
+        Session class of the primary database. Commits mark the session's client for read-your-writes.
+    """
+
+
+# Clients that committed a write recently, keyed by ``client_key``. ``configure`` sets the TTL.
+recent_writers = LRUCache(maxsize=100000, ttl=Settings.read_your_writes_seconds)
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_writer(session):
+    client = session.info.get("client")
+    if client is not None:
+        recent_writers.set(client, True)
+
+
+def client_key(request: Optional[Request]) -> Optional[str]:
+    """
+        Identify the client of a request for read-your-writes routing.
+
+        Args:
+            request (Optional[Request]): The incoming request.
+
+        Returns:
+            Optional[str]: ``user:<uid>`` from the bearer token's claims, or None for anonymous requests. The token
+            is not verified; the key only decides which database serves the request.
+    """
+    if request is None:
+        return None
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        uid = jwt.get_unverified_claims(token).get("uid")
+    except JWTError:
+        return None
+    return None if uid is None else f"user:{uid}"
+
+
+class ReplicaSet:
+    """
+        Session factories for the read replicas, handed out round-robin. The engines are created on first use.
+
+        Args:
+            urls (List[str]): The replica database URLs.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = list(urls)
+        self._engines: List[AsyncEngine] = []
+        self._sessionmakers: List[async_sessionmaker] = []
+        self._next = 0
+
+    @property
+    def sessionmakers(self) -> List[async_sessionmaker]:
+        if len(self._sessionmakers) < len(self.urls):
+            self._engines = [create_async_engine(to_async_url(url), **engine_options(url)) for url in self.urls]
+            self._sessionmakers = [async_sessionmaker(bind=replica, autoflush=False, expire_on_commit=False,
+                                                      info={"replica": True}) for replica in self._engines]
+            for index, replica in enumerate(self._engines):
+                for callback in _engine_callbacks:
+                    callback(replica, f"replica{index}")
+        return self._sessionmakers
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        """
+            The replica engines created so far, named ``replica<index>`` in the order of ``urls``.
+        """
+        return self._engines
+
+    def candidates(self) -> List[async_sessionmaker]:
+        """
+            Return every replica session factory, starting with the next one in round-robin order.
+        """
+        sessionmakers = self.sessionmakers
+        start = self._next
+        self._next = (start + 1) % len(sessionmakers) if sessionmakers else 0
+        return sessionmakers[start:] + sessionmakers[:start]
 
+    async def dispose(self):
+        """
+            Close the connections of every replica engine.
+        """
+        for replica in self._engines:
+            await replica.dispose()
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(url=DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class PrimarySessionmaker(async_sessionmaker):
+    """
+        Session factory of the primary database, bound to the engine when the first session is made.
+    """
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+_settings: Optional[Settings] = None
+_engine: Optional[AsyncEngine] = None
+_engine_callbacks: List[Callable[[AsyncEngine, str], None]] = []
+SessionLocal = PrimarySessionmaker(autoflush=False, expire_on_commit=False, sync_session_class=PrimarySession)
+replicas = ReplicaSet([])
 Base = declarative_base()
 
-Base.metadata.create_all(engine)
+
+def configure(settings: Settings):
+    """
+        Set the settings the engines are created with: the database URLs, the pool sizing and the read-your-writes
+        window.
+
+        Args:
+            settings (Settings): The application settings.
+
+        Raises:
+            RuntimeError: If the primary engine already exists for another URL.
+    """
+    global _settings, replicas
+    if _engine is not None and settings.database_url != _settings.database_url:
+        raise RuntimeError("The database engine was already created for another URL")
+    _settings = settings
+    recent_writers.ttl = settings.read_your_writes_seconds
+    if settings.database_replica_urls != replicas.urls:
+        replicas = ReplicaSet(settings.database_replica_urls)
+
+
+def get_settings() -> Settings:
+    """
+        Return the settings given to ``configure``, or read them from the environment if it was never called.
+    """
+    if _settings is None:
+        configure(Settings.from_env())
+    return _settings
+
+
+def get_engine() -> AsyncEngine:
+    """
+        Return the primary database engine, creating it on first use. Creating it does not connect.
+
+        Raises:
+            RuntimeError: If no database URL is configured.
+
+        Returns:
+            AsyncEngine: The primary engine, shared by every session of ``SessionLocal``.
+    """
+    global _engine
+    if _engine is None:
+        url = get_settings().database_url
+        if not url:
+            raise RuntimeError("DATABASE_URL is not set")
+        _engine = create_async_engine(to_async_url(url), **engine_options(url))
+        SessionLocal.configure(bind=_engine)
+        for callback in _engine_callbacks:
+            callback(_engine, "primary")
+    return _engine
+
+
+def on_engine_created(callback: Callable[[AsyncEngine, str], None]):
+    """
+        Run a callback with every engine once it exists (right away for those that already do), e.g. to instrument
+        it: the primary and each read replica. A callback registered twice runs once.
+
+        Args:
+            callback (Callable[[AsyncEngine, str], None]): Called with the engine and its name, ``primary`` or
+                ``replica<index>``.
+    """
+    if callback in _engine_callbacks:
+        return
+    _engine_callbacks.append(callback)
+    if _engine is not None:
+        callback(_engine, "primary")
+    for index, replica in enumerate(replicas.engines):
+        callback(replica, f"replica{index}")
 
 
-def get_db():
+def replication_lag(db) -> float:
+    """
+        Return how far the reads of a session may lag behind the latest commits: ``READ_YOUR_WRITES_SECONDS`` on a
+        read replica, 0 on the primary. ``read_cache`` does not cache what a lagging read loads right after an
+        invalidation, as it may predate the write.
+
+        Args:
+            db (AsyncSession): The session of the read.
+
+        Returns:
+            float: The lag in seconds.
+    """
+    return get_settings().read_your_writes_seconds if db.info.get("replica") else 0.0
+
+
+def __getattr__(name: str):
+    # ``database.engine`` stays available for callers that need the engine itself; it is created on access.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def init_db():
+    """
+        Create any missing tables for the registered models.
+
+        The application schema is managed with Alembic (``alembic upgrade head``); this helper is meant for tests
+        and throwaway local databases. It must run after the models have been imported so that they are
+        registered on ``Base.metadata``.
+    """
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def get_db(request: Request = None):
     """
         Dependency that provides a SQLAlchemy session and ensures it's closed after use.
 
-        This is a generator that yields a database session and closes it after the request is processed.
+        This is an async generator that yields a database session and closes it after the request is processed.
         It's typically used as a dependency in route handlers to provide a session for database operations.
+        The session is bound to the primary database; committing it sends the client's reads to the primary for
+        ``READ_YOUR_WRITES_SECONDS``.
+
+        Args:
+            request (Request, optional): The incoming request, used to identify the client.
 
         Yields:
-            Session: The SQLAlchemy database session.
+            AsyncSession: The SQLAlchemy asyncio database session.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
+        db.info["client"] = client_key(request)
+        yield db
+
+
+async def get_read_db(request: Request = None):
+    """
+        Dependency that provides a session for read-only routes, on a read replica when possible.
+
+        Replicas are tried in round-robin order; one whose connection fails is skipped. The primary serves the
+        request when no replica is configured or reachable, or when the client wrote within
+        ``READ_YOUR_WRITES_SECONDS``. Routes must not write through this session.
+
+        Args:
+            request (Request, optional): The incoming request, used to identify the client.
+
+        Yields:
+            AsyncSession: The SQLAlchemy asyncio database session.
+    """
+    get_settings()  # Reads the replica URLs if the application did not configure them
+    client = client_key(request)
+    if client is None or recent_writers.get(client) is None:
+        for make_session in replicas.candidates():
+            db = make_session()
+            try:
+                await db.connection()
+            except (DBAPIError, OSError) as error:
+                logger.warning(f"Read replica {db.bind.url.render_as_string()} unavailable: {error}")
+                await db.close()
+                continue
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,60 @@
+"""
+This module streams whole tables out of the database as NDJSON (one JSON object per line).
+
+Rows are read through a server-side cursor (``AsyncSession.stream`` with ``yield_per``) as plain column tuples, not
+ORM objects, and each batch is encoded and handed on before the next one is fetched. Memory use is bounded by the
+batch size whatever the size of the table. The columns are those of the public response schemas, so an exported row
+has the fields the API returns for it; password hashes never leave the database.
+
+Used by the ``/export`` routes and by ``python cli.py export``.
+"""
+
+from enum import Enum
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from app.models.comment import Comment
+from app.models.event import Event
+from app.models.user import User
+from app.schemas import comment as comment_schemas, event as event_schemas, user as user_schemas
+from app.services import projection
+from app.services.database import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportTable(str, Enum):
+    events = "events"
+    comments = "comments"
+    users = "users"
+
+
+# The model and the columns of the list endpoint's schema of every exported table.
+EXPORT_TABLES = {
+    ExportTable.events: (Event, projection.schema_columns(Event, event_schemas.Event)),
+    ExportTable.comments: (Comment, projection.schema_columns(Comment, comment_schemas.Comment)),
+    ExportTable.users: (User, projection.schema_columns(User, user_schemas.User)),
+}
+
+
+async def export_ndjson(table: ExportTable, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """
+        Stream every row of a table as NDJSON, in primary key order.
+
+        The generator opens its own session, so it can outlive the request that started it (a ``StreamingResponse``
+        keeps iterating after the route returns).
+
+        Args:
+            table (ExportTable): The table to export.
+            batch_size (int, optional): The number of rows fetched from the cursor and emitted per chunk.
+
+        Yields:
+            str: Chunks of up to ``batch_size`` newline terminated JSON objects.
+    """
+    model, columns = EXPORT_TABLES[ExportTable(table)]
+    query = select(*columns).order_by(model.id).execution_options(yield_per=batch_size)
+    async with SessionLocal() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield "".join(projection.dumps(row._asdict()) + "\n" for row in rows)
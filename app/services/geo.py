@@ -0,0 +1,124 @@
+"""
+This module implements the grid-cell spatial index used to answer "events near me" queries.
+
+The globe is cut into a fixed grid of ``CELL_DEGREES`` x ``CELL_DEGREES`` cells, numbered row by row from the
+south-west corner, and every event with coordinates stores the number of the cell it falls in (``events.geo_cell``,
+indexed). A radius query:
+
+1. computes the latitude/longitude bounding box of the circle,
+2. turns the box into a handful of contiguous ``geo_cell`` ranges (one per grid row, merged where possible), which the
+   database answers with index range scans, also checking the exact box on the index entries,
+3. refines the candidates with the exact haversine distance.
+
+Only rows in the cells around the circle are ever touched, however many events the table holds. When only the
+nearest few are wanted, ``crud_event.get_events_nearby`` also caps the candidates it loads, see there.
+"""
+
+from math import asin, cos, degrees, pi, radians, sin, sqrt
+from typing import List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 2 * pi * EARTH_RADIUS_KM / 360
+
+CELL_DEGREES = 0.1
+ROWS = int(round(180 / CELL_DEGREES))
+COLS = int(round(360 / CELL_DEGREES))
+
+
+def _row(latitude: float) -> int:
+    return min(max(int((latitude + 90) / CELL_DEGREES), 0), ROWS - 1)
+
+
+def _col(longitude: float) -> int:
+    return min(max(int((longitude + 180) / CELL_DEGREES), 0), COLS - 1)
+
+
+def cell_for(latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+    """
+        Return the grid cell number of a point.
+
+        Args:
+            latitude (Optional[float]): The latitude in degrees.
+            longitude (Optional[float]): The longitude in degrees.
+
+        Returns:
+            Optional[int]: The cell number, or None if either coordinate is missing.
+    """
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * COLS + _col(longitude)
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """
+        Compute the bounding box of a circle on the sphere.
+
+        Args:
+            latitude (float): The latitude of the centre in degrees.
+            longitude (float): The longitude of the centre in degrees.
+            radius_km (float): The radius in kilometres.
+
+        Returns:
+            Tuple[float, float, List[Tuple[float, float]]]: The minimum and maximum latitude and the longitude ranges
+            covered; there are two ranges when the box crosses the antimeridian.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+
+    ratio = sin(radius_km / EARTH_RADIUS_KM) / cos(radians(latitude))
+    if ratio >= 1:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+    delta_lon = degrees(asin(ratio))
+    min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+    if min_lon < -180:
+        return min_lat, max_lat, [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+def in_bounding_box(latitude: float, longitude: float,
+                    box: Tuple[float, float, List[Tuple[float, float]]]) -> bool:
+    """
+        Tell whether a point lies in a bounding box returned by ``bounding_box`` (edges included).
+    """
+    min_lat, max_lat, lon_ranges = box
+    return min_lat <= latitude <= max_lat and any(min_lon <= longitude <= max_lon for min_lon, max_lon in lon_ranges)
+
+
+def cell_ranges(min_lat: float, max_lat: float, lon_ranges: List[Tuple[float, float]]) -> List[Tuple[int, int]]:
+    """
+        Cover a bounding box with inclusive ranges of cell numbers.
+
+        Args:
+            min_lat (float): The minimum latitude of the box.
+            max_lat (float): The maximum latitude of the box.
+            lon_ranges (List[Tuple[float, float]]): The longitude ranges of the box.
+
+        Returns:
+            List[Tuple[int, int]]: Sorted, non-overlapping ``(first, last)`` cell number ranges.
+    """
+    ranges = sorted(
+        (row * COLS + _col(min_lon), row * COLS + _col(max_lon))
+        for row in range(_row(min_lat), _row(max_lat) + 1)
+        for min_lon, max_lon in lon_ranges
+    )
+    merged: List[Tuple[int, int]] = []
+    for first, last in ranges:
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+        Return the great-circle distance between two points in kilometres.
+    """
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
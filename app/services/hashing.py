@@ -0,0 +1,148 @@
+"""
+This module runs bcrypt password hashing and verification in a bounded process pool.
+
+A single bcrypt call burns 100-300 ms of CPU. Running it inside an async route handler freezes every other request
+served by the same worker, so the work is shipped to a ``ProcessPoolExecutor`` instead. The number of hashing jobs
+that may be queued or running at once is capped; once the cap is reached new callers get an immediate
+503 Service Unavailable rather than waiting in an unbounded queue, so a login storm cannot starve the rest of the API.
+
+Configuration (environment variables, read into ``app.settings.Settings`` and applied by ``PasswordHasher.configure``):
+    PASSWORD_HASH_WORKERS: Number of worker processes (defaults to the number of CPUs).
+    PASSWORD_HASH_QUEUE_LIMIT: Maximum number of pending hash/verify jobs (defaults to 4 per worker).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.services.metrics import password_hash_duration
+from app.settings import Settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _timed(fn, *args):
+    # Runs in the worker process, so the measured time excludes queueing and pickling.
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+        Runs bcrypt work in a lazily started process pool with a bounded number of pending jobs.
+
+        Args:
+            max_workers (Optional[int], optional): The number of worker processes; the number of CPUs by default.
+            queue_limit (Optional[int], optional): The maximum number of jobs that may be queued or running at the
+                same time; 4 per worker by default.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, queue_limit: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit or 4 * self.max_workers
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def configure(self, settings: Settings):
+        """
+            Apply the pool settings; the worker count only takes effect if the pool has not been started yet.
+        """
+        self.max_workers = settings.password_hash_workers or os.cpu_count() or 1
+        self.queue_limit = settings.password_hash_queue_limit or 4 * self.max_workers
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        # The event loop is single threaded, so the counter needs no lock.
+        if self.pending >= self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing is at capacity, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, seconds = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+            password_hash_duration.observe(seconds, fn.__name__.lstrip("_"))
+            return result
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+            Hash a password using bcrypt in the worker pool.
+
+            Args:
+                password (str): The plain text password to hash.
+
+            Returns:
+                str: The hashed password.
+
+            Raises:
+                HTTPException: 503 error if the pool already has ``queue_limit`` pending jobs.
+        """
+        return await self._submit(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+            Verify a password against a bcrypt hash in the worker pool.
+
+            Args:
+                plain_password (str): The plain text password to verify.
+                hashed_password (str): The hashed password to compare against.
+
+            Returns:
+                bool: True if the password is correct, False otherwise.
+
+            Raises:
+                HTTPException: 503 error if the pool already has ``queue_limit`` pending jobs.
+        """
+        return await self._submit(_verify, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+            Hash a batch of passwords in parallel across the worker pool.
+
+            Meant for offline jobs such as the bulk importer: the batch is not subject to ``queue_limit``.
+
+            Args:
+                passwords (List[str]): The plain text passwords to hash.
+
+            Returns:
+                List[str]: The hashed passwords, in the order of ``passwords``.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        results = await asyncio.gather(*(loop.run_in_executor(executor, _timed, _hash, password)
+                                         for password in passwords))
+        for _, seconds in results:
+            password_hash_duration.observe(seconds, "hash")
+        return [hashed for hashed, _ in results]
+
+    def shutdown(self):
+        """
+            Stop the worker processes. The pool is started again on the next call.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,368 @@
+"""
+This module bulk loads users, events and comments from CSV or NDJSON files, bypassing the ORM.
+
+Records are read from the file in batches and validated with the API's create schemas (``UserCreate``,
+``EventCreate``, ``CommentCreate``). The valid rows of a batch are written in one transaction with
+``COPY ... FROM STDIN`` on PostgreSQL (asyncpg's ``copy_records_to_table``) and a batched ``executemany`` INSERT
+elsewhere. Passwords are hashed in parallel across the password hashing process pool.
+
+Foreign keys refer to the ``id`` values of the source system. Every imported row with a source ``id`` is recorded
+in an ID map (``<state dir>/<table>.ids``, one ``source,target`` line per row). The maps are loaded into memory to
+resolve ``creator_id`` of events and ``event_id``/``user_id`` of comments, so import users first, then events, then
+comments, with the same state directory. Records that fail validation or reference unknown rows are written to
+``<state dir>/<table>.rejects.ndjson`` with their position in the file and the reasons. Importing comments updates
+the events' comment counts in the same transaction. The imported rows (and the events whose counts changed) are
+appended to the change log, so offline clients pick them up with their next sync.
+
+Imports are resumable. ``<state dir>/<table>.checkpoint.json`` holds the number of records consumed. Before a batch
+is written, the checkpoint records it as pending, with the table's highest ID and the batch's rows; if the process
+dies before the checkpoint moves past the batch, the next run checks whether the pending rows were committed and
+finishes or retries the batch accordingly, so no batch is loaded twice. New IDs are read back as the rows above the
+previous highest ID, so nothing else may insert into the table while a batch is loading; on PostgreSQL the table is
+locked against writes for the duration of each batch.
+
+The import runs outside the API process, so API workers may serve cached reads of the imported tables until their
+read cache entries expire.
+"""
+
+import csv
+from collections import Counter
+import json
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.comment import Comment
+from app.models.event import Event
+from app.models.user import User
+from app.schemas.comment import CommentCreate
+from app.schemas.event import EventCreate
+from app.schemas.sync import ChangeEntity
+from app.schemas.user import UserCreate
+from app.services import geo
+from app.services.bulk import validate_items
+from app.services.changes import record_changes
+from app.services.crud_event import adjust_comment_counts
+from app.services.database import get_engine, utcnow
+from app.services.hashing import password_hasher
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Any]:
+    """
+        Read the records of a CSV (with a header row) or NDJSON file.
+
+        Empty CSV cells are read as missing values. NDJSON lines that are not valid JSON are passed on as the raw
+        string, so that validation rejects them like any other bad record.
+
+        Args:
+            path (str): The file to read.
+            fmt (Optional[str], optional): ``csv`` or ``ndjson``; guessed from the file extension if omitted.
+
+        Yields:
+            Any: One record per data row or line, normally a dict.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format {fmt!r}, expected one of {', '.join(IMPORT_FORMATS)}")
+    with open(path, newline="", encoding="utf-8") as source:
+        if fmt == "csv":
+            for row in csv.DictReader(source):
+                yield {key: value for key, value in row.items() if value != ""}
+            return
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line.rstrip("\n")
+
+
+class Batch:
+    """
+        The outcome of preparing a batch of records: the rows to insert and the records that were rejected.
+
+        Args:
+            start (int): The position in the file of the batch's first record.
+            size (int): The number of records in the batch.
+    """
+
+    def __init__(self, start: int, size: int):
+        self.start = start
+        self.end = start + size
+        self.rows: List[Dict[str, Any]] = []
+        self.source_ids: List[Optional[str]] = []
+        self.rejects: List[dict] = []
+
+    def add(self, row: Dict[str, Any], source_id):
+        self.rows.append(row)
+        self.source_ids.append(None if source_id is None else str(source_id))
+
+    def reject(self, position: int, errors: List[str]):
+        self.rejects.append({"position": position, "errors": errors})
+
+
+class ImportState:
+    """
+        The checkpoint, ID maps and reject log of an import, kept in a state directory.
+
+        Args:
+            state_dir (str): The directory holding the files of the import.
+            table (str): The table being imported.
+    """
+
+    def __init__(self, state_dir: str, table: str):
+        self.dir = Path(state_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.checkpoint_path = self.dir / f"{table}.checkpoint.json"
+        self.rejects_path = self.dir / f"{table}.rejects.ndjson"
+        self.checkpoint = {"source": None, "position": 0, "imported": 0, "rejected": 0, "pending": None}
+        if self.checkpoint_path.exists():
+            self.checkpoint.update(json.loads(self.checkpoint_path.read_text()))
+
+    def save(self):
+        # Write then rename, so a crash never leaves a truncated checkpoint behind.
+        partial = self.checkpoint_path.with_suffix(".tmp")
+        partial.write_text(json.dumps(self.checkpoint))
+        os.replace(partial, self.checkpoint_path)
+
+    def id_map(self, table: str) -> Dict[str, int]:
+        """
+            Load the source ID to database ID map of an imported table.
+        """
+        path = self.dir / f"{table}.ids"
+        if not path.exists():
+            return {}
+        with open(path, newline="", encoding="utf-8") as ids:
+            return {source_id: int(target_id) for source_id, target_id in csv.reader(ids)}
+
+    def finish(self, batch_end: int, source_ids: List[Optional[str]], ids: List[int], rejects: List[dict]):
+        """
+            Record a committed batch: extend the ID map and reject log, then move the checkpoint past it.
+        """
+        mapped = [(source_id, target_id) for source_id, target_id in zip(source_ids, ids) if source_id is not None]
+        if mapped:
+            with open(self.dir / f"{self.table}.ids", "a", newline="", encoding="utf-8") as id_map:
+                csv.writer(id_map).writerows(mapped)
+        if rejects:
+            with open(self.rejects_path, "a", encoding="utf-8") as log:
+                log.writelines(json.dumps(reject) + "\n" for reject in sorted(rejects, key=lambda r: r["position"]))
+        self.checkpoint.update(position=batch_end, pending=None, imported=self.checkpoint["imported"] + len(ids),
+                               rejected=self.checkpoint["rejected"] + len(rejects))
+        self.save()
+
+
+async def _existing_users() -> Dict[str, Set[str]]:
+    existing = {"username": set(), "email": set()}
+    async with get_engine().connect() as conn:
+        result = await conn.stream(select(User.username, User.email).execution_options(yield_per=IMPORT_BATCH_SIZE))
+        async for username, email in result:
+            existing["username"].add(username)
+            existing["email"].add(email)
+    return existing
+
+
+def _source_key(record: dict, field: str) -> Optional[str]:
+    value = record.get(field)
+    return None if value is None else str(value)
+
+
+class TableImport:
+    """
+        How the records of one table are validated, resolved and written.
+
+        Args:
+            model: The SQLAlchemy model of the table.
+            entity (ChangeEntity): The table's rows in the change log.
+            schema: The create schema records are validated with.
+            key: The column compared to confirm that a pending batch was committed.
+            prepare (Callable): Coroutine turning the validated records of a batch into rows.
+            after_write (Optional[Callable], optional): Coroutine run with the connection and the rows after they
+                were written, in the same transaction.
+    """
+
+    def __init__(self, model, entity: ChangeEntity, schema, key: str, prepare: Callable,
+                 after_write: Optional[Callable] = None):
+        self.model = model
+        self.entity = entity
+        self.schema = schema
+        self.key = key
+        self.prepare = prepare
+        self.after_write = after_write
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+
+async def _prepare_users(batch: Batch, valid, records: List[dict], context: dict):
+    existing = context["existing_users"]
+    accepted = []
+    for index, user in valid:
+        duplicates = [f"{field}: already exists" for field in ("username", "email")
+                      if getattr(user, field) in existing[field]]
+        if duplicates:
+            batch.reject(batch.start + index, duplicates)
+            continue
+        existing["username"].add(user.username)
+        existing["email"].add(user.email)
+        accepted.append((index, user))
+    hashed = await password_hasher.hash_many([user.password for _, user in accepted])
+    for (index, user), hashed_password in zip(accepted, hashed):
+        batch.add({"username": user.username, "email": user.email, "hashed_password": hashed_password,
+                   "token_version": 0}, records[index].get("id"))
+
+
+async def _prepare_events(batch: Batch, valid, records: List[dict], context: dict):
+    users = context["maps"]["users"]
+    now = utcnow()
+    for index, event in valid:
+        creator_id = users.get(_source_key(records[index], "creator_id"))
+        if creator_id is None:
+            batch.reject(batch.start + index, ["creator_id: unknown user"])
+            continue
+        row = dict(event.model_dump(), creator_id=creator_id, geo_cell=geo.cell_for(event.latitude, event.longitude),
+                   updated_at=now)
+        batch.add(row, records[index].get("id"))
+
+
+async def _prepare_comments(batch: Batch, valid, records: List[dict], context: dict):
+    events, users = context["maps"]["events"], context["maps"]["users"]
+    now = utcnow()
+    for index, comment in valid:
+        event_id = events.get(_source_key(records[index], "event_id"))
+        user_id = users.get(_source_key(records[index], "user_id"))
+        errors = (["event_id: unknown event"] if event_id is None else []) + \
+                 (["user_id: unknown user"] if user_id is None else [])
+        if errors:
+            batch.reject(batch.start + index, errors)
+            continue
+        batch.add({"content": comment.content, "event_id": event_id, "user_id": user_id, "updated_at": now},
+                  records[index].get("id"))
+
+
+async def _count_comments(conn: AsyncConnection, rows: List[Dict[str, Any]]):
+    counts = Counter(row["event_id"] for row in rows)
+    await adjust_comment_counts(conn, counts)
+    await record_changes(conn, upserted={ChangeEntity.event: counts})
+
+
+IMPORTS = {
+    "users": TableImport(User, ChangeEntity.user, UserCreate, "username", _prepare_users),
+    "events": TableImport(Event, ChangeEntity.event, EventCreate, "title", _prepare_events),
+    "comments": TableImport(Comment, ChangeEntity.comment, CommentCreate, "content", _prepare_comments,
+                            after_write=_count_comments),
+}
+
+
+async def _write_rows(conn: AsyncConnection, spec: TableImport, rows: List[Dict[str, Any]]):
+    if conn.dialect.name == "postgresql":
+        columns = list(rows[0])
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            spec.table.name, records=[tuple(row[column] for column in columns) for row in rows], columns=columns)
+    else:
+        await conn.execute(insert(spec.table), rows)
+
+
+async def _rows_after(conn: AsyncConnection, spec: TableImport, max_id: int, limit: int):
+    id_column = spec.table.c.id
+    result = await conn.execute(select(id_column, spec.table.c[spec.key]).filter(id_column > max_id)
+                                .order_by(id_column).limit(limit))
+    return result.all()
+
+
+async def _recover(state: ImportState, spec: TableImport):
+    """
+        Settle a batch that was being written when a previous run stopped.
+    """
+    pending = state.checkpoint["pending"]
+    async with get_engine().connect() as conn:
+        rows = await _rows_after(conn, spec, pending["max_id"], len(pending["keys"]))
+    if [key for _, key in rows] == pending["keys"]:
+        state.finish(pending["end"], pending["source_ids"], [row_id for row_id, _ in rows], pending["rejects"])
+    else:
+        state.checkpoint["pending"] = None
+        state.save()
+
+
+async def _load(state: ImportState, spec: TableImport, batch: Batch):
+    if not batch.rows:
+        state.finish(batch.end, [], [], batch.rejects)
+        return
+    async with get_engine().begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text(f"LOCK TABLE {spec.table.name} IN SHARE ROW EXCLUSIVE MODE"))
+        max_id = (await conn.execute(select(func.coalesce(func.max(spec.table.c.id), 0)))).scalar()
+        state.checkpoint["pending"] = {"start": batch.start, "end": batch.end, "max_id": max_id,
+                                       "keys": [row[spec.key] for row in batch.rows],
+                                       "source_ids": batch.source_ids, "rejects": batch.rejects}
+        state.save()
+        await _write_rows(conn, spec, batch.rows)
+        if spec.after_write is not None:
+            await spec.after_write(conn, batch.rows)
+        # IDs are assigned in row order, and the table takes no other inserts meanwhile.
+        ids = [row_id for row_id, _ in await _rows_after(conn, spec, max_id, len(batch.rows))]
+        await record_changes(conn, upserted={spec.entity: ids})
+    state.finish(batch.end, batch.source_ids, ids, batch.rejects)
+
+
+async def import_file(table: str, path: str, fmt: Optional[str] = None, state_dir: str = "import-state",
+                      batch_size: int = IMPORT_BATCH_SIZE, progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+        Import a CSV or NDJSON file into a table, resuming from the state directory's checkpoint if there is one.
+
+        Args:
+            table (str): ``users``, ``events`` or ``comments``.
+            path (str): The file to import.
+            fmt (Optional[str], optional): ``csv`` or ``ndjson``; guessed from the file extension if omitted.
+            state_dir (str, optional): Where the checkpoint, ID maps and reject log are kept.
+            batch_size (int, optional): The number of records validated and written per transaction.
+            progress (Optional[Callable[[dict], None]], optional): Called with the checkpoint after every batch.
+
+        Returns:
+            dict: The final checkpoint: the position reached and the number of rows imported and rejected.
+
+        Raises:
+            ValueError: If the table or format is unknown, or the state directory belongs to another file.
+    """
+    if table not in IMPORTS:
+        raise ValueError(f"Unknown table {table!r}, expected one of {', '.join(IMPORTS)}")
+    spec = IMPORTS[table]
+    state = ImportState(state_dir, table)
+    source = str(Path(path).resolve())
+    if state.checkpoint["source"] not in (None, source):
+        raise ValueError(f"{state.checkpoint_path} belongs to an import of {state.checkpoint['source']}; "
+                         f"use another state directory")
+    state.checkpoint["source"] = source
+
+    if state.checkpoint["pending"] is not None:
+        await _recover(state, spec)
+
+    context = {"maps": {name: state.id_map(name) for name in ("users", "events")}}
+    if table == "users":
+        context["existing_users"] = await _existing_users()
+
+    records = islice(read_records(path, fmt), state.checkpoint["position"], None)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        batch = Batch(state.checkpoint["position"], len(chunk))
+        valid, errors = validate_items(spec.schema, chunk)
+        for index, reasons in errors.items():
+            batch.reject(batch.start + index, reasons)
+        await spec.prepare(batch, valid, chunk, context)
+        await _load(state, spec, batch)
+        if progress is not None:
+            progress(state.checkpoint)
+    state.save()
+    return state.checkpoint
@@ -0,0 +1,287 @@
+"""
+This module collects application metrics and renders them in the Prometheus text exposition format.
+
+``MetricsMiddleware`` records, for every HTTP request, its latency in a histogram, its status code in a counter and
+the number of requests currently in flight. Requests are labelled with the route template (``/events/{event_id}``),
+not the raw path, so the number of series stays bounded; requests that match no route share the ``unmatched``
+label. ``instrument_engine`` adds gauges for the connections checked out of the SQLAlchemy pool and its overflow,
+and a histogram of the time spent waiting for a connection, under ``db_pool_`` for the primary and
+``db_replica<index>_pool_`` for each read replica. ``hashing`` reports the time bcrypt takes per hash.
+
+Metrics are updated on the event loop thread only (the hashing pool reports its timings back to the loop), so the
+updates are plain integer and float increments with no locking. Histograms keep per-bucket counts and only build
+the cumulative counts Prometheus expects when they are scraped.
+
+Served by ``GET /metrics``.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+        Base class for a metric family with a fixed set of label names.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The ``HELP`` text.
+            labels (Sequence[str], optional): The label names; values are passed positionally to the update methods.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """
+        A monotonically increasing count per label set.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        return [("_total", self.labels, key, value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Metric):
+    """
+        A value that goes up and down, either set directly or read from ``callback`` at scrape time.
+
+        Args:
+            callback (Optional[Callable[[], Optional[float]]]): Returns the current value of an unlabelled gauge
+                when it is scraped; ``None`` omits the sample.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], Optional[float]]] = None):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str):
+        self.values[labels] = value
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            return [] if value is None else [("", (), (), value)]
+        return [("", self.labels, key, value) for key, value in sorted(self.values.items())]
+
+
+class Histogram(Metric):
+    """
+        Observations counted into buckets per label set, with their count and sum.
+
+        Args:
+            buckets (Sequence[float], optional): The bucket upper bounds in ascending order; ``+Inf`` is implied.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (the last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        samples = []
+        names = self.labels + ("le",)
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", names, key + (_format_value(bound),), cumulative))
+            samples.append(("_count", self.labels, key, cumulative))
+            samples.append(("_sum", self.labels, key, total))
+        return samples
+
+
+class Registry:
+    """
+        The set of metrics exposed by ``GET /metrics``.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str):
+        self.metrics.pop(name, None)
+
+    def render(self) -> str:
+        """
+            Render every registered metric in the Prometheus text exposition format.
+        """
+        return "".join(metric.render() for metric in self.metrics.values())
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request until its response is fully sent.",
+    ("method", "route")))
+http_requests = registry.register(Counter(
+    "http_requests", "Requests served, by response status code.", ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served.", ("method",)))
+password_hash_duration = registry.register(Histogram(
+    "password_hash_duration_seconds", "Time a worker spent on one bcrypt hash or verification.", ("operation",),
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1.0, 2.0)))
+
+
+class MetricsMiddleware:
+    """
+        ASGI middleware recording the latency, status code and concurrency of every HTTP request.
+
+        A plain ASGI middleware rather than ``BaseHTTPMiddleware``: it neither buffers nor re-wraps the response, so
+        streaming responses are timed until their last chunk is sent.
+
+        Args:
+            app: The ASGI application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope.
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            http_request_duration.observe(time.perf_counter() - start, method, route)
+            http_requests.inc(method, route, status)
+            http_requests_in_flight.dec(method)
+
+
+def instrument_engine(engine, prefix: str = "db_pool"):
+    """
+        Register gauges and a checkout wait histogram for the connection pool of an engine.
+
+        Checked-out connections are counted with pool events, which works for every pool class. The overflow gauge
+        is only reported by pools that have one (``QueuePool``). The wait time is measured by
+        ``observe_checkout_wait``.
+
+        Args:
+            engine (AsyncEngine | Engine): The engine whose pool is instrumented.
+            prefix (str, optional): The metric name prefix.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    checked_out = registry.register(Gauge(f"{prefix}_checked_out", "Connections currently checked out of the pool."))
+    registry.register(Gauge(f"{prefix}_overflow", "Connections open beyond the pool size.",
+                            callback=pool.overflow if hasattr(pool, "overflow") else lambda: None))
+    registry.register(Gauge(f"{prefix}_size", "Configured number of pooled connections.",
+                            callback=pool.size if hasattr(pool, "size") else lambda: None))
+    wait = registry.register(Histogram(f"{prefix}_wait_seconds", "Time spent waiting to check out a connection.",
+                                       buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)))
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+    observe_checkout_wait(engine, wait.observe)
+
+
+def observe_checkout_wait(engine, callback: Callable[[float], None]):
+    """
+        Report how long every connection checkout of an engine's pool waited.
+
+        The pool's internal ``_do_get`` is the step that blocks when the pool is exhausted (or, for ``NullPool``,
+        opens a new connection); it is wrapped to time each call. Several callbacks may be attached.
+
+        Args:
+            engine (AsyncEngine | Engine): The engine whose pool is observed.
+            callback (Callable[[float], None]): Called with the wait in seconds after every checkout.
+    """
+    pool = getattr(engine, "sync_engine", engine).pool
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            callback(time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
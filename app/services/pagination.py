@@ -0,0 +1,112 @@
+"""
+This module implements keyset (cursor) pagination for the list endpoints.
+
+Instead of ``OFFSET``, which makes the database walk and discard every skipped row, each page continues strictly
+after the sort key of the last row of the previous page (``WHERE (a, b) > (:a, :b) ORDER BY a, b LIMIT n``, or
+``<`` with ``DESC`` for descending listings). With an index on the sort key, page N costs the same as page 1.
+
+Cursors are opaque to clients: URL-safe base64 of the JSON-encoded sort key values of the last row returned.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+        Encode the sort key values of a row into an opaque cursor.
+
+        Args:
+            values (Sequence[Any]): The sort key values, in sort order.
+
+        Returns:
+            str: The cursor string.
+    """
+    plain = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _cursor_value(column, value: Any) -> Any:
+    python_type = column.type.python_type
+    if value is None:
+        return None
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    # JSON booleans are ints to Python, but never a valid value of an integer column.
+    if isinstance(value, python_type) and (python_type is bool or not isinstance(value, bool)):
+        return value
+    raise TypeError(f"cursor value of {column.key} is not a {python_type.__name__}")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> Tuple[Any, ...]:
+    """
+        Decode a cursor produced by ``encode_cursor`` for the given sort columns.
+
+        Args:
+            cursor (str): The cursor string received from the client.
+            columns (Sequence): The sort columns the cursor was produced for.
+
+        Raises:
+            HTTPException: 400 error if the cursor is malformed or does not match the sort columns, including a
+                value that is not of its column's Python type (which would otherwise reach the database driver).
+
+        Returns:
+            Tuple[Any, ...]: The sort key values, converted to the columns' Python types.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        return tuple(_cursor_value(column, value) for column, value in zip(columns, values))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+async def paginate(db: AsyncSession, query: Select, order_by: Sequence, after: Optional[str] = None,
+                   limit: int = 10, descending: bool = False, rows: bool = False) -> Tuple[List[Any], Optional[str]]:
+    """
+        Fetch one page of ORM objects (or of column rows) ordered by a unique sort key.
+
+        Args:
+            db (AsyncSession): The database session to use for the operation.
+            query (Select): The base query selecting a single ORM entity, or columns when ``rows`` is set.
+            order_by (Sequence): The columns forming the sort key; together they must be unique (end with the
+                primary key) so that the order is stable.
+            after (Optional[str]): The cursor of the previous page, or None for the first page.
+            limit (int): The maximum number of items to return (capped at ``MAX_PAGE_SIZE``).
+            descending (bool): Sort by every column of the key in descending order instead.
+            rows (bool): Return the rows as mappings of column name to value instead of ORM objects; the query
+                must select the sort key columns.
+
+        Returns:
+            Tuple[List[Any], Optional[str]]: The items of the page and the cursor of the next page,
+            or None if this is the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after is not None:
+        key = decode_cursor(after, order_by)
+        if descending:
+            query = query.where(tuple_(*order_by) < tuple_(*key))
+        else:
+            query = query.where(tuple_(*order_by) > tuple_(*key))
+    ordering = [column.desc() for column in order_by] if descending else order_by
+    result = await db.execute(query.order_by(*ordering).limit(limit + 1))
+    items = list(result.mappings().all() if rows else result.scalars().all())
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    if rows:
+        return items, encode_cursor([last[column.key] for column in order_by])
+    return items, encode_cursor([getattr(last, column.key) for column in order_by])
@@ -0,0 +1,76 @@
+"""
+This module serves list endpoints from column rows instead of ORM objects.
+
+The default read path loads an ORM object per row (identity map, attribute instrumentation, change tracking), builds
+a Pydantic model from it, dumps the model to a dict and lets FastAPI validate that dict against the route's
+``response_model`` once more before encoding it. For a page of rows the database returns, all of that is bookkeeping:
+the values are already typed by the column types and cannot fail the schema they were selected for.
+
+The projection path selects exactly the columns of the response schema (``schema_columns``) as Core rows and encodes
+the page to a JSON body in one ``json.dumps`` call (``page_body``). The body is cached as is by the read cache and
+returned in a ``Response`` (``json_response``), which FastAPI passes through without validating it. Routes keep
+their ``response_model`` for the OpenAPI schema.
+
+The output is byte-for-byte what the schema would produce as long as the columns map onto JSON natively; of the
+types the schemas use, only datetimes need converting (``json_default``).
+
+Compared by ``python -m benchmarks.projection``.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Mapping, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def schema_columns(model, schema: Type[BaseModel]) -> List:
+    """
+        Return the columns of an ORM model matching the fields of a response schema, in the schema's field order.
+
+        Args:
+            model: The ORM model class.
+            schema (Type[BaseModel]): The response schema; each of its fields must be a column of the model.
+
+        Returns:
+            List: The model's column attributes, ready to pass to ``select``.
+    """
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def json_default(value: Any):
+    """
+        Encode the values ``json`` does not handle natively the way Pydantic does in JSON mode.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> str:
+    """
+        Encode content to a compact JSON string, as ``JSONResponse`` does.
+    """
+    return json.dumps(content, default=json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def page_body(rows: Iterable[Mapping[str, Any]], next_cursor: Optional[str]) -> str:
+    """
+        Encode a page of rows selected with ``schema_columns`` into the JSON body of a ``*Page`` response.
+
+        Args:
+            rows (Iterable[Mapping[str, Any]]): The rows of the page, as column name to value mappings.
+            next_cursor (Optional[str]): The cursor of the next page, if any.
+
+        Returns:
+            str: The response body.
+    """
+    return dumps({"items": [dict(row) for row in rows], "next_cursor": next_cursor})
+
+
+def json_response(body: str, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+        Wrap an encoded JSON body in a response that FastAPI returns without validating or re-encoding it.
+    """
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,272 @@
+"""
+This module pushes changes to connected clients instead of having them poll.
+
+``comment_hub`` carries the comments created and deleted on each event (topic ``comments:<event_id>``) to the
+subscribers of ``/comments/event/{event_id}/stream``. A message is encoded to JSON once when it is published and the
+same string is handed to every subscriber.
+
+Every subscriber has a bounded queue. A subscriber that falls ``PUBSUB_QUEUE_SIZE`` messages behind is a slow
+consumer: it is evicted, which ends its stream with a ``stream.evicted`` message, rather than letting its backlog
+grow or holding up the publisher. Evicted clients reconnect and catch up with ``GET /comments/event/{event_id}``.
+
+An idle subscriber costs a small ``Subscription`` (a deque, a pending future and the heartbeat timer) on top of its
+connection; there is no task per subscriber, so one worker holds tens of thousands of them (``benchmarks.stream``).
+``PUBSUB_MAX_SUBSCRIBERS`` bounds the total.
+
+Messages reach the hub through a pluggable ``PubSubTransport``. The default ``InProcessTransport`` delivers to the
+subscribers of the same worker; a transport backed by a shared broker (e.g. Redis pub/sub or PostgreSQL
+``LISTEN``/``NOTIFY``) lets every worker's subscribers see the writes made on any worker.
+
+Configuration (environment variables, read into ``app.settings.Settings`` and applied by ``main.create_app``):
+    PUBSUB_QUEUE_SIZE: Messages a subscriber may fall behind before it is evicted (default 100).
+    PUBSUB_MAX_SUBSCRIBERS: Subscribers allowed per worker (default 20000).
+    PUBSUB_HEARTBEAT_SECONDS: Idle time after which a stream sends a keep-alive (default 15).
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from app.services.metrics import Counter, Gauge, registry
+from app.services.projection import json_default
+from app.settings import Settings
+
+SUBSCRIBED = json.dumps({"type": "stream.subscribed"})
+EVICTED = json.dumps({"type": "stream.evicted"})
+
+
+class TooManySubscribers(Exception):
+    """
+        Raised by ``Hub.subscribe`` when the worker already holds ``max_subscribers`` subscribers.
+    """
+
+
+class Subscription:
+    """
+        One subscriber's bounded queue of encoded messages on a topic.
+
+        Args:
+            topic (str): The topic subscribed to.
+            maxsize (int): The number of messages the subscriber may fall behind.
+    """
+
+    __slots__ = ("topic", "maxsize", "closed", "evicted", "_messages", "_waiter")
+
+    def __init__(self, topic: str, maxsize: int):
+        self.topic = topic
+        self.maxsize = maxsize
+        self.closed = False
+        self.evicted = False
+        self._messages = deque()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def put(self, data: str) -> bool:
+        """
+            Queue a message.
+
+            Returns:
+                bool: False if the queue is full (the subscriber is too slow) or the subscription is closed.
+        """
+        if self.closed or len(self._messages) >= self.maxsize:
+            return False
+        self._messages.append(data)
+        self._wake()
+        return True
+
+    def close(self, evicted: bool = False):
+        self.closed = True
+        self.evicted = self.evicted or evicted
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+            Wait for the next message.
+
+            Queued messages are still returned after the subscription is closed; ``closed`` tells an empty,
+            closed subscription from a timeout.
+
+            Args:
+                timeout (Optional[float], optional): The longest wait in seconds; None waits indefinitely.
+
+            Returns:
+                Optional[str]: The encoded message, or None on timeout or once the subscription is closed and drained.
+        """
+        if not self._messages and not self.closed:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            timer = None if timeout is None else loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if timer is not None:
+                    timer.cancel()
+        return self._messages.popleft() if self._messages else None
+
+
+class PubSubTransport:
+    """
+        Carries published messages to the hub of every worker.
+
+        ``Hub`` binds itself with ``bind``; implementations call the bound function with ``(topic, data)`` for every
+        message published on any worker, including their own.
+    """
+
+    def bind(self, deliver: Callable[[str, str], None]):
+        raise NotImplementedError
+
+    async def publish(self, topic: str, data: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InProcessTransport(PubSubTransport):
+    """
+        ``PubSubTransport`` delivering messages to the subscribers of the publishing worker only.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, str], None]] = None
+
+    def bind(self, deliver: Callable[[str, str], None]):
+        self._deliver = deliver
+
+    async def publish(self, topic: str, data: str):
+        self._deliver(topic, data)
+
+
+class Hub:
+    """
+        Topic based fan-out to local subscribers with bounded queues and slow consumer eviction.
+
+        Args:
+            transport (PubSubTransport): How published messages reach the hubs of every worker.
+            queue_size (int, optional): The number of messages a subscriber may fall behind.
+            max_subscribers (int, optional): The number of subscribers allowed on this worker.
+            heartbeat (float, optional): The idle time after which a stream yields None.
+    """
+
+    def __init__(self, transport: PubSubTransport, queue_size: int = Settings.pubsub_queue_size,
+                 max_subscribers: int = Settings.pubsub_max_subscribers,
+                 heartbeat: float = Settings.pubsub_heartbeat_seconds):
+        self.transport = transport
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.subscriber_count = 0
+        self.evictions = 0
+        self._topics: Dict[str, Set[Subscription]] = {}
+        transport.bind(self.deliver)
+
+    def configure(self, settings: Settings):
+        """
+            Apply the stream settings; subscribers already connected keep their queue size.
+        """
+        self.queue_size = settings.pubsub_queue_size
+        self.max_subscribers = settings.pubsub_max_subscribers
+        self.heartbeat = settings.pubsub_heartbeat_seconds
+
+    def subscribe(self, topic: str) -> Subscription:
+        """
+            Subscribe to a topic. Pair with ``unsubscribe``.
+
+            Raises:
+                TooManySubscribers: If the worker already holds ``max_subscribers`` subscribers.
+        """
+        if self.subscriber_count >= self.max_subscribers:
+            raise TooManySubscribers()
+        subscription = Subscription(topic, self.queue_size)
+        self._topics.setdefault(topic, set()).add(subscription)
+        self.subscriber_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.subscriber_count -= 1
+            if not subscribers:
+                del self._topics[subscription.topic]
+        subscription.close()
+
+    @property
+    def full(self) -> bool:
+        return self.subscriber_count >= self.max_subscribers
+
+    async def stream(self, topic: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        """
+            Subscribe to a topic for as long as the iteration lasts and yield its encoded messages.
+
+            The subscription is made when the iteration starts and announced with a ``stream.subscribed`` message:
+            every message published after it is delivered. None is yielded after every ``heartbeat`` seconds without
+            a message, so the caller can keep the connection alive. An evicted subscriber gets a final
+            ``stream.evicted`` message.
+
+            Args:
+                topic (str): The topic to subscribe to.
+                heartbeat (Optional[float], optional): The idle time after which None is yielded; the hub's
+                    ``heartbeat`` by default.
+
+            Raises:
+                TooManySubscribers: If the worker already holds ``max_subscribers`` subscribers.
+        """
+        heartbeat = self.heartbeat if heartbeat is None else heartbeat
+        subscription = self.subscribe(topic)
+        try:
+            yield SUBSCRIBED
+            while True:
+                data = await subscription.get(timeout=heartbeat)
+                if data is not None:
+                    yield data
+                elif subscription.closed:
+                    if subscription.evicted:
+                        yield EVICTED
+                    return
+                else:
+                    yield None
+        finally:
+            self.unsubscribe(subscription)
+
+    async def publish(self, topic: str, message: dict):
+        """
+            Publish a JSON-compatible message to the subscribers of a topic on every worker.
+        """
+        await self.transport.publish(topic, json.dumps(message, default=json_default, separators=(",", ":")))
+
+    def deliver(self, topic: str, data: str):
+        """
+            Hand an encoded message to the local subscribers of a topic, evicting those whose queue is full.
+        """
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return
+        for subscription in [s for s in subscribers if not s.put(data)]:
+            subscription.close(evicted=True)
+            self.unsubscribe(subscription)
+            self.evictions += 1
+            evicted_subscribers.inc()
+
+
+comment_hub = Hub(InProcessTransport())
+
+registry.register(Gauge("pubsub_subscribers", "Stream subscribers connected to this worker.",
+                        callback=lambda: comment_hub.subscriber_count))
+evicted_subscribers = registry.register(Counter("pubsub_evictions", "Slow stream subscribers evicted."))
+
+
+async def publish_comment(kind: str, comment: dict):
+    """
+        Tell the subscribers of the comment's event about a new or deleted comment.
+
+        Args:
+            kind (str): ``created`` or ``deleted``.
+            comment (dict): The comment's fields; for deletions only ``id`` and ``event_id``.
+    """
+    await comment_hub.publish(f"comments:{comment['event_id']}", {"type": f"comment.{kind}", "comment": comment})
@@ -0,0 +1,206 @@
+"""
+This module counts and times the SQL statements each request runs.
+
+``instrument_engine`` hooks the engine's ``before_cursor_execute``/``after_cursor_execute`` events. Every statement is
+added to the ``QueryStats`` of the request it runs for (held in a context variable, which SQLAlchemy's asyncio layer
+carries into the greenlet that executes the statement), and statements slower than ``SLOW_QUERY_MS`` are logged to
+the ``app.services.query_stats.slow`` logger with the shape of their parameters: the names and types of the bound
+values, never the values themselves.
+
+``QueryStatsMiddleware`` starts a fresh ``QueryStats`` per HTTP request, reports it in a ``Server-Timing`` header
+(``db;desc="3 queries";dur=1.52``, visible in the browser's developer tools) and logs one JSON line per request.
+Statements run after the response headers are sent (by a streaming response) only appear in the log line.
+
+``assert_constant_query_count`` is a test helper that fails when the number of queries of an endpoint grows with the
+amount of data it returns, which is the signature of an N+1 query pattern.
+
+Configuration (environment variables, read into ``app.settings.Settings`` and passed in by ``main.instrument_engine``):
+    SLOW_QUERY_MS: Statements taking longer than this many milliseconds are logged as slow (default 100).
+"""
+
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import event
+
+from app.settings import Settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(f"{__name__}.slow")
+
+
+class QueryStats:
+    """
+        The number of statements run and their total duration.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def server_timing(self) -> str:
+        """
+            Format the statistics as a ``Server-Timing`` header value.
+        """
+        return f'db;desc="{self.count} queries";dur={self.duration * 1000:.2f}'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """
+        Collect the statements run inside the block (including by tasks it starts) into a new ``QueryStats``.
+
+        Yields:
+            QueryStats: The statistics, updated as statements run.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def parameter_shape(parameters, executemany: bool):
+    """
+        Describe bound parameters by name (or position) and type, leaving out their values.
+
+        Args:
+            parameters: The DBAPI parameters of a statement: a mapping or a sequence, or a list of those when
+                ``executemany`` is set.
+            executemany (bool): Whether the statement ran once per parameter set.
+
+        Returns:
+            dict | list: The parameter types, plus the number of parameter sets for ``executemany`` statements.
+    """
+    if executemany:
+        parameters = list(parameters)
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0], False) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def instrument_engine(engine, slow_query_ms: float = Settings.slow_query_ms):
+    """
+        Count and time every statement run through an engine, and log the slow ones.
+
+        Args:
+            engine (AsyncEngine | Engine): The engine to instrument.
+            slow_query_ms (float, optional): The duration above which a statement is logged as slow.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    threshold = slow_query_ms / 1000
+
+    # The start time is kept on the statement's execution context rather than the connection: a statement that
+    # raises never reaches after_cursor_execute, and would leave it behind on the pooled connection.
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+        if elapsed >= threshold:
+            slow_query_logger.warning(json.dumps({
+                "duration_ms": round(elapsed * 1000, 2),
+                "statement": " ".join(statement.split()),
+                "parameters": parameter_shape(parameters, executemany),
+            }))
+
+
+class QueryStatsMiddleware:
+    """
+        ASGI middleware reporting the statements each HTTP request ran, in a ``Server-Timing`` header and a log line.
+
+        Args:
+            app: The ASGI application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "queries": stats.count,
+                    "db_ms": round(stats.duration * 1000, 2),
+                }))
+
+
+SERVER_TIMING_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def query_count(response) -> int:
+    """
+        Read the number of statements a request ran from its ``Server-Timing`` header.
+
+        Args:
+            response: An HTTP response carrying the header set by ``QueryStatsMiddleware``.
+
+        Returns:
+            int: The number of statements.
+    """
+    return int(SERVER_TIMING_QUERIES.search(response.headers["server-timing"]).group(1))
+
+
+async def assert_constant_query_count(request: Callable[[], Awaitable], grow: Callable[[int], Awaitable],
+                                      sizes: Iterable[int] = (1, 5, 20)) -> Dict[int, int]:
+    """
+        Fail if the number of queries a request runs depends on how much data it covers.
+
+        For each size, ``grow`` brings the data behind the request up to that size (e.g. the number of comments on
+        an event), then ``request`` is sent and its query count read from ``Server-Timing``. The counts must all be
+        equal; a count that grows with the size means rows are being loaded one query at a time (N+1).
+
+        Args:
+            request (Callable[[], Awaitable]): Sends the request and returns its response.
+            grow (Callable[[int], Awaitable]): Brings the data up to the given size.
+            sizes (Iterable[int], optional): The data sizes to measure, in ascending order.
+
+        Returns:
+            Dict[int, int]: The query count per size.
+
+        Raises:
+            AssertionError: If the query counts differ between sizes.
+    """
+    counts = {}
+    for size in sizes:
+        await grow(size)
+        counts[size] = query_count(await request())
+    if len(set(counts.values())) > 1:
+        raise AssertionError(f"Query count grows with the result size (size: queries): {counts}")
+    return counts
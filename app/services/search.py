@@ -0,0 +1,118 @@
+"""
+This module maintains the full-text search index over event titles and descriptions and builds search queries.
+
+The index lives in the database and is kept current by the database itself, in the same statement as every insert,
+update and delete issued by ``crud_event``:
+
+* PostgreSQL: a stored generated ``tsvector`` column ``events.search_vector`` (title weighted above description)
+  with a GIN index, queried with ``@@`` and ranked by ``ts_rank_cd``.
+* SQLite: an external-content FTS5 table ``events_fts`` kept in sync by triggers, ranked by ``bm25``.
+
+The DDL is attached to the ``events`` table so ``Base.metadata.create_all`` installs it; deployed databases get it
+from the Alembic migration of the same name. Other dialects fall back to an unindexed ``LIKE`` match.
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import DDL, Select, Table, column, event, func, literal_column, or_, table
+
+SEARCH_CONFIG = "simple"
+
+POSTGRES_DDL = [
+    f"""
+    ALTER TABLE events ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX ix_events_search_vector ON events USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE events_fts USING fts5(title, description, content='events', content_rowid='id')",
+    """
+    CREATE TRIGGER events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER events_fts_update AFTER UPDATE OF title, description ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def attach_search_index(table: Table):
+    """
+        Register the search index DDL to run right after the events table is created.
+
+        Args:
+            table (Table): The events table.
+    """
+    for statement in POSTGRES_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+        Alembic ``include_object`` hook that hides the search index objects, which are not part of the models.
+    """
+    if type_ == "table" and name.startswith("events_fts"):
+        return False
+    if name in ("search_vector", "ix_events_search_vector"):
+        return False
+    return True
+
+
+def search_terms(q: str) -> List[str]:
+    """
+        Split a user supplied query into word terms, dropping any query syntax characters.
+
+        Args:
+            q (str): The raw query string.
+
+        Returns:
+            List[str]: The word terms of the query.
+    """
+    return re.findall(r"\w+", q)
+
+
+def apply_search(query: Select, entity, terms: List[str], dialect: str) -> Select:
+    """
+        Restrict an events query to rows matching every term (as a prefix) and order it by relevance.
+
+        Args:
+            query (Select): A query selecting the Event entity.
+            entity: The Event model.
+            terms (List[str]): The search terms, as returned by ``search_terms``.
+            dialect (str): The name of the database dialect the query will run on.
+
+        Returns:
+            Select: The filtered and ranked query.
+    """
+    if dialect == "postgresql":
+        vector = literal_column("events.search_vector")
+        tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        return query.filter(vector.op("@@")(tsquery)).order_by(func.ts_rank_cd(vector, tsquery).desc(), entity.id)
+    if dialect == "sqlite":
+        fts = table("events_fts", column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        return (query.join(fts, fts.c.rowid == entity.id)
+                .filter(literal_column("events_fts").op("MATCH")(match))
+                .order_by(func.bm25(literal_column("events_fts"), 10.0, 1.0), entity.id))
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(entity.title.ilike(pattern), entity.description.ilike(pattern)))
+    return query.order_by(entity.id)
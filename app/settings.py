@@ -0,0 +1,164 @@
+"""
+This module holds the settings ``main.create_app`` builds the application from.
+
+Configuration (environment variables):
+    DATABASE_URL: The primary database.
+    DATABASE_REPLICA_URLS: Comma separated read replica URLs (default: none).
+    ADMISSION_CONTROL: Set to ``false`` to turn admission control off (default true).
+    CREATE_TABLES: Create missing tables when the application starts, for local development (default false;
+        deployed databases are migrated with ``alembic upgrade head``).
+    LOG_LEVEL: The level of the root logger (default ``INFO``).
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, READ_YOUR_WRITES_SECONDS:
+        The connection pools and read routing, see ``app.services.database``.
+    PUBSUB_QUEUE_SIZE, PUBSUB_MAX_SUBSCRIBERS, PUBSUB_HEARTBEAT_SECONDS: The comment streams, see
+        ``app.services.pubsub``.
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES: The signing of access tokens, see
+        ``app.services.authentication``.
+    AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS, READ_CACHE_SIZE, READ_CACHE_TTL_SECONDS: The caches, see
+        ``app.services.cache``.
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT: The password hashing pool, see ``app.services.hashing``.
+    ADMISSION_<CLASS>_CONCURRENCY, ADMISSION_<CLASS>_QUEUE, ADMISSION_<CLASS>_RATE, ADMISSION_<CLASS>_BURST,
+    ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_MAX_POOL_WAIT_MS: The admission limits, see ``app.services.admission``.
+    SLOW_QUERY_MS: The slow query log, see ``app.services.query_stats``.
+    SYNC_TOMBSTONE_RETENTION_DAYS, SYNC_SETTLE_SECONDS: The change feed, see ``app.services.changes``.
+
+The service modules read nothing from the environment themselves: ``main.configure`` hands them these settings.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+
+# Concurrency, queue, rate and burst of each admission control route class
+ADMISSION_LIMITS = {
+    "auth": (8, 16, 2, 10),
+    "reads": (32, 64, 50, 100),
+    "writes": (16, 32, 10, 20),
+}
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _admission_limits() -> Dict[str, Tuple[float, float, float, float]]:
+    return {name: tuple(float(os.getenv(f"ADMISSION_{name.upper()}_{setting}", default))
+                        for setting, default in zip(("CONCURRENCY", "QUEUE", "RATE", "BURST"), defaults))
+            for name, defaults in ADMISSION_LIMITS.items()}
+
+
+@dataclass
+class Settings:
+    """
+        Application settings.
+
+        Args:
+            database_url (Optional[str]): The primary database URL.
+            database_replica_urls (List[str]): The read replica URLs.
+            admission_control (bool): Whether to install the admission control middleware.
+            create_tables (bool): Whether to create missing tables at startup.
+            log_level (str): The level of the root logger.
+            db_pool_size (int): Connections kept open per engine.
+            db_max_overflow (int): Connections opened beyond the pool size under load.
+            db_pool_timeout (float): Seconds to wait for a connection before failing.
+            db_pool_recycle (int): Replace connections older than this many seconds; -1 never does.
+            db_pool_pre_ping (bool): Whether to test each connection with a round trip when it is checked out.
+            read_your_writes_seconds (float): How long a client's reads stay on the primary after it writes.
+            pubsub_queue_size (int): Messages a stream subscriber may fall behind before it is evicted.
+            pubsub_max_subscribers (int): Stream subscribers allowed per worker.
+            pubsub_heartbeat_seconds (float): Idle time after which a stream sends a keep-alive.
+            secret_key (Optional[str]): The key access tokens are signed with.
+            algorithm (Optional[str]): The JWT signing algorithm.
+            access_token_expire_minutes (float): The lifetime of an access token.
+            auth_cache_size (int): Maximum number of cached identities.
+            auth_cache_ttl_seconds (float): Lifetime of a cached identity.
+            read_cache_size (int): Maximum number of cached reads.
+            read_cache_ttl_seconds (float): Lifetime of a cached read.
+            password_hash_workers (Optional[int]): Password hashing processes; the number of CPUs by default.
+            password_hash_queue_limit (Optional[int]): Pending hashing jobs allowed; 4 per worker by default.
+            admission_limits (Dict[str, tuple]): ``(concurrency, queue, rate, burst)`` per admission route class.
+            admission_queue_timeout_ms (float): Longest wait for an admission slot.
+            admission_max_pool_wait_ms (float): Recent pool checkout wait above which requests are shed.
+            slow_query_ms (float): Duration above which a statement is logged as slow.
+            sync_tombstone_retention_days (float): How long the change feed keeps the tombstones of deleted rows.
+            sync_settle_seconds (float): Age below which change log entries are not served yet.
+    """
+
+    database_url: Optional[str] = None
+    database_replica_urls: List[str] = field(default_factory=list)
+    admission_control: bool = True
+    create_tables: bool = False
+    log_level: str = "INFO"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    read_your_writes_seconds: float = 5
+    pubsub_queue_size: int = 100
+    pubsub_max_subscribers: int = 20000
+    pubsub_heartbeat_seconds: float = 15
+    secret_key: Optional[str] = None
+    algorithm: Optional[str] = None
+    access_token_expire_minutes: float = 15
+    auth_cache_size: int = 10000
+    auth_cache_ttl_seconds: float = 60
+    read_cache_size: int = 10000
+    read_cache_ttl_seconds: float = 30
+    password_hash_workers: Optional[int] = None
+    password_hash_queue_limit: Optional[int] = None
+    admission_limits: Dict[str, tuple] = field(default_factory=lambda: dict(ADMISSION_LIMITS))
+    admission_queue_timeout_ms: float = 500
+    admission_max_pool_wait_ms: float = 200
+    slow_query_ms: float = 100
+    sync_tombstone_retention_days: float = 30
+    sync_settle_seconds: float = 2
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+            Read the settings from the environment (and the ``.env`` file).
+        """
+        load_dotenv()
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            database_replica_urls=[url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+                                   if url.strip()],
+            admission_control=_flag("ADMISSION_CONTROL", "true"),
+            create_tables=_flag("CREATE_TABLES", "false"),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            db_pool_size=int(os.getenv("DB_POOL_SIZE", cls.db_pool_size)),
+            db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", cls.db_max_overflow)),
+            db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", cls.db_pool_timeout)),
+            db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", cls.db_pool_recycle)),
+            db_pool_pre_ping=_flag("DB_POOL_PRE_PING", "false"),
+            read_your_writes_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", cls.read_your_writes_seconds)),
+            pubsub_queue_size=int(os.getenv("PUBSUB_QUEUE_SIZE", cls.pubsub_queue_size)),
+            pubsub_max_subscribers=int(os.getenv("PUBSUB_MAX_SUBSCRIBERS", cls.pubsub_max_subscribers)),
+            pubsub_heartbeat_seconds=float(os.getenv("PUBSUB_HEARTBEAT_SECONDS", cls.pubsub_heartbeat_seconds)),
+            secret_key=os.getenv("SECRET_KEY"),
+            algorithm=os.getenv("ALGORITHM"),
+            access_token_expire_minutes=float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES",
+                                                        cls.access_token_expire_minutes)),
+            auth_cache_size=int(os.getenv("AUTH_CACHE_SIZE", cls.auth_cache_size)),
+            auth_cache_ttl_seconds=float(os.getenv("AUTH_CACHE_TTL_SECONDS", cls.auth_cache_ttl_seconds)),
+            read_cache_size=int(os.getenv("READ_CACHE_SIZE", cls.read_cache_size)),
+            read_cache_ttl_seconds=float(os.getenv("READ_CACHE_TTL_SECONDS", cls.read_cache_ttl_seconds)),
+            password_hash_workers=_optional_int("PASSWORD_HASH_WORKERS"),
+            password_hash_queue_limit=_optional_int("PASSWORD_HASH_QUEUE_LIMIT"),
+            admission_limits=_admission_limits(),
+            admission_queue_timeout_ms=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", cls.admission_queue_timeout_ms)),
+            admission_max_pool_wait_ms=float(os.getenv("ADMISSION_MAX_POOL_WAIT_MS", cls.admission_max_pool_wait_ms)),
+            slow_query_ms=float(os.getenv("SLOW_QUERY_MS", cls.slow_query_ms)),
+            sync_tombstone_retention_days=float(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS",
+                                                          cls.sync_tombstone_retention_days)),
+            sync_settle_seconds=float(os.getenv("SYNC_SETTLE_SECONDS", cls.sync_settle_seconds)),
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.services import authentication
+from app.services.admission import AdmissionMiddleware, PoolWaitMonitor, TokenBucket, route_class
+
+NO_RATE_LIMIT = {"auth": (1, 1, 0, 0), "reads": (2, 1, 0, 0), "writes": (1, 0, 0, 0)}
+
+
+def build(gate: asyncio.Event, **options) -> AdmissionMiddleware:
+    inner = FastAPI()
+
+    @inner.get("/slow")
+    async def slow():
+        await gate.wait()
+        return {}
+
+    @inner.get("/fast")
+    async def fast():
+        return {}
+
+    @inner.get("/metrics")
+    async def metrics():
+        return {}
+
+    return AdmissionMiddleware(inner, **options)
+
+
+def bearer(user_id: int) -> dict:
+    token = authentication.create_access_token(data={"sub": f"user-{user_id}", "uid": user_id, "ver": 0})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def gate():
+    gate = asyncio.Event()
+    yield gate
+    gate.set()
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_requests_are_sorted_into_route_classes():
+    assert route_class("POST", "/users/login") == "auth"
+    assert route_class("POST", "/users/register") == "auth"
+    assert route_class("GET", "/events/") == "reads"
+    assert route_class("DELETE", "/events/1") == "writes"
+
+
+@pytest.mark.anyio
+async def test_requests_beyond_the_limit_and_queue_are_refused(gate):
+    app = build(gate, limits=NO_RATE_LIMIT, queue_timeout_ms=5000)
+    async with client_for(app) as client:
+        running = [asyncio.create_task(client.get("/slow")) for _ in range(3)]  # Two slots, one queued
+        await asyncio.sleep(0.05)
+
+        refused = await client.get("/fast")
+        assert refused.status_code == 503
+        assert refused.headers["retry-after"] == "1"
+        assert (await client.get("/metrics")).status_code == 200  # Never shed
+
+        gate.set()
+        assert [response.status_code for response in await asyncio.gather(*running)] == [200, 200, 200]
+        assert (await client.get("/fast")).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_queued_requests_give_up_after_the_timeout(gate):
+    app = build(gate, limits=NO_RATE_LIMIT, queue_timeout_ms=50)
+    async with client_for(app) as client:
+        running = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        assert (await client.get("/fast")).status_code == 503
+        assert app.limiters["reads"].waiting == 0
+
+        gate.set()
+        await asyncio.gather(*running)
+
+
+@pytest.mark.anyio
+async def test_clients_are_rate_limited_per_user_or_address(gate):
+    limits = dict(NO_RATE_LIMIT, reads=(10, 10, 1, 2))
+    app = build(gate, limits=limits)
+    async with client_for(app) as client:
+        assert [(await client.get("/fast", headers=bearer(1))).status_code for _ in range(3)] == [200, 200, 429]
+        limited = await client.get("/fast", headers=bearer(1))
+        assert limited.status_code == 429
+        assert limited.headers["retry-after"] == "1"
+
+        # Other users and anonymous clients have buckets of their own; a forged token does not count as a user.
+        assert (await client.get("/fast", headers=bearer(2))).status_code == 200
+        assert (await client.get("/fast")).status_code == 200
+        assert (await client.get("/fast", headers={"Authorization": "Bearer forged"})).status_code == 200
+        assert (await client.get("/fast")).status_code == 429
+
+
+@pytest.mark.anyio
+async def test_requests_are_shed_while_the_pool_wait_is_high(gate):
+    app = build(gate, limits=NO_RATE_LIMIT, max_pool_wait_ms=100)
+    app.pool_wait = PoolWaitMonitor(half_life=0.05)
+    async with client_for(app) as client:
+        await asyncio.sleep(0.1)
+        app.pool_wait.observe(2.0)  # After an idle spell one slow checkout weighs heavily
+        assert (await client.get("/fast")).status_code == 503
+
+        await asyncio.sleep(0.5)  # Nothing checked out since: the average decays
+        assert (await client.get("/fast")).status_code == 200
+
+
+def test_token_bucket_refills_at_its_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.services.admission.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert bucket.take("client") == 0
+    assert bucket.take("client") == 0
+    assert bucket.take("client") == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.take("client") == 0
+    assert bucket.take("client") > 0
@@ -0,0 +1,46 @@
+import pytest
+from app.services.authentication import decode_token
+from app.services.cache import identity_cache
+from app.test.routes_test import register_and_login, event_payload
+
+
+def user_id_from(headers):
+    return decode_token(headers["Authorization"].split()[1])["uid"]
+
+
+@pytest.mark.anyio
+async def test_cached_identity_skips_the_database(client, statements):
+    headers = await register_and_login(client, "auth-cached")
+    identity_cache.clear()
+
+    await client.post("/events/", json=event_payload(), headers=headers)
+    assert any("FROM users" in statement for statement in statements)
+
+    statements.clear()
+    await client.post("/events/", json=event_payload(), headers=headers)
+    assert not any("FROM users" in statement for statement in statements)
+
+
+@pytest.mark.anyio
+async def test_update_revokes_previously_issued_tokens(client):
+    headers = await register_and_login(client, "auth-revoked")
+    user_id = user_id_from(headers)
+    assert (await client.post("/events/", json=event_payload(), headers=headers)).status_code == 200
+
+    update = {"username": "auth-revoked", "email": "auth-revoked@example.com", "password": "secret"}
+    assert (await client.put(f"/users/{user_id}", json=update)).status_code == 200
+
+    response = await client.post("/events/", json=event_payload(), headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_deleted_user_token_is_rejected(client):
+    headers = await register_and_login(client, "auth-deleted")
+    user_id = user_id_from(headers)
+    assert (await client.post("/events/", json=event_payload(), headers=headers)).status_code == 200
+
+    await client.delete(f"/users/{user_id}")
+
+    response = await client.post("/events/", json=event_payload(), headers=headers)
+    assert response.status_code == 401
@@ -0,0 +1,61 @@
+import pytest
+from app.test.routes_test import register_and_login, event_payload
+from app.services.crud_event import ids_in_row_order
+
+
+@pytest.mark.anyio
+async def test_bulk_events_are_inserted_in_one_statement_and_reported_per_item(client, statements):
+    headers = await register_and_login(client, "bulk-owner")
+    items = [event_payload(title="Bulk 1"), {"title": "No date", "location": "Moda"},
+             event_payload(title="Bulk 2", latitude=-33.87, longitude=151.21)]
+
+    statements.clear()
+    response = await client.post("/events/bulk", json={"items": items}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert body["results"][1]["id"] is None
+    assert any(error.startswith("date_time") for error in body["results"][1]["errors"])
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT INTO EVENTS")]
+    assert len(inserts) == 1
+
+    first, third = body["results"][0]["id"], body["results"][2]["id"]
+    assert third > first
+    assert (await client.get(f"/events/{first}")).json()["title"] == "Bulk 1"
+    nearby = (await client.get("/events/nearby", params={"lat": -33.87, "lon": 151.21, "radius_km": 1})).json()
+    assert third in [event["id"] for event in nearby]
+
+
+@pytest.mark.anyio
+async def test_bulk_comments_skip_unknown_events(client):
+    headers = await register_and_login(client, "bulk-commenter")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    await client.get(f"/comments/event/{event['id']}")
+
+    items = [{"content": "First", "event_id": event["id"]}, {"content": "Lost", "event_id": 999999},
+             {"content": "Second", "event_id": event["id"]}]
+    body = (await client.post("/comments/bulk", json={"items": items}, headers=headers)).json()
+
+    assert body["created"] == 2
+    assert body["results"][1] == {"index": 1, "id": None, "errors": ["event_id: Event not found"]}
+    listing = (await client.get(f"/comments/event/{event['id']}")).json()
+    assert [comment["content"] for comment in listing["items"]] == ["First", "Second"]
+
+
+@pytest.mark.anyio
+async def test_bulk_create_rejects_empty_and_oversized_batches(client):
+    headers = await register_and_login(client, "bulk-limits")
+    assert (await client.post("/events/bulk", json={"items": []}, headers=headers)).status_code == 422
+    too_many = {"items": [event_payload()] * 1001}
+    assert (await client.post("/events/bulk", json=too_many, headers=headers)).status_code == 422
+
+
+def test_returned_ids_are_matched_to_rows_whatever_their_order():
+    rows = [{"content": "b", "event_id": 1}, {"content": "a", "event_id": 1}, {"content": "b", "event_id": 1},
+            {"content": "a", "event_id": 2}]
+    returned = [{"id": 13, "content": "a", "event_id": 2}, {"id": 12, "content": "b", "event_id": 1},
+                {"id": 10, "content": "b", "event_id": 1}, {"id": 11, "content": "a", "event_id": 1}]
+
+    assert ids_in_row_order(rows, returned, ["content", "event_id"]) == [10, 11, 12, 13]
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.services.cache import MemoryCacheBackend, ReadThroughCache, read_cache
+from app.test.routes_test import register_and_login, event_payload
+
+
+@pytest.fixture
+def cache():
+    return ReadThroughCache(MemoryCacheBackend(maxsize=100, ttl=60))
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_load(cache):
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(20)))
+
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    assert await cache.get_or_load("key", load) == {"value": 1}
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 19}
+
+
+@pytest.mark.anyio
+async def test_value_loaded_across_an_invalidation_is_not_cached(cache):
+    async def load():
+        await cache.invalidate("key")
+        return "stale"
+
+    assert await cache.get_or_load("key", load) == "stale"
+    assert await cache.backend.get("key") is None
+
+
+@pytest.mark.anyio
+async def test_namespace_invalidation_orphans_every_key(cache):
+    first = await cache.namespaced("events", "page-1")
+    await cache.get_or_load(first, lambda: asyncio.sleep(0, result="old"))
+
+    await cache.invalidate_namespace("events")
+
+    second = await cache.namespaced("events", "page-1")
+    assert second != first
+    assert await cache.get_or_load(second, lambda: asyncio.sleep(0, result="new")) == "new"
+
+
+@pytest.mark.anyio
+async def test_lagging_loads_right_after_an_invalidation_are_not_cached(cache):
+    await cache.invalidate("key")
+    assert await cache.get_or_load("key", lambda: asyncio.sleep(0, result="replica"), lag_seconds=60) == "replica"
+    assert await cache.backend.get("key") is None
+    assert await cache.get_or_load("key", lambda: asyncio.sleep(0, result="primary")) == "primary"
+    assert await cache.backend.get("key") == "primary"
+
+    await cache.invalidate_namespace("events")
+    key = await cache.namespaced("events", "page-1")
+    await cache.get_or_load(key, lambda: asyncio.sleep(0, result="replica"), lag_seconds=60)
+    assert await cache.backend.get(key) is None
+    await cache.get_or_load(key, lambda: asyncio.sleep(0, result="replica"), lag_seconds=1e-9)
+    assert await cache.backend.get(key) == "replica"
+
+
+@pytest.mark.anyio
+async def test_fresh_reads_do_not_wait_for_a_lagging_load(cache):
+    lagging = asyncio.ensure_future(cache.get_or_load("key", lambda: asyncio.sleep(0.01, result="replica"),
+                                                      lag_seconds=5))
+    await asyncio.sleep(0)
+    assert await cache.get_or_load("key", lambda: asyncio.sleep(0, result="primary")) == "primary"
+    assert await lagging == "replica"
+    assert await cache.backend.get("key") == "primary"
+
+
+@pytest.mark.anyio
+async def test_event_and_comment_reads_are_served_from_cache_until_a_write(client, statements):
+    headers = await register_and_login(client, "cache-owner")
+    event = (await client.post("/events/", json=event_payload(title="Cached"), headers=headers)).json()
+
+    await client.get(f"/events/{event['id']}")
+    await client.get(f"/comments/event/{event['id']}")
+    statements.clear()
+    assert (await client.get(f"/events/{event['id']}")).json()["title"] == "Cached"
+    assert (await client.get(f"/comments/event/{event['id']}")).json()["items"] == []
+    assert statements == []
+
+    await client.put(f"/events/{event['id']}", json=event_payload(title="Renamed"), headers=headers)
+    await client.post("/comments/", json={"content": "Hi", "event_id": event["id"]}, headers=headers)
+
+    assert (await client.get(f"/events/{event['id']}")).json()["title"] == "Renamed"
+    assert [c["content"] for c in (await client.get(f"/comments/event/{event['id']}")).json()["items"]] == ["Hi"]
+    assert (await client.get("/cache/stats")).json()["hits"] >= 2
+    assert read_cache.stats()["misses"] >= 4
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import update
+from app.models import Event
+from app.services import crud_event
+from app.services.database import SessionLocal
+from app.test.routes_test import register_and_login, event_payload
+
+
+async def get_event(client, event_id):
+    return (await client.get(f"/events/{event_id}")).json()
+
+
+@pytest.mark.anyio
+async def test_comment_writes_keep_the_count_and_activity_current(client):
+    headers = await register_and_login(client, "counted-owner")
+    other = await register_and_login(client, "counted-commenter")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    assert event["comment_count"] == 0
+
+    first = (await client.post("/comments/", json={"content": "One", "event_id": event["id"]}, headers=headers)).json()
+    after_create = await get_event(client, event["id"])
+    assert after_create["comment_count"] == 1
+    assert after_create["last_activity_at"] > event["last_activity_at"]
+
+    items = [{"content": "Two", "event_id": event["id"]}, {"content": "Three", "event_id": event["id"]}]
+    await client.post("/comments/bulk", json={"items": items}, headers=other)
+    assert (await get_event(client, event["id"]))["comment_count"] == 3
+
+    await client.delete(f"/comments/{first['id']}", headers=headers)
+    assert (await get_event(client, event["id"]))["comment_count"] == 2
+
+    me = (await client.get("/users/", params={"limit": 100})).json()["items"]
+    commenter_id = next(user["id"] for user in me if user["username"] == "counted-commenter")
+    await client.delete(f"/users/{commenter_id}", headers=other)
+    assert (await get_event(client, event["id"]))["comment_count"] == 0
+
+
+@pytest.mark.anyio
+async def test_popular_sort_orders_by_comment_count_and_pages_with_cursors(client):
+    headers = await register_and_login(client, "popular-owner")
+    location = "Popular Square"
+    events = [(await client.post("/events/", json=event_payload(location=location), headers=headers)).json()
+              for _ in range(3)]
+    for event, comments in zip(events, (1, 3, 2)):
+        items = [{"content": "hi", "event_id": event["id"]}] * comments
+        await client.post("/comments/bulk", json={"items": items}, headers=headers)
+
+    seen, cursor = [], None
+    while True:
+        params = {"sort": "popular", "location": location, "limit": 2, **({"after": cursor} if cursor else {})}
+        page = (await client.get("/events/", params=params)).json()
+        seen += [(event["id"], event["comment_count"]) for event in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [(events[1]["id"], 3), (events[2]["id"], 2), (events[0]["id"], 1)]
+
+
+@pytest.mark.anyio
+async def test_repair_recomputes_drifted_counts(client):
+    headers = await register_and_login(client, "repair-owner")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    await client.post("/comments/", json={"content": "Counted", "event_id": event["id"]}, headers=headers)
+
+    async with SessionLocal() as db:
+        await db.execute(update(Event).where(Event.id == event["id"]).values(comment_count=42))
+        await db.commit()
+        assert await crud_event.repair_comment_counts(db, batch_size=7) == 1
+        assert await crud_event.repair_comment_counts(db) == 0
+    assert (await get_event(client, event["id"]))["comment_count"] == 1
+
+
+def test_cli_repairs_comment_counts(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'cli.db'}")
+    subprocess.run([sys.executable, "-c", "import asyncio, app.models; from app.services.database import init_db; "
+                                          "asyncio.run(init_db())"], env=env, check=True)
+    result = subprocess.run([sys.executable, "cli.py", "repair-comment-counts"], env=env, check=True,
+                            capture_output=True, text=True)
+    assert result.stdout.strip() == '{"repaired": 0}'
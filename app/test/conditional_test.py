@@ -0,0 +1,47 @@
+import pytest
+from app.services.cache import read_cache
+from app.test.routes_test import register_and_login, event_payload
+
+
+@pytest.mark.anyio
+async def test_event_revalidation_answers_304_without_loading_the_row(client, statements):
+    headers = await register_and_login(client, "etag-owner")
+    event = (await client.post("/events/", json=event_payload(title="Polled"), headers=headers)).json()
+
+    first = await client.get(f"/events/{event['id']}")
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    await read_cache.clear()
+    statements.clear()
+    revalidated = await client.get(f"/events/{event['id']}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert len(statements) == 1 and "title" not in statements[0]
+
+    by_date = await client.get(f"/events/{event['id']}", headers={"If-Modified-Since": last_modified})
+    assert by_date.status_code == 304
+
+    await client.put(f"/events/{event['id']}", json=event_payload(title="Changed"), headers=headers)
+    changed = await client.get(f"/events/{event['id']}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["title"] == "Changed"
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_comment_listing_revalidation_sees_new_and_deleted_comments(client):
+    headers = await register_and_login(client, "etag-commenter")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    url = f"/comments/event/{event['id']}"
+    comment = (await client.post("/comments/", json={"content": "One", "event_id": event["id"]},
+                                 headers=headers)).json()
+
+    etag = (await client.get(url)).headers["etag"]
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+    assert (await client.get(url, params={"limit": 5}, headers={"If-None-Match": etag})).status_code == 200
+
+    await client.delete(f"/comments/{comment['id']}", headers=headers)
+    after_delete = await client.get(url, headers={"If-None-Match": etag})
+    assert after_delete.status_code == 200
+    assert after_delete.json()["items"] == []
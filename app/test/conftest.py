@@ -0,0 +1,51 @@
+import os
+
+# ``main.app`` reads its settings from the environment when it is first built, so point it at a local
+# SQLite database before any test builds it.
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test_database.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+# The suite registers and logs in many users from one address; admission control has its own tests.
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fresh_database_file():
+    if os.path.exists("./test_database.db"):
+        os.remove("./test_database.db")
+    yield
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    import httpx
+    from main import app
+    from app.services.database import init_db
+
+    await init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def statements():
+    """Collects every SQL statement executed on the application engine while the test runs."""
+    from sqlalchemy import event
+    from app.services.database import engine
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
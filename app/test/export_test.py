@@ -0,0 +1,51 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import pytest
+from app.services.export import ExportTable, export_ndjson
+from app.test.routes_test import register_and_login, event_payload
+
+
+@pytest.mark.anyio
+async def test_export_streams_every_row_as_ndjson(client):
+    headers = await register_and_login(client, "exporter")
+    items = [event_payload(title=f"Export {i}") for i in range(5)]
+    await client.post("/events/bulk", json={"items": items}, headers=headers)
+
+    response = await client.get("/export/events", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert {"Export 0", "Export 4"} <= {row["title"] for row in rows}
+    assert rows[-1] == (await client.get(f"/events/{rows[-1]['id']}")).json()
+
+    users = [json.loads(line) for line in (await client.get("/export/users", headers=headers)).text.splitlines()]
+    assert set(users[0]) == {"id", "username", "email"}
+    assert (await client.get("/export/users")).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_export_emits_one_chunk_per_cursor_batch(client):
+    headers = await register_and_login(client, "batch-exporter")
+    await client.post("/events/bulk", json={"items": [event_payload()] * 5}, headers=headers)
+
+    chunks = [chunk async for chunk in export_ndjson(ExportTable.events, batch_size=2)]
+    assert len(chunks) > 2
+    assert all(len(chunk.splitlines()) <= 2 for chunk in chunks)
+
+
+def test_cli_exports_to_a_file(tmp_path):
+    database, output = tmp_path / "cli.db", tmp_path / "users.ndjson"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    subprocess.run([sys.executable, "-c", "import asyncio, app.models; from app.services.database import init_db; "
+                                          "asyncio.run(init_db())"], env=env, check=True)
+    with sqlite3.connect(database) as connection:
+        connection.execute("INSERT INTO users (username, email, hashed_password, token_version) "
+                           "VALUES ('cli', 'cli@example.com', 'x', 0)")
+
+    subprocess.run([sys.executable, "cli.py", "export", "users", "--output", str(output)], env=env, check=True)
+    assert [json.loads(line) for line in output.read_text().splitlines()] == [
+        {"id": 1, "username": "cli", "email": "cli@example.com"}]
@@ -0,0 +1,52 @@
+import pytest
+from app.services import geo
+from app.test.routes_test import register_and_login, event_payload
+
+
+def test_bounding_box_splits_at_the_antimeridian():
+    min_lat, max_lat, lon_ranges = geo.bounding_box(0.0, 179.99, 5)
+
+    assert len(lon_ranges) == 2
+    ranges = geo.cell_ranges(min_lat, max_lat, lon_ranges)
+    assert geo.cell_for(0.0, -179.99) in {cell for first, last in ranges for cell in range(first, last + 1)}
+
+
+def test_haversine_distance():
+    # Kadikoy pier to Besiktas pier, across the Bosphorus.
+    assert geo.haversine_km(40.9917, 29.0230, 41.0422, 29.0067) == pytest.approx(5.77, abs=0.05)
+
+
+@pytest.mark.anyio
+async def test_nearby_returns_events_within_radius_nearest_first(client):
+    headers = await register_and_login(client, "geo-owner")
+    for title, lat, lon in [("Besiktas", 41.0422, 29.0067), ("Kadikoy", 40.9917, 29.0230),
+                            ("Ankara", 39.9208, 32.8541), ("Date line east", 0.0, 179.99),
+                            ("Date line west", 0.0, -179.99)]:
+        await client.post("/events/", json=event_payload(title=title, latitude=lat, longitude=lon), headers=headers)
+    await client.post("/events/", json=event_payload(title="Nowhere"), headers=headers)
+
+    response = await client.get("/events/nearby", params={"lat": 40.99, "lon": 29.02, "radius_km": 10})
+    assert [(e["title"], round(e["distance_km"])) for e in response.json()] == [("Kadikoy", 0), ("Besiktas", 6)]
+
+    response = await client.get("/events/nearby", params={"lat": 0.0, "lon": 179.995, "radius_km": 5})
+    assert [e["title"] for e in response.json()] == ["Date line east", "Date line west"]
+
+
+@pytest.mark.anyio
+async def test_nearby_loads_a_few_candidates_per_result_and_stays_exact(client, statements):
+    headers = await register_and_login(client, "geo-crowd")
+    points = [(f"Crowd {i}", -10.0 + (i % 5) * 0.003, 20.0 + (i // 5) * 0.004) for i in range(25)]
+    # The flat-earth order puts the event across the antimeridian last, though it is the nearest.
+    points += [(f"East {i}", 0.0, 179.9 + i * 0.005) for i in range(8)] + [("West", 0.0, -179.9995)]
+    items = [event_payload(title=title, latitude=lat, longitude=lon) for title, lat, lon in points]
+    assert (await client.post("/events/bulk", json={"items": items}, headers=headers)).status_code == 200
+
+    expected = sorted((geo.haversine_km(-10.0, 20.0, lat, lon), title) for title, lat, lon in points[:25])
+    statements.clear()
+    response = await client.get("/events/nearby", params={"lat": -10.0, "lon": 20.0, "radius_km": 5, "limit": 3})
+    assert [e["title"] for e in response.json()] == [title for _, title in expected[:3]]
+    # The cap of 12 candidates was reached, so the box around the third nearest was counted.
+    assert sum("count(" in statement for statement in statements) == 1
+
+    response = await client.get("/events/nearby", params={"lat": 0.0, "lon": 179.9999, "radius_km": 20, "limit": 1})
+    assert [e["title"] for e in response.json()] == ["West"]
@@ -0,0 +1,29 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.services.hashing import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=1, queue_limit=1)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.mark.anyio
+async def test_hash_and_verify_round_trip(hasher):
+    hashed = await hasher.hash("s3cret")
+    assert await hasher.verify("s3cret", hashed)
+    assert not await hasher.verify("wrong", hashed)
+    assert hasher.pending == 0
+
+
+@pytest.mark.anyio
+async def test_rejects_with_503_when_queue_is_full(hasher):
+    results = await asyncio.gather(hasher.hash("first"), hasher.hash("second"), return_exceptions=True)
+
+    assert isinstance(results[0], str)
+    assert isinstance(results[1], HTTPException)
+    assert results[1].status_code == 503
+    assert results[1].headers["Retry-After"] == "1"
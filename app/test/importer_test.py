@@ -0,0 +1,114 @@
+import json
+import pytest
+from sqlalchemy import func, select
+from app.models import Comment, Event, User
+from app.services import importer
+from app.services.database import SessionLocal, init_db
+
+
+def write_ndjson(path, records):
+    path.write_text("".join((record if isinstance(record, str) else json.dumps(record)) + "\n"
+                            for record in records))
+    return str(path)
+
+
+def event_record(source_id, creator_id=1, title=None):
+    return {"id": source_id, "title": title or f"Imported {source_id}", "date_time": "2030-03-01T18:00:00",
+            "location": "Moda", "creator_id": creator_id}
+
+
+async def count(model, *filters):
+    async with SessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(model).filter(*filters))).scalar()
+
+
+@pytest.mark.anyio
+async def test_import_resolves_foreign_keys_through_the_id_maps(tmp_path):
+    await init_db()
+    state = str(tmp_path / "state")
+    users = tmp_path / "users.csv"
+    users.write_text("id,username,email,password\n"
+                     "u1,importer-1,importer-1@example.com,secret\n"
+                     "u2,importer-2,importer-2@example.com,secret\n"
+                     "u3,importer-1,other@example.com,secret\n"
+                     "u4,importer-4,not-an-email,secret\n")
+    events = write_ndjson(tmp_path / "events.ndjson",
+                          [event_record(10, "u1"), event_record(11, "u2"), event_record(12, "u9"), "{broken"])
+    comments = tmp_path / "comments.csv"
+    comments.write_text("id,content,event_id,user_id\n1,Hello,10,u2\n2,Lost,99,u2\n")
+
+    assert (await importer.import_file("users", str(users), state_dir=state))["imported"] == 2
+    assert (await importer.import_file("events", events, state_dir=state, batch_size=2))["imported"] == 2
+    result = await importer.import_file("comments", str(comments), state_dir=state)
+    assert (result["imported"], result["rejected"]) == (1, 1)
+
+    async with SessionLocal() as db:
+        creator = (await db.execute(select(User).filter(User.username == "importer-1"))).scalar_one()
+        author = (await db.execute(select(User).filter(User.username == "importer-2"))).scalar_one()
+        event = (await db.execute(select(Event).filter(Event.title == "Imported 10"))).scalar_one()
+        comment = (await db.execute(select(Comment).filter(Comment.event_id == event.id))).scalar_one()
+    assert author.hashed_password.startswith("$2")
+    assert event.creator_id == creator.id
+    assert (comment.content, comment.user_id) == ("Hello", author.id)
+
+    rejects = [json.loads(line) for line in (tmp_path / "state" / "users.rejects.ndjson").read_text().splitlines()]
+    assert [reject["position"] for reject in rejects] == [2, 3]
+    assert rejects[0]["errors"] == ["username: already exists"]
+    event_rejects = (tmp_path / "state" / "events.rejects.ndjson").read_text().splitlines()
+    assert [json.loads(line)["position"] for line in event_rejects] == [2, 3]
+
+
+@pytest.mark.anyio
+async def test_import_resumes_after_a_failed_batch(tmp_path, monkeypatch):
+    await init_db()
+    state = str(tmp_path / "state")
+    users = write_ndjson(tmp_path / "users.ndjson",
+                         [{"id": 1, "username": "resume-owner", "email": "resume@example.com", "password": "x"}])
+    await importer.import_file("users", users, state_dir=state)
+    events = write_ndjson(tmp_path / "events.ndjson", [event_record(i, title="Resumed") for i in range(5)])
+
+    write_rows = importer._write_rows
+    calls = []
+
+    async def fail_second_batch(conn, spec, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise ConnectionError("database went away")
+        await write_rows(conn, spec, rows)
+
+    monkeypatch.setattr(importer, "_write_rows", fail_second_batch)
+    with pytest.raises(ConnectionError):
+        await importer.import_file("events", events, state_dir=state, batch_size=2)
+    assert await count(Event, Event.title == "Resumed") == 2
+
+    monkeypatch.setattr(importer, "_write_rows", write_rows)
+    result = await importer.import_file("events", events, state_dir=state, batch_size=2)
+    assert (result["position"], result["imported"]) == (5, 5)
+    assert await count(Event, Event.title == "Resumed") == 5
+
+
+@pytest.mark.anyio
+async def test_import_settles_a_batch_committed_before_the_checkpoint_moved(tmp_path, monkeypatch):
+    await init_db()
+    state = str(tmp_path / "state")
+    users = write_ndjson(tmp_path / "users.ndjson",
+                         [{"id": 1, "username": "settle-owner", "email": "settle@example.com", "password": "x"}])
+    await importer.import_file("users", users, state_dir=state)
+    events = write_ndjson(tmp_path / "events.ndjson", [event_record(i, title="Settled") for i in range(3)])
+
+    finish = importer.ImportState.finish
+
+    def crash_once(self, *args):
+        monkeypatch.setattr(importer.ImportState, "finish", finish)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(importer.ImportState, "finish", crash_once)
+    with pytest.raises(KeyboardInterrupt):
+        await importer.import_file("events", events, state_dir=state, batch_size=2)
+    assert await count(Event, Event.title == "Settled") == 2
+
+    result = await importer.import_file("events", events, state_dir=state, batch_size=2)
+    assert (result["position"], result["imported"]) == (3, 3)
+    assert await count(Event, Event.title == "Settled") == 3
+    ids = (tmp_path / "state" / "events.ids").read_text().splitlines()
+    assert [line.split(",")[0] for line in ids] == ["0", "1", "2"]
@@ -0,0 +1,59 @@
+import re
+import pytest
+from app.services.metrics import Counter, Histogram, Registry
+from app.test.routes_test import register_and_login, event_payload
+
+
+def sample(text, name, **labels):
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = "^" + re.escape(name) + (re.escape("{" + wanted + "}") if labels else "") + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("hits", "Hits.", ("route",)))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, "/a")
+    counter.inc("/a")
+    counter.inc("/a", amount=2)
+
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert sample(text, "latency_seconds_bucket", route="/a", le="0.1") == 1
+    assert sample(text, "latency_seconds_bucket", route="/a", le="1.0") == 3
+    assert sample(text, "latency_seconds_bucket", route="/a", le="+Inf") == 4
+    assert sample(text, "latency_seconds_count", route="/a") == 4
+    assert sample(text, "latency_seconds_sum", route="/a") == 4.05
+    assert sample(text, "hits_total", route="/a") == 3
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_reports_routes_pool_and_hashing(client):
+    headers = await register_and_login(client, "metrics_user")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+    before = (await client.get("/metrics")).text
+    served = sample(before, "http_requests_total", method="GET", route="/events/{event_id}", status="200") or 0
+
+    await client.get(f"/events/{event_id}")
+    await client.get("/events/999999")
+    await client.get("/no/such/path")
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert sample(text, "http_requests_total", method="GET", route="/events/{event_id}", status="200") == served + 1
+    assert sample(text, "http_requests_total", method="GET", route="/events/{event_id}", status="404") >= 1
+    assert sample(text, "http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert sample(text, "http_request_duration_seconds_count", method="GET", route="/events/{event_id}") >= 2
+    # Only the scrape itself is in flight.
+    assert sample(text, "http_requests_in_flight", method="GET") == 1
+    assert sample(text, "http_requests_in_flight", method="POST") == 0
+    assert sample(text, "db_pool_checked_out") == 0
+    assert sample(text, "db_pool_wait_seconds_count") > 0
+    assert sample(text, "password_hash_duration_seconds_count", operation="hash") >= 1
+    assert sample(text, "password_hash_duration_seconds_count", operation="verify") >= 1
@@ -0,0 +1,60 @@
+import pytest
+from app.schemas import comment as comment_schemas, event as event_schemas, user as user_schemas
+from app.services import crud_comment, crud_event, crud_user
+from app.services.database import SessionLocal
+from app.test.routes_test import register_and_login, event_payload
+
+
+def schema_page(schema, page_schema, objects, next_cursor) -> dict:
+    """The response the ORM path produced: a Pydantic model per object, validated again as the response model."""
+    items = [schema.model_validate(o, from_attributes=True).model_dump(mode="json") for o in objects]
+    return page_schema.model_validate({"items": items, "next_cursor": next_cursor}).model_dump(mode="json")
+
+
+@pytest.mark.anyio
+async def test_list_endpoints_match_the_schema_output(client):
+    headers = await register_and_login(client, "projection_owner")
+    event_ids = []
+    for overrides in (dict(title="Çay & sohbet 🍵", latitude=41.01, longitude=28.97),
+                      dict(title="Quiz", description="", location="Moda"), {}):
+        response = await client.post("/events/", json=event_payload(**overrides), headers=headers)
+        event_ids.append(response.json()["id"])
+    for content in ("Görüşürüz", 'Say "hi"'):
+        await client.post("/comments/", json={"content": content, "event_id": event_ids[0]}, headers=headers)
+
+    async with SessionLocal() as db:
+        for sort in event_schemas.EventSort:
+            response = await client.get("/events/", params={"limit": 2, "sort": sort.value})
+            assert response.headers["content-type"] == "application/json"
+            events, cursor = await crud_event.get_events(db, limit=2, sort=sort)
+            assert response.json() == schema_page(event_schemas.Event, event_schemas.EventPage, events, cursor)
+
+            following = await client.get("/events/", params={"limit": 2, "sort": sort.value, "after": cursor})
+            events, cursor = await crud_event.get_events(db, after=cursor, limit=2, sort=sort)
+            assert following.json() == schema_page(event_schemas.Event, event_schemas.EventPage, events, cursor)
+
+        response = await client.get(f"/comments/event/{event_ids[0]}")
+        assert "etag" in response.headers and "last-modified" in response.headers
+        comments, cursor = await crud_comment.get_comments_for_events(db, event_ids[0])
+        assert len(comments) == 2
+        assert response.json() == schema_page(comment_schemas.Comment, comment_schemas.CommentPage, comments, cursor)
+
+        response = await client.get("/users/", params={"limit": 100})
+        users, cursor = await crud_user.get_users(db, limit=100)
+        assert response.json() == schema_page(user_schemas.User, user_schemas.UserPage, users, cursor)
+
+
+@pytest.mark.anyio
+async def test_projection_selects_only_the_schema_columns(client, statements):
+    await client.get("/users/")
+    select = next(statement for statement in statements if statement.startswith("SELECT"))
+    assert "hashed_password" not in select and "token_version" not in select
+
+
+@pytest.mark.anyio
+async def test_list_endpoints_keep_their_documented_response_model(client):
+    paths = (await client.get("/openapi.json")).json()["paths"]
+    for path, page in (("/events/", "EventPage"), ("/users/", "UserPage"),
+                       ("/comments/event/{event_id}", "CommentPage")):
+        schema = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert schema == {"$ref": f"#/components/schemas/{page}"}
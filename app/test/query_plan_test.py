@@ -0,0 +1,119 @@
+"""
+Runs every CRUD query against SQLite and checks its ``EXPLAIN QUERY PLAN`` for full table scans.
+"""
+import re
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app.schemas.comment import CommentCreate
+from app.schemas.event import EventCreate, EventUpdate, EventSort, EventInclude
+from app.schemas.user import UserCreate
+from app.services import changes, crud_comment, crud_event, crud_user
+from app.services.database import SessionLocal, engine, init_db
+
+
+@pytest.fixture
+def executed():
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield captured
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+# An unfiltered statement walking a table in primary key order until its LIMIT.
+PRIMARY_KEY_WALK = re.compile(r"\sFROM (\w+) ORDER BY \1\.id( DESC)?\s+LIMIT ")
+
+
+def full_scans(statement, plan):
+    # SQLite reports a walk of a rowid table's own primary key b-tree as a bare SCAN, with no USING.
+    walk = PRIMARY_KEY_WALK.search(statement)
+    if walk and plan == [f"SCAN {walk.group(1)}"]:
+        return []
+    return [detail for detail in plan if detail.startswith("SCAN ") and " USING INDEX " not in detail
+            and " USING COVERING INDEX " not in detail and "VIRTUAL TABLE INDEX" not in detail]
+
+
+def test_only_index_walks_are_exempt_from_the_scan_check():
+    page = "SELECT users.id \nFROM users ORDER BY users.id\n LIMIT ? OFFSET ?"
+    filtered = "SELECT users.id \nFROM users \nWHERE users.email LIKE ? ORDER BY users.id\n LIMIT ? OFFSET ?"
+    assert full_scans(page, ["SCAN users"]) == []
+    assert full_scans(filtered, ["SCAN users"]) == ["SCAN users"]
+    assert full_scans(filtered, ["SCAN users USING INDEX ix_users_email"]) == []
+    assert full_scans(filtered, ["SCAN users USING COVERING INDEX ix_users_email"]) == []
+    assert full_scans(page, ["SCAN users", "USE TEMP B-TREE FOR ORDER BY"]) == ["SCAN users"]
+
+
+async def run_every_crud_query():
+    async with SessionLocal() as db:
+        users = [await crud_user.create_user(db, UserCreate(username=f"plan-{i}", email=f"plan-{i}@example.com",
+                                                             password="secret")) for i in range(2)]
+        owner = users[0]
+        event_data = EventCreate(title="Plan", date_time=datetime(2030, 5, 1), location="Moda", latitude=40.99,
+                                 longitude=29.02)
+        events = [await crud_event.create_event(db, event_data, owner.id) for _ in range(2)]
+        await crud_event.create_events(db, [event_data] * 2, owner.id)
+        comments = [await crud_comment.create_comment(db, CommentCreate(content="hi", event_id=events[0].id),
+                                                      owner.id) for _ in range(2)]
+        await crud_comment.create_comments(db, [CommentCreate(content="bulk", event_id=events[1].id)] * 2, owner.id)
+
+        await crud_user.get_user(db, owner.id)
+        await crud_user.get_user_by_username(db, owner.username)
+        await crud_user.get_user_by_email(db, owner.email)
+        _, cursor = await crud_user.get_users(db, limit=1)
+        await crud_user.get_users(db, after=cursor, limit=1)
+
+        await crud_event.get_event(db, events[0].id)
+        await crud_event.get_event_version(db, events[0].id)
+        await crud_event.get_event_expanded(db, events[0].id, set(EventInclude))
+        _, cursor = await crud_event.get_events(db, limit=1)
+        await crud_event.get_events(db, after=cursor, limit=1)
+        window = dict(starts_after=datetime(2030, 4, 28), starts_before=datetime(2030, 5, 5))
+        for filters in (window, dict(window, location="Moda"), dict(window, creator_id=owner.id)):
+            _, cursor = await crud_event.get_events(db, limit=1, sort=EventSort.date, **filters)
+            await crud_event.get_events(db, after=cursor, limit=1, sort=EventSort.date, **filters)
+        _, cursor = await crud_event.get_events(db, limit=1, sort=EventSort.popular)
+        await crud_event.get_events(db, after=cursor, limit=1, sort=EventSort.popular)
+        await crud_event.repair_comment_counts(db)
+        await crud_event.get_events(db, limit=1, location="Moda")
+        await crud_event.get_events(db, limit=1, creator_id=owner.id)
+        await crud_event.search_events(db, "plan")
+        await crud_event.get_events_nearby(db, 40.99, 29.02, 25)
+        await crud_event.get_events_nearby(db, 40.99, 29.02, 25, limit=1)
+        await crud_event.update_event(db, events[0].id, EventUpdate(title="Plan B", date_time=datetime(2030, 5, 2),
+                                                                    location="Moda"))
+
+        await crud_comment.get_comments_version(db, events[0].id)
+        _, cursor = await crud_comment.get_comments_for_events(db, events[0].id, limit=1)
+        await crud_comment.get_comments_for_events(db, events[0].id, after=cursor, limit=1)
+        await crud_comment.delete_comment(db, comments[0].id, owner.id)
+
+        await crud_event.delete_event(db, events[0].id)
+        await crud_user.update_user(db, owner.id, UserCreate(username=owner.username, email=owner.email,
+                                                             password="secret"))
+        await crud_user.delete_user(db, owner.id)
+
+        feed = await changes.get_changes(db, limit=1)
+        await changes.get_changes(db, since=feed["next_token"])
+        await changes.compact_changes(db, retention_days=0)
+
+
+@pytest.mark.anyio
+async def test_crud_queries_do_not_scan_whole_tables(executed):
+    await init_db()
+    await run_every_crud_query()
+
+    queries = [(s, p) for s, p in executed if s.lstrip().split()[0].upper() in ("SELECT", "UPDATE", "DELETE")]
+    assert queries
+
+    offenders = []
+    async with engine.connect() as conn:
+        for statement, parameters in queries:
+            result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            plan = [row[3] for row in result]
+            if full_scans(statement, plan):
+                offenders.append((statement, plan))
+    assert offenders == []
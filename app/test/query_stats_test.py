@@ -0,0 +1,115 @@
+import json
+import logging
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+from app.services import query_stats
+from app.services.query_stats import assert_constant_query_count, query_count, track_queries
+from app.test.routes_test import register_and_login, event_payload
+
+
+class FakeResponse:
+    def __init__(self, queries):
+        self.headers = {"server-timing": f'db;desc="{queries} queries";dur=1.00'}
+
+
+@pytest.mark.anyio
+async def test_requests_report_their_queries_in_header_and_log(client, caplog):
+    headers = await register_and_login(client, "query_stats_user")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+
+    with caplog.at_level(logging.INFO, logger="app.services.query_stats"):
+        response = await client.get(f"/comments/event/{event_id}")
+
+    assert response.status_code == 200
+    assert query_count(response) >= 1
+    assert response.headers["server-timing"].startswith(f'db;desc="{query_count(response)} queries";dur=')
+    lines = [json.loads(record.getMessage()) for record in caplog.records if record.name == "app.services.query_stats"]
+    assert lines[-1]["path"] == f"/comments/event/{event_id}"
+    assert lines[-1]["status"] == 200
+    assert lines[-1]["queries"] == query_count(response)
+
+
+def test_slow_queries_are_logged_with_parameter_shape_only(caplog):
+    engine = create_engine("sqlite://")
+    query_stats.instrument_engine(engine, slow_query_ms=0)
+
+    with caplog.at_level(logging.WARNING, logger="app.services.query_stats.slow"), track_queries() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :name, :age"), {"name": "secret-value", "age": 42})
+
+    assert stats.count == 1
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["statement"] == "SELECT ?, ?"
+    assert record["parameters"] == ["str", "int"]
+    assert "secret-value" not in caplog.text
+
+
+def test_failed_statements_leave_nothing_on_the_connection():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    query_stats.instrument_engine(engine)
+
+    with track_queries() as stats:
+        for _ in range(3):
+            with engine.connect() as conn, pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert conn.info == {}
+
+    assert stats.count == 1
+
+
+def test_parameter_shape_of_executemany():
+    shape = query_stats.parameter_shape([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], executemany=True)
+
+    assert shape == {"rows": 2, "row": {"id": "int", "name": "str"}}
+
+
+@pytest.mark.anyio
+async def test_constant_query_count_helper_flags_growth():
+    counts = iter([2, 3, 7])
+
+    async def request():
+        return FakeResponse(next(counts))
+
+    async def grow(size):
+        pass
+
+    with pytest.raises(AssertionError, match="grows with the result size"):
+        await assert_constant_query_count(request, grow)
+
+
+@pytest.mark.anyio
+async def test_comment_and_event_reads_do_not_query_per_row(client):
+    headers = await register_and_login(client, "n_plus_one_user")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+    comments = 0
+
+    async def grow(size):
+        nonlocal comments
+        items = [{"content": f"Comment {i}", "event_id": event_id} for i in range(comments, size)]
+        if items:
+            await client.post("/comments/bulk", json={"items": items}, headers=headers)
+        comments = size
+
+    await assert_constant_query_count(lambda: client.get(f"/comments/event/{event_id}"), grow)
+    await assert_constant_query_count(
+        lambda: client.get(f"/events/{event_id}", params={"include": "comments,creator"}), grow, sizes=(25, 30))
+    await assert_constant_query_count(
+        lambda: client.put(f"/events/{event_id}", json={"title": "Renamed"}, headers=headers), grow, sizes=(30, 35))
+
+
+@pytest.mark.anyio
+async def test_deleting_an_event_does_not_query_per_comment(client):
+    headers = await register_and_login(client, "n_plus_one_deleter")
+    event_ids = []
+
+    async def grow(size):
+        event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+        items = [{"content": f"Comment {i}", "event_id": event_id} for i in range(size)]
+        await client.post("/comments/bulk", json={"items": items}, headers=headers)
+        event_ids.append(event_id)
+
+    await assert_constant_query_count(lambda: client.delete(f"/events/{event_ids[-1]}", headers=headers), grow)
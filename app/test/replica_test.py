@@ -0,0 +1,119 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, insert
+from app.models.event import Event
+from app.models.user import User
+from app.services import database
+from app.services.database import ReplicaSet, engine_options
+from app.services.query_stats import query_count
+from app.test.metrics_test import sample
+from app.test.routes_test import register_and_login, event_payload
+
+REPLICA_ONLY_USER = 900000
+
+
+@pytest.fixture
+def replica_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    sync_engine = create_engine(url)
+    database.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(id=REPLICA_ONLY_USER, username="replica_only",
+                                                   email="replica_only@example.com", hashed_password="x"))
+    sync_engine.dispose()
+    return url
+
+
+@pytest.fixture
+async def use_replicas(monkeypatch):
+    created = []
+
+    def configure(*urls):
+        replicas = ReplicaSet(list(urls))
+        created.append(replicas)
+        monkeypatch.setattr(database, "replicas", replicas)
+
+    yield configure
+    database.recent_writers.clear()
+    for replicas in created:
+        await replicas.dispose()
+
+
+def test_pool_sizing_only_applies_to_server_databases():
+    assert "pool_size" in engine_options("postgresql://user:secret@db/app")
+    assert "max_overflow" in engine_options("postgresql://user:secret@db/app")
+    assert set(engine_options("sqlite:///app.db")) == {"pool_pre_ping", "pool_recycle"}
+
+
+@pytest.mark.anyio
+async def test_writers_read_their_writes_from_the_primary(client, replica_url, use_replicas):
+    use_replicas(replica_url)
+    headers = await register_and_login(client, "sticky_writer")
+    other = await register_and_login(client, "sticky_reader")
+
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}", headers=headers)).status_code == 200
+    await client.post("/events/", json=event_payload(), headers=headers)
+
+    # The writer now reads from the primary, other clients still read from the replica.
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}", headers=headers)).status_code == 404
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}", headers=other)).status_code == 200
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}")).status_code == 200
+
+    database.recent_writers.clear()  # The read-your-writes window has passed
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}", headers=headers)).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_unreachable_replicas_are_skipped(client, replica_url, use_replicas, tmp_path):
+    broken = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+
+    use_replicas(broken, replica_url)
+    for _ in range(4):
+        assert (await client.get(f"/users/{REPLICA_ONLY_USER}")).status_code == 200
+
+    use_replicas(broken)
+    assert (await client.get(f"/users/{REPLICA_ONLY_USER}")).status_code == 404
+
+
+def test_replicas_are_handed_out_round_robin(replica_url, tmp_path):
+    replicas = ReplicaSet([replica_url, f"sqlite:///{tmp_path / 'second.db'}"])
+    first, second = replicas.sessionmakers
+
+    assert replicas.candidates() == [first, second]
+    assert replicas.candidates() == [second, first]
+    assert replicas.candidates() == [first, second]
+
+
+@pytest.mark.anyio
+async def test_replica_engines_are_instrumented_like_the_primary(client, replica_url, use_replicas):
+    use_replicas(replica_url)
+    response = await client.get(f"/users/{REPLICA_ONLY_USER}")
+    assert response.status_code == 200
+    assert query_count(response) >= 1
+
+    metrics = (await client.get("/metrics")).text
+    assert sample(metrics, "db_replica0_pool_checked_out") == 0
+    assert sample(metrics, "db_replica0_pool_wait_seconds_count") >= 1
+
+
+@pytest.mark.anyio
+async def test_lagging_replica_reads_do_not_repopulate_the_cache(client, replica_url, use_replicas):
+    headers = await register_and_login(client, "cache_writer")
+    event = (await client.post("/events/", json=event_payload(title="Old"), headers=headers)).json()
+    # The replica has the event, but not yet the update below.
+    sync_engine = create_engine(replica_url)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(Event.__table__).values(id=event["id"], title="Old", date_time=datetime(2030, 1, 1, 19),
+                                                    location="Kadikoy", creator_id=event["creator_id"]))
+    sync_engine.dispose()
+    use_replicas(replica_url)
+
+    await client.put(f"/events/{event['id']}", json=event_payload(title="New"), headers=headers)
+    listing = {"creator_id": event["creator_id"]}
+    assert (await client.get(f"/events/{event['id']}")).json()["title"] == "Old"
+    assert [item["title"] for item in (await client.get("/events/", params=listing)).json()["items"]] == ["Old"]
+
+    # The writer reads from the primary, and the replica's copy was not cached for it to find.
+    assert (await client.get(f"/events/{event['id']}", headers=headers)).json()["title"] == "New"
+    assert [item["title"] for item in (await client.get("/events/", params=listing, headers=headers)).json()[
+        "items"]] == ["New"]
@@ -0,0 +1,130 @@
+import pytest
+from app.test.routes_test import register_and_login, event_payload
+
+
+def verbs(statements):
+    return [statement.split(None, 1)[0].upper() for statement in statements]
+
+
+@pytest.mark.anyio
+async def test_event_writes_take_one_statement_per_table(client, statements):
+    headers = await register_and_login(client, "round_trip_owner")
+    other = await register_and_login(client, "round_trip_other")
+    for user in (headers, other):
+        await client.delete("/comments/0", headers=user)  # Caches the user's identity, so auth needs no query
+
+    statements.clear()
+    response = await client.post("/events/", json=event_payload(latitude=41.0, longitude=29.0), headers=headers)
+    assert response.status_code == 200
+    assert verbs(statements) == ["INSERT", "INSERT"]  # The event and its change log entry
+    created = response.json()
+    event_id = created["id"]
+    assert created["updated_at"] is not None
+
+    statements.clear()
+    response = await client.put(f"/events/{event_id}", json=event_payload(title="Chess night"), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Chess night"
+    assert response.json()["updated_at"] >= created["updated_at"]
+    assert verbs(statements) == ["UPDATE", "INSERT"]
+
+    statements.clear()
+    assert (await client.put(f"/events/{event_id}", json=event_payload(), headers=other)).status_code == 403
+    assert (await client.delete(f"/events/{event_id}", headers=other)).status_code == 403
+    assert (await client.put("/events/999999", json=event_payload(), headers=headers)).status_code == 404
+    assert (await client.delete("/events/999999", headers=headers)).status_code == 404
+
+    await client.post("/comments/", json={"content": "See you there", "event_id": event_id}, headers=other)
+    statements.clear()
+    assert (await client.delete(f"/events/{event_id}", headers=headers)).status_code == 204
+    assert verbs(statements) == ["DELETE", "DELETE", "INSERT"]
+    assert (await client.get(f"/comments/event/{event_id}")).json()["items"] == []
+
+
+@pytest.mark.anyio
+async def test_moving_one_coordinate_keeps_the_geo_cell_in_sync(client):
+    headers = await register_and_login(client, "round_trip_mover")
+    event_id = (await client.post("/events/", json=event_payload(latitude=-33.87, longitude=151.21),
+                                  headers=headers)).json()["id"]
+
+    await client.put(f"/events/{event_id}", json=event_payload(longitude=151.9), headers=headers)
+
+    nearby = (await client.get("/events/nearby", params={"lat": -33.87, "lon": 151.9, "radius_km": 1})).json()
+    assert [event["id"] for event in nearby] == [event_id]
+
+
+@pytest.mark.anyio
+async def test_comment_and_user_writes_take_one_statement_per_table(client, statements):
+    headers = await register_and_login(client, "round_trip_commenter")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+
+    statements.clear()
+    response = await client.post("/comments/", json={"content": "Hi", "event_id": event_id}, headers=headers)
+    assert response.status_code == 200
+    # The comment, the event's comment count, and the change log entries of both
+    assert verbs(statements) == ["INSERT", "UPDATE", "INSERT"]
+
+    statements.clear()
+    assert (await client.delete(f"/comments/{response.json()['id']}", headers=headers)).status_code == 200
+    assert verbs(statements) == ["DELETE", "UPDATE", "INSERT"]
+
+    user = {"username": "round_trip_new", "email": "round_trip_new@example.com", "password": "secret"}
+    statements.clear()
+    assert (await client.post("/users/register", json=user)).status_code == 200
+    assert verbs(statements) == ["INSERT", "INSERT"]
+
+    statements.clear()
+    assert (await client.post("/users/register", json=dict(user, email="another@example.com"))).status_code == 400
+    assert (await client.post("/users/register", json=dict(user, username="another"))).status_code == 400
+    assert verbs(statements) == ["INSERT", "INSERT"]
+
+
+@pytest.fixture
+async def enforcing_db(tmp_path):
+    """A session on a fresh SQLite database that enforces foreign keys, as PostgreSQL does."""
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.services.database import Base
+    import app.models  # noqa: F401  Registers the tables
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'foreign_keys.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enforce_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        yield db
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_deletes_respect_foreign_keys(enforcing_db):
+    from datetime import datetime
+    from app.schemas.comment import CommentCreate
+    from app.schemas.event import EventCreate
+    from app.schemas.user import UserCreate
+    from app.services import crud_comment, crud_event, crud_user
+
+    db = enforcing_db
+    owner = await crud_user.create_user(db, UserCreate(username="fk-owner", email="fk-owner@example.com",
+                                                       password="secret"))
+    other = await crud_user.create_user(db, UserCreate(username="fk-other", email="fk-other@example.com",
+                                                       password="secret"))
+    event_data = EventCreate(title="Keys", date_time=datetime(2030, 1, 1), location="Moda")
+    events = [await crud_event.create_event(db, event_data, owner.id) for _ in range(2)]
+    for db_event in events:
+        await crud_comment.create_comment(db, CommentCreate(content="hi", event_id=db_event.id), other.id)
+
+    assert not await crud_event.delete_event(db, events[0].id, creator_id=other.id)
+    assert (await crud_comment.get_comments_version(db, events[0].id))[0] == 1  # Refused: nothing deleted
+    assert await crud_event.delete_event(db, events[0].id, creator_id=owner.id)
+    assert await crud_event.get_event(db, events[0].id) is None
+    assert (await crud_comment.get_comments_version(db, events[0].id))[0] == 0
+
+    assert await crud_user.delete_user(db, owner.id) is not None
+    assert await crud_event.get_event(db, events[1].id) is None
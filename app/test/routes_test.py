@@ -0,0 +1,150 @@
+import pytest
+from datetime import datetime, timedelta
+from app.services.pagination import encode_cursor
+
+
+async def register_and_login(client, username):
+    user = {"username": username, "email": f"{username}@example.com", "password": "secret"}
+    response = await client.post("/users/register", json=user)
+    assert response.status_code == 200
+    response = await client.post("/users/login", json=user)
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def event_payload(**overrides):
+    payload = {
+        "title": "Board games night",
+        "description": "Bring your own games",
+        "date_time": (datetime(2030, 1, 1) + timedelta(hours=19)).isoformat(),
+        "location": "Kadikoy",
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.mark.anyio
+async def test_event_and_comment_lifecycle(client):
+    headers = await register_and_login(client, "routes-owner")
+
+    response = await client.post("/events/", json=event_payload(), headers=headers)
+    assert response.status_code == 200
+    event = response.json()
+
+    response = await client.get(f"/events/{event['id']}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Board games night"
+
+    response = await client.post("/comments/", json={"content": "Count me in", "event_id": event["id"]},
+                                 headers=headers)
+    assert response.status_code == 200
+    comment = response.json()
+
+    response = await client.get(f"/comments/event/{event['id']}")
+    assert [c["id"] for c in response.json()["items"]] == [comment["id"]]
+
+    response = await client.put(f"/events/{event['id']}", json=event_payload(title="Chess night"),
+                                headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Chess night"
+
+    response = await client.delete(f"/events/{event['id']}", headers=headers)
+    assert response.status_code == 204
+    assert (await client.get(f"/events/{event['id']}")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_only_creator_can_modify_event(client):
+    owner = await register_and_login(client, "routes-creator")
+    other = await register_and_login(client, "routes-intruder")
+    event = (await client.post("/events/", json=event_payload(), headers=owner)).json()
+
+    response = await client.put(f"/events/{event['id']}", json=event_payload(), headers=other)
+    assert response.status_code == 403
+    response = await client.delete(f"/events/{event['id']}", headers=other)
+    assert response.status_code == 403
+    response = await client.delete("/events/999999", headers=owner)
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_keyset_pagination_walks_every_comment_once(client):
+    headers = await register_and_login(client, "routes-pager")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    created = []
+    for i in range(7):
+        response = await client.post("/comments/", json={"content": f"#{i}", "event_id": event["id"]},
+                                     headers=headers)
+        created.append(response.json()["id"])
+
+    seen, after = [], None
+    while True:
+        params = {"limit": 3} if after is None else {"limit": 3, "after": after}
+        page = (await client.get(f"/comments/event/{event['id']}", params=params)).json()
+        seen.extend(c["id"] for c in page["items"])
+        after = page["next_cursor"]
+        if after is None:
+            break
+
+    assert seen == created
+    response = await client.get("/events/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_cursor_values_must_match_the_sort_key_types(client):
+    for url, params, values in [("/events/", {}, ["x"]), ("/users/", {}, [True]), ("/comments/event/1", {}, [1.5]),
+                                ("/events/", {"sort": "date"}, [20300101, 1]),
+                                ("/events/", {"sort": "date"}, ["2030-01-01T19:00:00", "1"]),
+                                ("/events/", {"sort": "popular"}, [{}, "2030-01-01T19:00:00", 1])]:
+        response = await client.get(url, params={**params, "after": encode_cursor(values)})
+        assert response.status_code == 400, (url, params, values)
+
+    response = await client.get("/events/", params={"sort": "date", "after": encode_cursor([datetime(2030, 1, 1), 1])})
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_events_filtered_by_window_and_location_in_date_order(client):
+    headers = await register_and_login(client, "routes-filters")
+    start = datetime(2031, 6, 6, 18)
+    for days, location in [(3, "Kadikoy"), (1, "Kadikoy"), (2, "Besiktas"), (10, "Kadikoy")]:
+        payload = event_payload(title=f"+{days}d {location}", location=location,
+                                date_time=(start + timedelta(days=days)).isoformat())
+        await client.post("/events/", json=payload, headers=headers)
+
+    params = {"starts_after": start.isoformat(), "starts_before": (start + timedelta(days=7)).isoformat(),
+              "location": "Kadikoy", "sort": "date"}
+    page = (await client.get("/events/", params=params)).json()
+
+    assert [e["title"] for e in page["items"]] == ["+1d Kadikoy", "+3d Kadikoy"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("comment_count", [1, 25])
+async def test_expanded_event_takes_two_queries_whatever_the_comment_count(client, statements, comment_count):
+    headers = await register_and_login(client, f"expander-{comment_count}")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    items = [{"content": f"Comment {i}", "event_id": event["id"]} for i in range(comment_count)]
+    await client.post("/comments/bulk", json={"items": items}, headers=headers)
+
+    statements.clear()
+    response = await client.get(f"/events/{event['id']}", params={"include": "comments,creator"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["creator"]["username"] == f"expander-{comment_count}"
+    assert [comment["content"] for comment in body["comments"]] == [item["content"] for item in items]
+    assert len(statements) == 2
+
+
+@pytest.mark.anyio
+async def test_event_include_is_validated_and_optional(client):
+    headers = await register_and_login(client, "include-checker")
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+
+    plain = (await client.get(f"/events/{event['id']}")).json()
+    assert "creator" not in plain and "comments" not in plain
+    only_creator = (await client.get(f"/events/{event['id']}", params={"include": "creator"})).json()
+    assert "comments" not in only_creator
+    assert (await client.get(f"/events/{event['id']}", params={"include": "votes"})).status_code == 400
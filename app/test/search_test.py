@@ -0,0 +1,30 @@
+import pytest
+from app.test.routes_test import register_and_login, event_payload
+
+
+async def search(client, q):
+    response = await client.get("/events/search", params={"q": q})
+    assert response.status_code == 200
+    return [event["title"] for event in response.json()]
+
+
+@pytest.mark.anyio
+async def test_search_ranks_title_matches_and_follows_writes(client):
+    headers = await register_and_login(client, "search-owner")
+    await client.post("/events/", json=event_payload(title="Zephyr chess meetup", description="Casual games"),
+                      headers=headers)
+    described = (await client.post("/events/", json=event_payload(title="Zephyr board games",
+                                                                  description="Some chess boards too"),
+                                   headers=headers)).json()
+
+    assert await search(client, "zephyr chess") == ["Zephyr chess meetup", "Zephyr board games"]
+    assert await search(client, "zeph") == ["Zephyr chess meetup", "Zephyr board games"]
+    assert await search(client, '"zephyr*(') == ["Zephyr chess meetup", "Zephyr board games"]
+
+    await client.put(f"/events/{described['id']}", json=event_payload(title="Zephyr go club", description=None),
+                     headers=headers)
+    assert await search(client, "zephyr chess") == ["Zephyr chess meetup"]
+    assert await search(client, "zephyr go") == ["Zephyr go club"]
+
+    await client.delete(f"/events/{described['id']}", headers=headers)
+    assert await search(client, "zephyr") == ["Zephyr chess meetup"]
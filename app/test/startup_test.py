@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+# Import time spent in the application's own modules, and in total, when building the app (generous: the
+# application modules take ~0.1 s and the whole import ~1 s on a laptop).
+APP_IMPORT_BUDGET_SECONDS = 0.5
+TOTAL_IMPORT_BUDGET_SECONDS = 5.0
+
+
+def run_python(code: str, *args: str, options=(), **env) -> subprocess.CompletedProcess:
+    environment = {name: value for name, value in os.environ.items()
+                   if name not in ("DATABASE_URL", "DATABASE_REPLICA_URLS")}
+    environment.update(SECRET_KEY="test-secret-key", ALGORITHM="HS256", **env)
+    return subprocess.run([sys.executable, *options, "-c", textwrap.dedent(code), *args], env=environment,
+                          capture_output=True, text=True, check=True)
+
+
+def test_building_the_app_needs_no_database():
+    result = run_python("""
+        import sys
+        import main
+        from app.services import database
+
+        main.app
+        assert database._engine is None
+        assert not {"aiosqlite", "asyncpg", "uvicorn"} & set(sys.modules)
+        try:
+            database.get_engine()
+        except RuntimeError:
+            print("no database configured")
+    """)
+    assert result.stdout.strip() == "no database configured"
+
+    # An unreachable server is not contacted either
+    run_python("import main; main.app", DATABASE_URL="postgresql://nobody@127.0.0.1:1/nowhere",
+               DATABASE_REPLICA_URLS="postgresql://nobody@127.0.0.1:2/nowhere")
+
+
+def test_database_and_streams_are_configured_from_the_settings():
+    result = run_python("""
+        from jose import jwt
+        from app.services import authentication, cache, database, hashing, pubsub
+        from app.settings import Settings
+
+        # Importing reads no configuration
+        assert database._settings is None and pubsub.comment_hub.queue_size == Settings.pubsub_queue_size
+        assert cache.identity_cache.ttl == Settings.auth_cache_ttl_seconds
+
+        from main import create_app
+        create_app()
+        assert database.get_settings().db_pool_size == 3 and pubsub.comment_hub.queue_size == 7
+        assert cache.identity_cache.ttl == 2 and hashing.password_hasher.queue_limit == 5
+
+        url = "postgresql://nobody@127.0.0.1:1/nowhere"
+        create_app(Settings(database_url=url, db_pool_size=9, read_your_writes_seconds=1, pubsub_queue_size=11,
+                            secret_key="other-key", algorithm="HS256", read_cache_size=13))
+        assert database.engine_options(url)["pool_size"] == 9 and database.recent_writers.ttl == 1
+        assert pubsub.comment_hub.queue_size == 11 and database.get_settings().database_url == url
+        assert cache.read_cache.backend.cache.maxsize == 13
+        token = authentication.create_access_token({"sub": "someone"})
+        assert jwt.decode(token, "other-key", algorithms=["HS256"])["sub"] == "someone"
+        print("configured")
+    """, DB_POOL_SIZE="3", PUBSUB_QUEUE_SIZE="7", AUTH_CACHE_TTL_SECONDS="2", PASSWORD_HASH_QUEUE_LIMIT="5")
+    assert result.stdout.strip() == "configured"
+
+
+def test_import_time_stays_within_budget():
+    stderr = run_python("import main; main.app", options=("-X", "importtime")).stderr
+    app_seconds = total_seconds = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        if module.split(".")[0] in ("app", "main"):
+            app_seconds += int(own) / 1e6
+        if module == "main":
+            total_seconds = int(cumulative) / 1e6
+    assert 0 < app_seconds < APP_IMPORT_BUDGET_SECONDS
+    assert total_seconds < TOTAL_IMPORT_BUDGET_SECONDS
+
+
+def test_tables_are_created_at_startup_only_when_asked(tmp_path):
+    code = """
+        import asyncio, sqlite3, sys
+        from main import create_app
+        from app.settings import Settings
+
+        path, create_tables = sys.argv[1], sys.argv[2] == "true"
+        app = create_app(Settings(database_url=f"sqlite:///{path}", admission_control=False,
+                                  create_tables=create_tables))
+        asyncio.run(app.router.startup())
+        tables = sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        print(" ".join(sorted(name for name, in tables)))
+    """
+    assert run_python(code, str(tmp_path / "plain.db"), "false").stdout.split() == []
+    created = run_python(code, str(tmp_path / "created.db"), "true")
+    assert {"comments", "events", "users"} <= set(created.stdout.split())
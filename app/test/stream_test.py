@@ -0,0 +1,183 @@
+import asyncio
+import json
+import pytest
+from app.services.pubsub import EVICTED, SUBSCRIBED, Hub, InProcessTransport, TooManySubscribers, comment_hub
+from app.test.routes_test import register_and_login, event_payload
+
+
+class Connection:
+    """Drives a streaming ASGI request by hand: httpx's ASGITransport only returns once the response is complete."""
+
+    def __init__(self, app, path: str, websocket: bool = False):
+        self.sent = asyncio.Queue()
+        self.incoming = asyncio.Queue()
+        scope = {"type": "websocket" if websocket else "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                 "scheme": "ws" if websocket else "http", "path": path, "raw_path": path.encode(),
+                 "query_string": b"", "root_path": "", "headers": [(b"host", b"test")],
+                 "client": ("127.0.0.1", 5000), "server": ("test", 80)}
+        if websocket:
+            self.incoming.put_nowait({"type": "websocket.connect"})
+        else:
+            scope["method"] = "GET"
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self.sent.put))
+
+    async def next(self) -> dict:
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def next_event(self) -> dict:
+        message = await self.next()
+        data = message["body"].decode()
+        assert data.startswith("data: ") and data.endswith("\n\n")
+        return json.loads(data[len("data: "):])
+
+    async def disconnect(self, message: dict):
+        await self.incoming.put(message)
+        await asyncio.wait_for(self.task, 5)
+
+
+@pytest.mark.anyio
+async def test_comments_are_pushed_to_event_streams(client):
+    from main import app
+    headers = await register_and_login(client, "streamer")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+
+    stream = Connection(app, f"/comments/event/{event_id}/stream")
+    start = await stream.next()
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+    assert await stream.next_event() == {"type": "stream.subscribed"}
+
+    created = (await client.post("/comments/", json={"content": "On my way", "event_id": event_id},
+                                 headers=headers)).json()
+    assert await stream.next_event() == {"type": "comment.created", "comment": created}
+
+    await client.delete(f"/comments/{created['id']}", headers=headers)
+    assert await stream.next_event() == {"type": "comment.deleted",
+                                         "comment": {"id": created["id"], "event_id": event_id}}
+
+    bulk = await client.post("/comments/bulk", json={"items": [{"content": "Bulk", "event_id": event_id}]},
+                             headers=headers)
+    message = await stream.next_event()
+    assert message["type"] == "comment.created"
+    assert message["comment"]["id"] == bulk.json()["results"][0]["id"]
+
+    await stream.disconnect({"type": "http.disconnect"})
+    assert comment_hub.subscriber_count == 0
+
+
+@pytest.mark.anyio
+async def test_streams_are_told_about_comments_deleted_with_their_event_or_author(client):
+    from main import app
+    headers = await register_and_login(client, "stream_host")
+    guest = await register_and_login(client, "stream_guest")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+    other_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+    comment_ids = [(await client.post("/comments/", json={"content": "Hi", "event_id": event_id},
+                                      headers=author)).json()["id"] for author in (headers, guest)]
+    guest_comment = (await client.post("/comments/", json={"content": "Bye", "event_id": other_id},
+                                       headers=guest)).json()
+
+    streams = {}
+    for stream_event_id in (event_id, other_id):
+        streams[stream_event_id] = Connection(app, f"/comments/event/{stream_event_id}/stream")
+        await streams[stream_event_id].next()
+        assert await streams[stream_event_id].next_event() == {"type": "stream.subscribed"}
+
+    await client.delete(f"/users/{guest_comment['user_id']}", headers=guest)
+    assert await streams[other_id].next_event() == {"type": "comment.deleted",
+                                                   "comment": {"id": guest_comment["id"], "event_id": other_id}}
+    assert await streams[event_id].next_event() == {"type": "comment.deleted",
+                                                   "comment": {"id": comment_ids[1], "event_id": event_id}}
+
+    assert (await client.delete(f"/events/{event_id}", headers=headers)).status_code == 204
+    assert await streams[event_id].next_event() == {"type": "comment.deleted",
+                                                   "comment": {"id": comment_ids[0], "event_id": event_id}}
+
+    for stream in streams.values():
+        await stream.disconnect({"type": "http.disconnect"})
+    assert comment_hub.subscriber_count == 0
+
+
+@pytest.mark.anyio
+async def test_comments_are_pushed_over_websockets(client):
+    from main import app
+    headers = await register_and_login(client, "ws_streamer")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+
+    socket = Connection(app, f"/comments/event/{event_id}/stream", websocket=True)
+    assert (await socket.next())["type"] == "websocket.accept"
+    assert json.loads((await socket.next())["text"]) == {"type": "stream.subscribed"}
+
+    created = (await client.post("/comments/", json={"content": "Hi", "event_id": event_id},
+                                 headers=headers)).json()
+    assert json.loads((await socket.next())["text"]) == {"type": "comment.created", "comment": created}
+
+    await socket.disconnect({"type": "websocket.disconnect", "code": 1000})
+    assert comment_hub.subscriber_count == 0
+
+    missing = Connection(app, "/comments/event/999999/stream", websocket=True)
+    assert await missing.next() == {"type": "websocket.close", "code": 1008, "reason": "Event not found"}
+
+
+@pytest.mark.anyio
+async def test_streams_are_refused_for_missing_events_and_when_full(client, monkeypatch):
+    assert (await client.get("/comments/event/999999/stream")).status_code == 404
+
+    headers = await register_and_login(client, "stream_full")
+    event_id = (await client.post("/events/", json=event_payload(), headers=headers)).json()["id"]
+    monkeypatch.setattr(comment_hub, "max_subscribers", 0)
+    response = await client.get(f"/comments/event/{event_id}/stream")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+async def collect(stream, into: list):
+    async for data in stream:
+        into.append(data)
+
+
+@pytest.mark.anyio
+async def test_slow_subscribers_are_evicted():
+    hub = Hub(InProcessTransport(), queue_size=2)
+    received = []
+    stream = hub.stream("topic")
+    assert await stream.__anext__() == SUBSCRIBED
+
+    for i in range(3):  # The subscriber reads nothing meanwhile
+        await hub.publish("topic", {"n": i})
+    assert hub.evictions == 1 and hub.subscriber_count == 0
+
+    await collect(stream, received)
+    assert received == ['{"n":0}', '{"n":1}', EVICTED]
+
+
+@pytest.mark.anyio
+async def test_idle_streams_yield_heartbeats_and_subscribers_are_bounded():
+    hub = Hub(InProcessTransport(), max_subscribers=1)
+    stream = hub.stream("topic", heartbeat=0.01)
+    assert await stream.__anext__() == SUBSCRIBED
+    assert await stream.__anext__() is None
+
+    with pytest.raises(TooManySubscribers):
+        await hub.stream("other").__anext__()
+    await stream.aclose()
+    assert hub.subscriber_count == 0
+
+
+@pytest.mark.anyio
+async def test_one_publish_reaches_ten_thousand_idle_subscribers():
+    hub = Hub(InProcessTransport())
+    received = [[] for _ in range(10000)]
+    streams = [hub.stream(f"comments:{i % 100}") for i in range(10000)]
+    tasks = [asyncio.create_task(collect(stream, into)) for stream, into in zip(streams, received)]
+    await asyncio.sleep(0.1)
+    assert hub.subscriber_count == 10000
+
+    await hub.publish("comments:7", {"type": "comment.created"})
+    await asyncio.sleep(0.1)
+    assert sum(len(into) == 2 for into in received) == 100  # Only the topic's subscribers wake up
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert hub.subscriber_count == 0
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import func, select
+from app.models import Change
+from app.services import changes
+from app.services.database import SessionLocal
+from app.test.routes_test import register_and_login, event_payload
+
+
+async def sync(client, headers, since=0, limit=1000):
+    """Follows the feed until ``has_more`` is false, like a client would."""
+    collected, horizon = [], None
+    while True:
+        params = {"since": since, "limit": limit, **({"horizon": horizon} if horizon is not None else {})}
+        response = await client.get("/sync/changes", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        collected += page["changes"]
+        since, horizon = page["next_token"], page["horizon"]
+        if not page["has_more"]:
+            return collected, since
+
+
+def summary(feed):
+    return [(change["type"], change["id"], change["op"]) for change in feed]
+
+
+@pytest.mark.anyio
+async def test_feed_returns_the_rows_changed_since_a_token(client):
+    headers = await register_and_login(client, "syncer")
+    _, token = await sync(client, headers)
+
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    comment = (await client.post("/comments/", json={"content": "Hi", "event_id": event["id"]},
+                                 headers=headers)).json()
+    await client.put(f"/events/{event['id']}", json=event_payload(title="Renamed"), headers=headers)
+    await client.delete(f"/comments/{comment['id']}", headers=headers)
+
+    feed, next_token = await sync(client, headers, since=token)
+    assert summary(feed) == [("event", event["id"], "upsert"), ("comment", comment["id"], "delete")]
+    current = (await client.get(f"/events/{event['id']}")).json()
+    assert feed[0]["data"] == current and current["title"] == "Renamed"
+    assert "data" not in feed[1]
+    assert next_token > token
+    assert await sync(client, headers, since=next_token) == ([], next_token)
+
+    await client.delete(f"/events/{event['id']}", headers=headers)
+    feed, _ = await sync(client, headers, since=next_token)
+    assert summary(feed) == [("event", event["id"], "delete")]
+
+    full, _ = await sync(client, headers, limit=100)
+    assert ("event", event["id"], "upsert") not in summary(full)
+    assert any(change["type"] == "user" and change["data"]["username"] == "syncer" for change in full)
+
+
+@pytest.mark.anyio
+async def test_feed_requires_authentication_and_failed_writes_leave_no_entry(client):
+    assert (await client.get("/sync/changes")).status_code == 401
+
+    headers = await register_and_login(client, "sync-failure")
+    _, token = await sync(client, headers)
+    user = {"username": "sync-failure", "email": "other@example.com", "password": "secret"}
+    assert (await client.post("/users/register", json=user)).status_code == 400
+    assert await sync(client, headers, since=token) == ([], token)
+
+
+@pytest.mark.anyio
+async def test_deleting_a_user_records_tombstones_for_its_events_and_comments(client):
+    headers = await register_and_login(client, "sync-leaver")
+    other = await register_and_login(client, "sync-stayer")
+    mine = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    theirs = (await client.post("/events/", json=event_payload(), headers=other)).json()
+    on_mine = (await client.post("/comments/", json={"content": "a", "event_id": mine["id"]}, headers=other)).json()
+    on_theirs = (await client.post("/comments/", json={"content": "b", "event_id": theirs["id"]},
+                                   headers=headers)).json()
+    _, token = await sync(client, other)
+
+    user_id = (await client.delete(f"/users/{mine['creator_id']}", headers=headers)).json()["id"]
+    feed, _ = await sync(client, other, since=token)
+    assert sorted(summary(feed)) == sorted([
+        ("user", user_id, "delete"), ("event", mine["id"], "delete"), ("comment", on_mine["id"], "delete"),
+        ("comment", on_theirs["id"], "delete"), ("event", theirs["id"], "upsert")])
+    assert next(change for change in feed if change["op"] == "upsert")["data"]["comment_count"] == 0
+
+
+@pytest.mark.anyio
+async def test_compaction_keeps_the_feed_and_expires_old_tokens(client):
+    headers = await register_and_login(client, "sync-compactor")
+    _, token = await sync(client, headers)
+    event = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    for title in ("One", "Two", "Three"):
+        await client.put(f"/events/{event['id']}", json=event_payload(title=title), headers=headers)
+    gone = (await client.post("/events/", json=event_payload(), headers=headers)).json()
+    await client.delete(f"/events/{gone['id']}", headers=headers)
+    before, _ = await sync(client, headers, since=token)
+
+    async with SessionLocal() as db:
+        result = await changes.compact_changes(db, retention_days=30)
+        assert result["superseded"] >= 4 and result["tombstones"] == 0
+        entries = await db.scalar(select(func.count()).select_from(Change).filter(Change.entity == "event",
+                                                                                   Change.entity_id == event["id"]))
+        assert entries == 1
+    assert await sync(client, headers, since=token) == (before, before[-1]["token"])
+
+    async with SessionLocal() as db:
+        result = await changes.compact_changes(db, retention_days=0)
+    assert result["tombstones"] >= 1 and result["horizon"] >= before[-1]["token"]
+    response = await client.get("/sync/changes", params={"since": token}, headers=headers)
+    assert response.status_code == 410
+    full, _ = await sync(client, headers)
+    assert ("event", event["id"], "upsert") in summary(full)
+    assert all(change["op"] == "upsert" for change in full)
+
+    # A sync from token 0 walks past the horizon a page at a time; a token from before the compaction does not.
+    assert await sync(client, headers, limit=1) == await sync(client, headers)
+    stale = {"since": token, "horizon": result["horizon"] - 1}
+    assert (await client.get("/sync/changes", params=stale, headers=headers)).status_code == 410
@@ -0,0 +1,120 @@
+"""
+Benchmark for creating many events: one request per event versus the bulk endpoint.
+
+Creates ``--events`` events through the application over an in-process ASGI transport, first one at a time with
+``POST /events/`` (an ``add``, ``commit`` and ``refresh`` per event), then in batches of ``--batch-size`` with
+``POST /events/bulk`` (one multi-row ``INSERT ... RETURNING`` per batch), and reports throughput and the number of
+SQL statements each path issued.
+
+As in ``benchmarks.concurrency``, a fixed per-statement latency (``--latency-ms``) stands in for the network round
+trip to a PostgreSQL server.
+
+Usage:
+    python -m benchmarks.bulk_create --events 2000 --batch-size 500 --latency-ms 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "bulk.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# Requests come from one client as fast as possible; admission control is measured by benchmarks.overload.
+os.environ["ADMISSION_CONTROL"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from sqlalchemy import create_engine, event
+
+import app.models  # noqa: F401
+from app.services import authentication, database
+from main import app
+
+
+def seed():
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    database.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO users (id, username, email, hashed_password, token_version) "
+                             "VALUES (1, 'bench', 'bench@example.com', 'x', 0)")
+    sync_engine.dispose()
+
+
+def instrument(seconds: float) -> list:
+    statements = []
+
+    # The requests are sent one after another, so sleeping on the event loop thread is fine here. (The SQLite
+    # trace callback used by benchmarks.concurrency fires again for every trigger step of a multi-row insert.)
+    @event.listens_for(database.engine.sync_engine, "before_cursor_execute")
+    def round_trip(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        time.sleep(seconds)
+
+    return statements
+
+
+def payload(i: int) -> dict:
+    return {"title": f"Event {i}", "description": "Benchmark event",
+            "date_time": (datetime(2030, 1, 1) + timedelta(minutes=i)).isoformat(), "location": "Kadikoy"}
+
+
+async def one_at_a_time(client: httpx.AsyncClient, events: int, batch_size: int):
+    for i in range(events):
+        response = await client.post("/events/", json=payload(i))
+        response.raise_for_status()
+
+
+async def bulk(client: httpx.AsyncClient, events: int, batch_size: int):
+    for start in range(0, events, batch_size):
+        items = [payload(i) for i in range(start, min(start + batch_size, events))]
+        response = await client.post("/events/bulk", json={"items": items})
+        response.raise_for_status()
+        assert response.json()["created"] == len(items)
+
+
+async def run(path, events: int, batch_size: int, statements: list) -> dict:
+    token = authentication.create_access_token(data={"sub": "bench", "uid": 1, "ver": 0})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        statements.clear()
+        start = time.perf_counter()
+        await path(client, events, batch_size)
+        elapsed = time.perf_counter() - start
+    return {
+        "events": events,
+        "seconds": round(elapsed, 3),
+        "events_per_second": round(events / elapsed, 1),
+        "statements": len(statements),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    seed()
+    statements = instrument(args.latency_ms / 1000)
+    results = {name: asyncio.run(run(path, args.events, args.batch_size, statements))
+               for name, path in (("one-at-a-time", one_at_a_time), ("bulk", bulk))}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'path':<15}{'events':>8}{'seconds':>10}{'events/s':>11}{'statements':>12}")
+    for name, r in results.items():
+        print(f"{name:<15}{r['events']:>8}{r['seconds']:>10}{r['events_per_second']:>11}{r['statements']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Concurrency benchmark for the async database layer.
+
+Fires ``--requests`` calls at ``GET /events/{event_id}`` from ``--concurrency`` concurrent clients through an
+in-process ASGI transport and reports the throughput of two handlers backed by the same SQLite file:
+
+* ``blocking``: the previous design, an ``async def`` handler running a synchronous ``Session`` query on the
+  event loop thread.
+* ``async``: the application's real route, backed by ``AsyncSession``.
+
+A fixed per-statement latency (``--latency-ms``) is injected in the SQLite driver thread to stand in for the
+network round trip to a PostgreSQL server; without it SQLite answers from the page cache and there is nothing
+for the event loop to overlap.
+
+Usage:
+    python -m benchmarks.concurrency --requests 400 --concurrency 100 --latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# Requests come from one client as fast as possible; admission control is measured by benchmarks.overload.
+os.environ["ADMISSION_CONTROL"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models import User, Event
+from app.schemas import event as event_schemas
+from app.services import database
+from main import app as async_app
+
+
+def seed(sync_engine, events: int):
+    database.Base.metadata.create_all(sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add_all([Event(title=f"Event {i}", description="Benchmark event", date_time=datetime(2024, 1, 1),
+                          location="Kadikoy", creator_id=user.id) for i in range(events)])
+        db.commit()
+
+
+def build_blocking_app(sync_engine) -> FastAPI:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    app = FastAPI()
+
+    @app.get("/events/{event_id}", response_model=event_schemas.Event)
+    async def read_event(event_id: int):
+        with SessionLocal() as db:
+            return db.query(Event).filter(Event.id == event_id).first()
+
+    return app
+
+
+def inject_latency(sync_engine, seconds: float, driver_is_async: bool):
+    def sleep(_statement):
+        time.sleep(seconds)
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        if driver_is_async:
+            dbapi_connection.run_async(lambda conn: conn.set_trace_callback(sleep))
+        else:
+            dbapi_connection.set_trace_callback(sleep)
+
+
+async def drive(app: FastAPI, requests: int, concurrency: int, events: int) -> dict:
+    counter = iter(range(requests))
+    statuses = []
+
+    async def worker(client: httpx.AsyncClient):
+        for i in counter:
+            response = await client.get(f"/events/{i % events + 1}")
+            statuses.append(response.status_code)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "errors": sum(1 for status in statuses if status != 200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    seed(sync_engine, args.events)
+    sync_engine.dispose()
+    inject_latency(sync_engine, args.latency_ms / 1000, driver_is_async=False)
+    inject_latency(database.engine.sync_engine, args.latency_ms / 1000, driver_is_async=True)
+
+    results = {}
+    for name, app in (("blocking", build_blocking_app(sync_engine)), ("async", async_app)):
+        results[name] = asyncio.run(drive(app, args.requests, args.concurrency, args.events))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'handler':<10}{'requests':>10}{'conc':>6}{'seconds':>10}{'req/s':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['requests']:>10}{r['concurrency']:>6}{r['seconds']:>10}"
+              f"{r['requests_per_second']:>10}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
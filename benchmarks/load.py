@@ -0,0 +1,372 @@
+"""
+Load test for every API route.
+
+Seeds a database with ``--users`` users, ``--events`` events and ``--comments`` comments, then drives every route
+of the application through an in-process ASGI client, one scenario after another. Each scenario sends
+``--requests`` requests (``--slow-requests`` for bcrypt-bound and full-export routes) from ``--concurrency``
+concurrent clients and records the latency of every request. Results go to a JSON file (``--output``) with
+p50/p95/p99 latency, requests per second, and the response status counts per scenario, keyed and sorted so that the files of two commits
+can be diffed.
+
+The database is a fresh SQLite file by default. Point ``DATABASE_URL`` at an empty PostgreSQL database to measure
+against PostgreSQL instead (the schema is created with ``create_all``). Every route must have a scenario, or an entry
+in ``EXEMPT_ROUTES`` naming the benchmark that measures it instead: the run stops before seeding if a route has
+neither.
+
+Usage:
+    python -m benchmarks.load --users 1000 --events 10000 --comments 50000 --requests 500 --concurrency 20
+    python -m benchmarks.load --only "GET /events/" --output before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "load.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+# Every scenario comes from one client; admission control is measured by benchmarks.overload.
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+
+import httpx
+import sqlalchemy
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, func, insert, select, update
+
+from app.models import Change, Comment, Event, User
+from app.services import authentication, database, geo
+from app.services.cache import read_cache
+from app.services.hashing import pwd_context
+from main import app
+
+PASSWORD = "benchmark"
+WORDS = ["board", "games", "music", "jazz", "yoga", "coding", "picnic", "running", "chess", "film", "cooking", "art"]
+LOCATIONS = ["Kadikoy", "Besiktas", "Moda", "Uskudar", "Cihangir", "Balat"]
+REGION = {"lat": (40.95, 41.1), "lon": (28.9, 29.1)}
+BULK_ITEMS = 100
+
+
+def seed(users: int, events: int, comments: int, rng: random.Random) -> str:
+    """
+        Fill the database through Core inserts (no ORM, no API) and return the bcrypt hash all users share.
+    """
+    sync_engine = create_engine(database.get_settings().database_url)
+    database.Base.metadata.create_all(sync_engine)
+    hashed_password = pwd_context.hash(PASSWORD)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"username": f"bench-{i}", "email": f"bench-{i}@example.com", "hashed_password": hashed_password,
+             "token_version": 0} for i in range(users)])
+        start = datetime(2030, 1, 1)
+        rows = []
+        for i in range(events):
+            lat, lon = rng.uniform(*REGION["lat"]), rng.uniform(*REGION["lon"])
+            rows.append({"title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+                         "description": " ".join(rng.choices(WORDS, k=8)), "location": rng.choice(LOCATIONS),
+                         "date_time": start + timedelta(hours=rng.randrange(24 * 365)),
+                         "creator_id": rng.randrange(users) + 1, "latitude": lat, "longitude": lon,
+                         "geo_cell": geo.cell_for(lat, lon)})
+        for offset in range(0, len(rows), 10000):
+            conn.execute(insert(Event.__table__), rows[offset:offset + 10000])
+        rows = [{"content": " ".join(rng.choices(WORDS, k=6)), "event_id": rng.randrange(events) + 1,
+                 "user_id": rng.randrange(users) + 1} for _ in range(comments)]
+        for offset in range(0, len(rows), 10000):
+            conn.execute(insert(Comment.__table__), rows[offset:offset + 10000])
+        counts = (select(func.count(Comment.id)).where(Comment.event_id == Event.__table__.c.id).scalar_subquery())
+        conn.execute(update(Event.__table__).values(comment_count=counts))
+        # The change log entries the write paths would have appended, so the sync feed has every row to list.
+        for entity, count in (("user", users), ("event", events), ("comment", comments)):
+            for offset in range(0, count, 10000):
+                conn.execute(insert(Change.__table__), [
+                    {"entity": entity, "entity_id": entity_id, "deleted": False, "changed_at": database.utcnow()}
+                    for entity_id in range(offset + 1, min(offset + 10000, count) + 1)])
+    sync_engine.dispose()
+    return hashed_password
+
+
+class Scenario:
+    """
+        A named request pattern for one route.
+
+        Args:
+            name (str): The scenario name, ``METHOD /route/path`` plus an optional variant suffix.
+            build (Callable): Function of ``(i, ctx, targets)`` returning the ``httpx`` request arguments
+                (``method``, ``url`` and optionally ``params``, ``json``, ``headers``) of the i-th request.
+            expect (int): The expected status code.
+            setup (Optional[Callable]): Coroutine of ``(client, ctx, n)`` preparing ``n`` targets (e.g. rows to
+                delete) before the timed run; its result is passed to ``build`` as ``targets``.
+            slow (bool): Whether the route is CPU-bound per request (bcrypt, full export) and gets ``--slow-requests``.
+    """
+
+    def __init__(self, name, build, expect=200, setup=None, slow=False):
+        self.name = name
+        self.route = name.split("?")[0].split(" [")[0]
+        self.build = build
+        self.expect = expect
+        self.setup = setup
+        self.slow = slow
+
+
+def event_json(i: int, rng: random.Random) -> dict:
+    return {"title": f"Load {rng.choice(WORDS)} {i}", "description": "Created by the load test",
+            "date_time": (datetime(2031, 1, 1) + timedelta(hours=i)).isoformat(), "location": rng.choice(LOCATIONS),
+            "latitude": rng.uniform(*REGION["lat"]), "longitude": rng.uniform(*REGION["lon"])}
+
+
+async def create_own_events(client, ctx, n):
+    ids = []
+    for start in range(0, n, BULK_ITEMS):
+        items = [event_json(i, ctx["rng"]) for i in range(start, min(start + BULK_ITEMS, n))]
+        response = await client.post("/events/bulk", json={"items": items}, headers=ctx["auth"])
+        ids += [result["id"] for result in response.json()["results"]]
+    return ids
+
+
+async def create_own_comments(client, ctx, n):
+    ids = []
+    for start in range(0, n, BULK_ITEMS):
+        items = [{"content": "to be deleted", "event_id": ctx["rng"].randrange(ctx["events"]) + 1}
+                 for _ in range(start, min(start + BULK_ITEMS, n))]
+        response = await client.post("/comments/bulk", json={"items": items}, headers=ctx["auth"])
+        ids += [result["id"] for result in response.json()["results"]]
+    return ids
+
+
+async def create_spare_users(client, ctx, n):
+    async with database.engine.begin() as conn:
+        result = await conn.execute(insert(User.__table__).returning(User.id), [
+            {"username": f"spare-{ctx['spare']}-{i}", "email": f"spare-{ctx['spare']}-{i}@example.com",
+             "hashed_password": ctx["hashed_password"], "token_version": 0} for i in range(n)])
+        ids = sorted(result.scalars())
+    ctx["spare"] += 1
+    return ids
+
+
+async def fetch_etags(client, ctx, n):
+    etags = []
+    for i in range(n):
+        event_id = ctx["rng"].randrange(ctx["events"]) + 1
+        etags.append((event_id, (await client.get(f"/events/{event_id}")).headers["etag"]))
+    return etags
+
+
+async def follow_changes(client, ctx, n):
+    """
+        Walk the change feed from token 0 like a syncing client and return the query of every page, so that each
+        request continues from the ``next_token`` and ``horizon`` of the page before it.
+    """
+    pages, params = [], {"since": 0}
+    while len(pages) < n:
+        page = (await client.get("/sync/changes", params=params, headers=ctx["auth"])).json()
+        pages.append(params)
+        # At the end of the feed the client starts over, as after a 410.
+        params = {"since": page["next_token"], "horizon": page["horizon"]} if page["has_more"] else {"since": 0}
+    return pages
+
+
+def random_event(ctx) -> int:
+    return ctx["rng"].randrange(ctx["events"]) + 1
+
+
+def build_scenarios() -> list:
+    return [
+        Scenario("GET /", lambda i, ctx, t: {"method": "GET", "url": "/"}),
+        Scenario("GET /cache/stats", lambda i, ctx, t: {"method": "GET", "url": "/cache/stats"}),
+        Scenario("GET /metrics", lambda i, ctx, t: {"method": "GET", "url": "/metrics"}),
+        Scenario("GET /users/", lambda i, ctx, t: {"method": "GET", "url": "/users/"}),
+        Scenario("GET /users/{user_id}",
+                 lambda i, ctx, t: {"method": "GET", "url": f"/users/{ctx['rng'].randrange(ctx['users']) + 1}"}),
+        Scenario("GET /events/", lambda i, ctx, t: {"method": "GET", "url": "/events/"}),
+        Scenario("GET /events/?sort=date", lambda i, ctx, t: {
+            "method": "GET", "url": "/events/",
+            "params": {"sort": "date", "starts_after": f"2030-{ctx['rng'].randrange(1, 13):02d}-01T00:00:00",
+                       "location": ctx["rng"].choice(LOCATIONS)}}),
+        Scenario("GET /events/?sort=popular",
+                 lambda i, ctx, t: {"method": "GET", "url": "/events/", "params": {"sort": "popular"}}),
+        Scenario("GET /events/search", lambda i, ctx, t: {
+            "method": "GET", "url": "/events/search", "params": {"q": ctx["rng"].choice(WORDS)}}),
+        Scenario("GET /events/nearby", lambda i, ctx, t: {
+            "method": "GET", "url": "/events/nearby",
+            "params": {"lat": ctx["rng"].uniform(*REGION["lat"]), "lon": ctx["rng"].uniform(*REGION["lon"]),
+                       "radius_km": 1}}),
+        Scenario("GET /events/{event_id}",
+                 lambda i, ctx, t: {"method": "GET", "url": f"/events/{random_event(ctx)}"}),
+        Scenario("GET /events/{event_id}?include=comments,creator", lambda i, ctx, t: {
+            "method": "GET", "url": f"/events/{random_event(ctx)}", "params": {"include": "comments,creator"}}),
+        Scenario("GET /events/{event_id} [If-None-Match]", lambda i, ctx, t: {
+            "method": "GET", "url": f"/events/{t[i][0]}", "headers": {"If-None-Match": t[i][1]}},
+                 expect=304, setup=fetch_etags),
+        Scenario("GET /comments/event/{event_id}",
+                 lambda i, ctx, t: {"method": "GET", "url": f"/comments/event/{random_event(ctx)}"}),
+        Scenario("GET /sync/changes",
+                 lambda i, ctx, t: {"method": "GET", "url": "/sync/changes", "headers": ctx["auth"]}),
+        Scenario("GET /sync/changes [follow]", lambda i, ctx, t: {
+            "method": "GET", "url": "/sync/changes", "params": t[i], "headers": ctx["auth"]},
+                 setup=follow_changes),
+        Scenario("GET /export/{table}", lambda i, ctx, t: {
+            "method": "GET", "url": f"/export/{('events', 'comments', 'users')[i % 3]}", "headers": ctx["auth"]},
+                 slow=True),
+        Scenario("POST /events/", lambda i, ctx, t: {
+            "method": "POST", "url": "/events/", "json": event_json(i, ctx["rng"]), "headers": ctx["auth"]}),
+        Scenario("POST /events/bulk", lambda i, ctx, t: {
+            "method": "POST", "url": "/events/bulk", "headers": ctx["auth"],
+            "json": {"items": [event_json(i * BULK_ITEMS + j, ctx["rng"]) for j in range(BULK_ITEMS)]}}),
+        Scenario("PUT /events/{event_id}", lambda i, ctx, t: {
+            "method": "PUT", "url": f"/events/{t[i]}", "json": event_json(i, ctx["rng"]), "headers": ctx["auth"]},
+                 setup=create_own_events),
+        Scenario("POST /comments/", lambda i, ctx, t: {
+            "method": "POST", "url": "/comments/", "headers": ctx["auth"],
+            "json": {"content": "Load test comment", "event_id": random_event(ctx)}}),
+        Scenario("POST /comments/bulk", lambda i, ctx, t: {
+            "method": "POST", "url": "/comments/bulk", "headers": ctx["auth"],
+            "json": {"items": [{"content": "Load test comment", "event_id": random_event(ctx)}
+                               for _ in range(BULK_ITEMS)]}}),
+        Scenario("DELETE /comments/{comment_id}", lambda i, ctx, t: {
+            "method": "DELETE", "url": f"/comments/{t[i]}", "headers": ctx["auth"]}, setup=create_own_comments),
+        Scenario("DELETE /events/{event_id}", lambda i, ctx, t: {
+            "method": "DELETE", "url": f"/events/{t[i]}", "headers": ctx["auth"]}, expect=204,
+                 setup=create_own_events),
+        Scenario("POST /users/register", lambda i, ctx, t: {
+            "method": "POST", "url": "/users/register",
+            "json": {"username": f"load-{i}", "email": f"load-{i}@example.com", "password": PASSWORD}}, slow=True),
+        Scenario("POST /users/login", lambda i, ctx, t: {
+            "method": "POST", "url": "/users/login",
+            "json": {"username": f"bench-{i % ctx['users']}", "email": f"bench-{i % ctx['users']}@example.com",
+                     "password": PASSWORD}}, slow=True),
+        Scenario("PUT /users/{user_id}", lambda i, ctx, t: {
+            "method": "PUT", "url": f"/users/{t[i]}",
+            "json": {"username": f"renamed-{t[i]}", "email": f"renamed-{t[i]}@example.com", "password": PASSWORD}},
+                 setup=create_spare_users, slow=True),
+        Scenario("DELETE /users/{user_id}", lambda i, ctx, t: {"method": "DELETE", "url": f"/users/{t[i]}"},
+                 setup=create_spare_users),
+    ]
+
+
+# Routes a request/response scenario cannot measure, and where they are measured instead.
+EXEMPT_ROUTES = {
+    # The response is a stream that stays open until the client leaves; it has no latency to record.
+    "GET /comments/event/{event_id}/stream": "python -m benchmarks.stream",
+}
+
+
+def uncovered_routes(scenarios) -> list:
+    covered = {scenario.route for scenario in scenarios} | set(EXEMPT_ROUTES)
+    routes = {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute)
+              for method in route.methods}
+    return sorted(routes - covered)
+
+
+def percentile(ordered, q: float) -> float:
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ctx: dict, requests: int,
+                       concurrency: int) -> dict:
+    targets = await scenario.setup(client, ctx, requests) if scenario.setup else None
+    await read_cache.clear()
+    counter = iter(range(requests))
+    latencies, statuses = [], Counter()
+
+    async def worker():
+        for i in counter:
+            request = scenario.build(i, ctx, targets)
+            start = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "errors": requests - statuses[str(scenario.expect)],
+        "statuses": dict(statuses),
+    }
+
+
+async def drive(scenarios, args, hashed_password: str) -> dict:
+    ctx = {"rng": random.Random(args.seed), "users": args.users, "events": args.events, "spare": 0,
+           "hashed_password": hashed_password,
+           "auth": {"Authorization": "Bearer " + authentication.create_access_token(
+               data={"sub": "bench-0", "uid": 1, "ver": 0})}}
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in scenarios:
+            requests = args.slow_requests if scenario.slow else args.requests
+            results[scenario.name] = await run_scenario(client, scenario, ctx, requests, args.concurrency)
+            print(f"{scenario.name:<52}{results[scenario.name]['requests_per_second']:>10} req/s"
+                  f"{results[scenario.name]['p95_ms']:>10} ms p95")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario.")
+    parser.add_argument("--slow-requests", type=int, default=20,
+                        help="Requests per scenario for bcrypt-bound and full-export routes.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", help="Run only the scenarios whose name starts with this prefix.")
+    parser.add_argument("--output", default="load-results.json", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    scenarios = build_scenarios()
+    missing = uncovered_routes(scenarios)
+    if missing:
+        parser.error(f"routes without a load scenario: {', '.join(missing)}")
+    if args.only:
+        scenarios = [s for s in scenarios if any(s.name.startswith(prefix) for prefix in args.only)]
+
+    start = time.perf_counter()
+    hashed_password = seed(args.users, args.events, args.comments, random.Random(args.seed))
+    print(f"seeded {args.users} users, {args.events} events, {args.comments} comments "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    results = asyncio.run(drive(scenarios, args, hashed_password))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "database": database.engine.dialect.name,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "only")},
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write("\n")
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark for the "events near me" radius query.
+
+Seeds a SQLite database with ``--events`` synthetic events (one million by default) spread over Turkey, then runs
+``--queries`` radius queries at random points and reports latency for:
+
+* ``full-scan``: what clients did before, fetching every event's coordinates and filtering by haversine distance.
+* ``grid-index``: ``crud_event.get_events_nearby`` for every event in the circle, which reads only the ``geo_cell``
+  ranges around it.
+* ``grid-index-top``: the same for the nearest ``--limit`` events, as ``GET /events/nearby`` asks for, which loads
+  only a few candidates per result.
+
+The worst case of the endpoint, its largest radius (``--worst-case-radius-km``, 100 km), is measured over
+``--worst-case-queries`` points: ``worst-case-all`` loads every event in the circle, ``worst-case-top`` the nearest
+``MAX_PAGE_SIZE``.
+
+Usage:
+    python -m benchmarks.nearby --events 1000000 --queries 200 --radius-km 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "nearby.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from sqlalchemy import create_engine, text
+
+import app.models  # noqa: F401
+from app.services import crud_event, database, geo
+from app.services.pagination import MAX_PAGE_SIZE
+
+REGION = {"lat": (36.0, 42.0), "lon": (26.0, 45.0)}
+
+
+def seed(events: int, rng: random.Random):
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    database.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO users (id, username, email, hashed_password) VALUES (1, 'bench', 'b@x.io', 'x')")
+        rows = []
+        for i in range(events):
+            lat, lon = rng.uniform(*REGION["lat"]), rng.uniform(*REGION["lon"])
+            rows.append((f"Event {i}", "2030-01-01 00:00:00.000000", "Somewhere", 1, lat, lon, geo.cell_for(lat, lon)))
+            if len(rows) == 50000:
+                conn.exec_driver_sql("INSERT INTO events (title, date_time, location, creator_id, latitude, longitude, "
+                                     "geo_cell) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                rows = []
+        if rows:
+            conn.exec_driver_sql("INSERT INTO events (title, date_time, location, creator_id, latitude, longitude, "
+                                 "geo_cell) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.exec_driver_sql("ANALYZE")
+    sync_engine.dispose()
+
+
+async def full_scan(points, radius_km):
+    timings, found = [], []
+    async with database.SessionLocal() as db:
+        for lat, lon in points:
+            start = time.perf_counter()
+            rows = (await db.execute(text("SELECT id, latitude, longitude FROM events"))).all()
+            hits = [row.id for row in rows if geo.haversine_km(lat, lon, row.latitude, row.longitude) <= radius_km]
+            timings.append(time.perf_counter() - start)
+            found.append(len(hits))
+    return timings, found
+
+
+async def grid_index(points, radius_km, limit=1000000):
+    timings, found = [], []
+    async with database.SessionLocal() as db:
+        for lat, lon in points:
+            start = time.perf_counter()
+            nearby = await crud_event.get_events_nearby(db, lat, lon, radius_km, limit=limit)
+            timings.append(time.perf_counter() - start)
+            found.append(len(nearby))
+            db.expunge_all()
+    return timings, found
+
+
+def summarize(timings, found):
+    ordered = sorted(timings)
+    return {
+        "queries": len(timings),
+        "mean_ms": round(statistics.mean(timings) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2),
+        "mean_results": round(statistics.mean(found), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--full-scan-queries", type=int, default=5,
+                        help="Number of queries to run through the (slow) full scan baseline.")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--limit", type=int, default=10, help="Results asked for by the grid-index-top queries.")
+    parser.add_argument("--worst-case-radius-km", type=float, default=100.0)
+    parser.add_argument("--worst-case-queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    seed(args.events, rng)
+    print(f"seeded {args.events} events in {time.perf_counter() - start:.1f}s")
+
+    points = [(rng.uniform(*REGION["lat"]), rng.uniform(*REGION["lon"])) for _ in range(args.queries)]
+    results = {
+        "full-scan": summarize(*asyncio.run(full_scan(points[:args.full_scan_queries], args.radius_km))),
+        "grid-index": summarize(*asyncio.run(grid_index(points, args.radius_km))),
+        "grid-index-top": summarize(*asyncio.run(grid_index(points, args.radius_km, args.limit))),
+    }
+    worst = points[:args.worst_case_queries]
+    results["worst-case-all"] = summarize(*asyncio.run(grid_index(worst, args.worst_case_radius_km)))
+    results["worst-case-top"] = summarize(*asyncio.run(grid_index(worst, args.worst_case_radius_km, MAX_PAGE_SIZE)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'strategy':<16}{'queries':>9}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'results':>9}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['queries']:>9}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['mean_results']:>9}")
+
+
+if __name__ == "__main__":
+    main()
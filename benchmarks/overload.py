@@ -0,0 +1,166 @@
+"""
+Overload benchmark for admission control.
+
+Sends requests at a fixed arrival rate (``--rate`` per second for ``--seconds``), whether or not earlier ones have
+been answered, like real users do. The rate is chosen above what the server can serve. Traffic is a mix of event
+reads (``GET /events/{event_id}``) and comment writes (``POST /comments/``, ``--write-share``), with a per-statement
+latency (``--latency-ms``) injected in the SQLite driver thread as in ``benchmarks.concurrency`` and the read cache
+disabled, so every request does database work.
+
+The same traffic is sent twice: to the application as is (``unprotected``), whose queue and latency grow for as
+long as the overload lasts, and behind ``AdmissionMiddleware`` (``admission``), which serves what it can within
+bounded latency and refuses the rest quickly with ``503``. For each run the report gives the latency percentiles of
+the successful responses and of the refusals, the goodput (successful responses per second), the refusal counts and
+the failures (e.g. ``500`` errors from SQLite giving up on its write lock).
+
+Usage:
+    python -m benchmarks.overload --rate 600 --seconds 3 --latency-ms 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "overload.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["READ_CACHE_TTL_SECONDS"] = "0"
+os.environ["ADMISSION_CONTROL"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from app.models import Event, User
+from app.services import authentication, database
+from app.services.admission import AdmissionMiddleware
+from app.settings import Settings
+from benchmarks.concurrency import inject_latency
+from main import create_app
+
+USERS = 100
+# Explicit settings: importing ``benchmarks.concurrency`` points ``DATABASE_URL`` at its own database.
+app = create_app(Settings(database_url=f"sqlite:///{DB_PATH}", admission_control=False))
+
+
+def seed(events: int):
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    database.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"username": f"bench-{i}", "email": f"bench-{i}@example.com",
+                                               "hashed_password": "x", "token_version": 0} for i in range(USERS)])
+        conn.execute(insert(Event.__table__), [{"title": f"Event {i}", "description": "Benchmark event",
+                                                "date_time": datetime(2030, 1, 1), "location": "Kadikoy",
+                                                "creator_id": i % USERS + 1} for i in range(events)])
+    sync_engine.dispose()
+
+
+def percentile(ordered, q: float):
+    return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000, 1) if ordered else None
+
+
+async def run(target, args) -> dict:
+    rng = random.Random(args.seed)
+    tokens = [authentication.create_access_token(data={"sub": f"bench-{i}", "uid": i + 1, "ver": 0})
+              for i in range(USERS)]
+    served, refused, failed, statuses = [], [], [], Counter()
+
+    async def one(client: httpx.AsyncClient, i: int):
+        headers = {"Authorization": f"Bearer {tokens[i % USERS]}"}
+        event_id = rng.randrange(args.events) + 1
+        start = time.perf_counter()
+        if rng.random() < args.write_share:
+            response = await client.post("/comments/", json={"content": "Overload", "event_id": event_id},
+                                         headers=headers)
+        else:
+            response = await client.get(f"/events/{event_id}", headers=headers)
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            served.append(elapsed)
+        elif response.status_code in (429, 503):
+            refused.append(elapsed)
+        else:
+            failed.append(elapsed)
+
+    total = int(args.rate * args.seconds)
+    transport = httpx.ASGITransport(app=target, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Warm up the identity cache, so authentication costs the same in both runs.
+        for token in tokens:
+            await client.delete("/comments/0", headers={"Authorization": f"Bearer {token}"})
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(client, i)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    served.sort()
+    refused.sort()
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "goodput": round(len(served) / elapsed, 1),
+        "served": len(served),
+        "served_p50_ms": percentile(served, 0.50),
+        "served_p99_ms": percentile(served, 0.99),
+        "served_max_ms": percentile(served, 1.0),
+        "refused": len(refused),
+        "refused_p99_ms": percentile(refused, 0.99),
+        "failed": len(failed),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=600, help="Requests sent per second.")
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--read-concurrency", type=int, default=16, help="Admission limit of reads.")
+    parser.add_argument("--write-concurrency", type=int, default=2,
+                        help="Admission limit of writes (SQLite has a single writer).")
+    parser.add_argument("--queue-timeout-ms", type=float, default=250)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    logging.getLogger("sqlalchemy").setLevel(logging.CRITICAL)
+
+    seed(args.events)
+    inject_latency(database.engine.sync_engine, args.latency_ms / 1000, driver_is_async=True)
+    # Rate limits are off (rate 0): this measures overload protection, not per-client fairness.
+    limits = {"auth": (8, 16, 0, 0), "reads": (args.read_concurrency, 4 * args.read_concurrency, 0, 0),
+              "writes": (args.write_concurrency, 8 * args.write_concurrency, 0, 0)}
+    protected = AdmissionMiddleware(app, engine=database.engine, limits=limits,
+                                    queue_timeout_ms=args.queue_timeout_ms)
+    results = {name: asyncio.run(run(target, args)) for name, target in (("unprotected", app),
+                                                                         ("admission", protected))}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'run':<13}{'requests':>9}{'goodput':>9}{'served':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'refused':>9}{'ref p99':>9}{'failed':>8}")
+    for name, r in results.items():
+        print(f"{name:<13}{r['requests']:>9}{r['goodput']:>9}{r['served']:>8}{r['served_p50_ms']!s:>9}"
+              f"{r['served_p99_ms']!s:>9}{r['served_max_ms']!s:>9}{r['refused']:>9}{r['refused_p99_ms']!s:>9}"
+              f"{r['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark for idle comment stream subscribers on one worker.
+
+Opens ``--subscribers`` Server-Sent Events streams (``GET /comments/event/{event_id}/stream``) spread over
+``--events`` events, through the whole application over in-process ASGI connections, and reports:
+
+* the time to open them and the memory each idle subscriber holds (``tracemalloc``, connection state included),
+* the CPU time the worker spends while they sit idle for ``--idle-seconds``,
+* the fan-out latency of one comment: from ``POST /comments/`` until every subscriber of its event received it.
+
+Usage:
+    python -m benchmarks.stream --subscribers 10000 --events 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "stream.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ADMISSION_CONTROL"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from app.models import Event, User
+from app.services import authentication, database
+from app.services.pubsub import comment_hub
+from main import app
+
+
+def seed(events: int):
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    database.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"username": "bench", "email": "bench@example.com",
+                                               "hashed_password": "x", "token_version": 0}])
+        conn.execute(insert(Event.__table__), [{"title": f"Event {i}", "description": "Benchmark event",
+                                                "date_time": datetime(2030, 1, 1), "location": "Kadikoy",
+                                                "creator_id": 1} for i in range(events)])
+    sync_engine.dispose()
+
+
+class Subscriber:
+    """One SSE connection driven by hand, noting when it is subscribed and when it receives a comment."""
+
+    def __init__(self, event_id: int):
+        self.event_id = event_id
+        self.subscribed = asyncio.Event()
+        self.received = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        path = f"/comments/event/{event_id}/stream"
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+                 "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 5000), "server": ("bench", 80)}
+        self.task = asyncio.create_task(app(scope, self.receive, self.send))
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        body = message.get("body", b"")
+        if b"stream.subscribed" in body:
+            self.subscribed.set()
+        elif b"comment.created" in body:
+            self.received.set()
+
+
+async def run(args) -> dict:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    subscribers = [Subscriber(i % args.events + 1) for i in range(args.subscribers)]
+    await asyncio.gather(*(subscriber.subscribed.wait() for subscriber in subscribers))
+    open_seconds = time.perf_counter() - start
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - baseline) / args.subscribers
+    tracemalloc.stop()
+    assert comment_hub.subscriber_count == args.subscribers
+
+    cpu_start = time.process_time()
+    await asyncio.sleep(args.idle_seconds)
+    idle_cpu = time.process_time() - cpu_start
+
+    token = authentication.create_access_token(data={"sub": "bench", "uid": 1, "ver": 0})
+    audience = [subscriber for subscriber in subscribers if subscriber.event_id == 1]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        response = await client.post("/comments/", json={"content": "Fan-out", "event_id": 1},
+                                     headers={"Authorization": f"Bearer {token}"})
+        await asyncio.gather(*(subscriber.received.wait() for subscriber in audience))
+        fanout_seconds = time.perf_counter() - start
+    assert response.status_code == 200
+
+    for subscriber in subscribers:
+        subscriber.disconnected.set()
+    await asyncio.gather(*(subscriber.task for subscriber in subscribers))
+    return {
+        "subscribers": args.subscribers,
+        "open_seconds": round(open_seconds, 2),
+        "kib_per_subscriber": round(per_subscriber / 1024, 1),
+        "idle_cpu_percent": round(idle_cpu / args.idle_seconds * 100, 1),
+        "fanout_subscribers": len(audience),
+        "fanout_ms": round(fanout_seconds * 1000, 1),
+        "subscribers_left": comment_hub.subscriber_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=10, help="Events the subscribers are spread over.")
+    parser.add_argument("--idle-seconds", type=float, default=3)
+    args = parser.parse_args()
+    logging.getLogger("app").setLevel(logging.ERROR)  # Opening thousands of streams at once trips the slow query log
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    seed(args.events)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
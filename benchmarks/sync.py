@@ -0,0 +1,122 @@
+"""
+Benchmark for the incremental change feed (``GET /sync/changes``) of offline-first clients.
+
+Seeds a SQLite database with ``--rows`` users, events and comments, each with its change log entry, and follows the
+feed from token 0 through the whole application (a full resync). It then updates ``--changed`` events
+``--edits`` times each, adds and deletes as many comments, and follows the feed again from the token of the first
+sync (a delta resync). It reports, for both, the requests, response bytes and wall time, and then the size of the
+change log before and after ``compact_changes``.
+
+Usage:
+    python -m benchmarks.sync --rows 10000 --changed 100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cep-bench-"), "sync.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ADMISSION_CONTROL"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx
+from sqlalchemy import create_engine, func, insert, select
+
+from app.models import Change, Comment, Event, User
+from app.schemas.comment import CommentCreate
+from app.schemas.event import EventUpdate
+from app.services import authentication, changes, crud_comment, crud_event, database
+from main import app
+
+
+def seed(rows: int):
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    database.Base.metadata.create_all(sync_engine)
+    start = datetime(2030, 1, 1, 19, 0)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"username": f"bench-{i}", "email": f"bench-{i}@example.com",
+                                               "hashed_password": "x", "token_version": 0} for i in range(rows)])
+        conn.execute(insert(Event.__table__), [{"title": f"Event {i}", "description": "Benchmark event " * 4,
+                                                "date_time": start + timedelta(hours=i), "location": "Kadikoy",
+                                                "creator_id": i % rows + 1, "comment_count": 1} for i in range(rows)])
+        conn.execute(insert(Comment.__table__), [{"content": f"Comment {i}", "event_id": i + 1,
+                                                  "user_id": i % rows + 1} for i in range(rows)])
+        conn.execute(insert(Change.__table__), [{"entity": entity, "entity_id": i + 1, "deleted": False,
+                                                 "changed_at": database.utcnow()}
+                                                for entity in ("user", "event", "comment") for i in range(rows)])
+    sync_engine.dispose()
+
+
+async def follow(client: httpx.AsyncClient, headers: dict, since: int) -> dict:
+    requests = received = changed = 0
+    params = {"limit": changes.MAX_CHANGES_PAGE}
+    start = time.perf_counter()
+    while True:
+        response = await client.get("/sync/changes", params={**params, "since": since}, headers=headers)
+        page = response.json()
+        requests += 1
+        received += len(response.content)
+        changed += len(page["changes"])
+        since, params["horizon"] = page["next_token"], page["horizon"]
+        if not page["has_more"]:
+            break
+    return {"requests": requests, "changes": changed, "kib": round(received / 1024, 1),
+            "ms": round((time.perf_counter() - start) * 1000, 1), "token": since}
+
+
+async def write_changes(count: int, edits: int):
+    async with database.SessionLocal() as db:
+        for event_id in range(1, count + 1):
+            for edit in range(edits):
+                await crud_event.update_event(db, event_id, EventUpdate(
+                    title=f"Event {event_id} edit {edit}", date_time=datetime(2030, 6, 1), location="Moda"))
+            await crud_comment.create_comment(db, CommentCreate(content="New", event_id=event_id), user_id=1)
+            # The seeded comment on event N is comment N, by user N.
+            await crud_comment.delete_comment(db, comment_id=event_id, user_id=event_id)
+
+
+async def log_size() -> int:
+    async with database.SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Change))
+
+
+async def run(args) -> dict:
+    token = authentication.create_access_token(data={"sub": "bench-0", "uid": 1, "ver": 0})
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        full = await follow(client, headers, 0)
+        await write_changes(args.changed, args.edits)
+        delta = await follow(client, headers, full.pop("token"))
+        delta.pop("token")
+    before = await log_size()
+    async with database.SessionLocal() as db:
+        start = time.perf_counter()
+        compacted = await changes.compact_changes(db)
+        compaction_ms = round((time.perf_counter() - start) * 1000, 1)
+    return {"rows_per_table": args.rows, "full_resync": full, "delta_resync": delta,
+            "log_entries": {"before_compaction": before, "after_compaction": await log_size(),
+                            "compaction_ms": compaction_ms, **compacted}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--changed", type=int, default=100, help="Events updated between the two syncs.")
+    parser.add_argument("--edits", type=int, default=3, help="Updates per changed event.")
+    args = parser.parse_args()
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    seed(args.rows)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
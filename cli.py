@@ -0,0 +1,97 @@
+"""
+Command line entry point for maintenance tasks that run against the configured ``DATABASE_URL``.
+
+Usage:
+    python cli.py export events > events.ndjson
+    python cli.py export users --output users.ndjson
+    python cli.py import users users.csv --state-dir import-state
+    python cli.py repair-comment-counts
+    python cli.py compact-changes
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Optional
+
+from app.services import changes, crud_event, importer
+from app.services.database import SessionLocal
+from app.services.export import ExportTable, export_ndjson
+from app.services.hashing import password_hasher
+from app.settings import Settings
+from main import configure
+
+
+async def export(table: ExportTable, output):
+    async for chunk in export_ndjson(table):
+        output.write(chunk)
+
+
+async def run_import(table: str, path: str, fmt: str, state_dir: str, batch_size: int):
+    def progress(checkpoint):
+        print(f"{table}: {checkpoint['position']} records read, {checkpoint['imported']} imported, "
+              f"{checkpoint['rejected']} rejected", file=sys.stderr)
+
+    try:
+        return await importer.import_file(table, path, fmt=fmt, state_dir=state_dir, batch_size=batch_size,
+                                          progress=progress)
+    finally:
+        password_hasher.shutdown()
+
+
+async def repair_comment_counts():
+    async with SessionLocal() as db:
+        return await crud_event.repair_comment_counts(db)
+
+
+async def compact_changes(retention_days: Optional[float]):
+    async with SessionLocal() as db:
+        return await changes.compact_changes(db, retention_days=retention_days)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Stream a table as NDJSON, one JSON object per line.")
+    export_parser.add_argument("table", choices=[table.value for table in ExportTable])
+    export_parser.add_argument("--output", "-o", help="File to write to (default: standard output).")
+
+    import_parser = commands.add_parser("import", help="Bulk load a CSV or NDJSON file, resuming from a checkpoint.",
+                                        description=importer.__doc__,
+                                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    import_parser.add_argument("table", choices=list(importer.IMPORTS))
+    import_parser.add_argument("path", help="The CSV or NDJSON file to import.")
+    import_parser.add_argument("--format", choices=importer.IMPORT_FORMATS,
+                               help="The file format (default: guessed from the extension).")
+    import_parser.add_argument("--state-dir", default="import-state",
+                               help="Where the checkpoint, ID maps and rejected records are kept.")
+    import_parser.add_argument("--batch-size", type=int, default=importer.IMPORT_BATCH_SIZE)
+
+    commands.add_parser("repair-comment-counts",
+                        help="Recompute the events' comment counts where they disagree with the comments table.")
+
+    compact_parser = commands.add_parser("compact-changes",
+                                         help="Drop superseded change log entries and purge old tombstones.")
+    compact_parser.add_argument("--retention-days", type=float,
+                                help="Age after which tombstones are purged (default: SYNC_TOMBSTONE_RETENTION_DAYS).")
+
+    args = parser.parse_args(argv)
+    configure(Settings.from_env())
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                asyncio.run(export(ExportTable(args.table), output))
+        else:
+            asyncio.run(export(ExportTable(args.table), sys.stdout))
+    elif args.command == "import":
+        result = asyncio.run(run_import(args.table, args.path, args.format, args.state_dir, args.batch_size))
+        print(json.dumps({key: result[key] for key in ("position", "imported", "rejected")}))
+    elif args.command == "repair-comment-counts":
+        print(json.dumps({"repaired": asyncio.run(repair_comment_counts())}))
+    elif args.command == "compact-changes":
+        print(json.dumps(asyncio.run(compact_changes(args.retention_days))))
+
+
+if __name__ == "__main__":
+    main()
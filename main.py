@@ -1,18 +1,98 @@
-import uvicorn
+import logging
+from typing import Optional
 from fastapi import FastAPI
-from app.routes import user_routes, event_routes, comment_routes
+from fastapi.responses import PlainTextResponse
+from app.routes import user_routes, event_routes, comment_routes, export_routes, sync_routes
+from app.services.hashing import password_hasher
+from app.services.cache import read_cache
+from app.services import admission, cache, database, metrics, pubsub, query_stats
+from app.settings import Settings
 
-app = FastAPI()
-app.include_router(user_routes.router)
-app.include_router(event_routes.router)
-app.include_router(comment_routes.router)
-@app.get("/")
-async def root():
-    return {"message": "Hello World"}
+
+def instrument_engine(engine, name: str):
+    metrics.instrument_engine(engine, prefix="db_pool" if name == "primary" else f"db_{name}_pool")
+    query_stats.instrument_engine(engine, slow_query_ms=database.get_settings().slow_query_ms)
+
+
+def configure(settings: Settings):
+    """
+        Hand the settings to the service modules, which read nothing from the environment themselves.
+
+        Args:
+            settings (Settings): The application settings.
+    """
+    database.configure(settings)
+    cache.configure(settings)
+    password_hasher.configure(settings)
+    pubsub.comment_hub.configure(settings)
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+        Build the application.
+
+        Building it has no side effects on the database: the engine is created (and instrumented) when the first
+        request needs it, and tables are only created at startup when ``settings.create_tables`` is set.
+
+        Args:
+            settings (Optional[Settings], optional): The settings; read from the environment by default.
+
+        Returns:
+            FastAPI: The application.
+    """
+    settings = settings or Settings.from_env()
+    logging.basicConfig(level=settings.log_level)
+    configure(settings)
+    database.on_engine_created(instrument_engine)
+
+    app = FastAPI()
+    app.state.settings = settings
+    if settings.admission_control:
+        app.add_middleware(admission.AdmissionMiddleware, engine=database.get_engine, limits=settings.admission_limits,
+                           queue_timeout_ms=settings.admission_queue_timeout_ms,
+                           max_pool_wait_ms=settings.admission_max_pool_wait_ms)
+    app.add_middleware(query_stats.QueryStatsMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(user_routes.router)
+    app.include_router(event_routes.router)
+    app.include_router(comment_routes.router)
+    app.include_router(export_routes.router)
+    app.include_router(sync_routes.router)
+
+    @app.on_event("startup")
+    async def startup():
+        if settings.create_tables:
+            await database.init_db()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        password_hasher.shutdown()
+
+    @app.get("/")
+    async def root():
+        return {"message": "Hello World"}
+
+    @app.get("/cache/stats")
+    async def cache_stats():
+        return read_cache.stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+def __getattr__(name: str):
+    # ``main:app`` (uvicorn, the tests) builds the application on first access rather than on import.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=3000)
+    import uvicorn
 
-#
-#
+    uvicorn.run(create_app(), host="127.0.0.1", port=3000)
@@ -0,0 +1,32 @@
+"""index the foreign keys and event dates used by listings and cascade deletes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-01-29 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (event_id, id) also serves plain event_id lookups, so comments.event_id needs no index of its own.
+    op.create_index('ix_comments_event_id_id', 'comments', ['event_id', 'id'])
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'])
+    op.create_index('ix_events_creator_id', 'events', ['creator_id'])
+    op.create_index('ix_events_date_time', 'events', ['date_time'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_date_time', table_name='events')
+    op.drop_index('ix_events_creator_id', table_name='events')
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_event_id_id', table_name='comments')
@@ -0,0 +1,34 @@
+"""composite indexes for time window, location and creator event filters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-02-05 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The composites keep date_time and creator_id as their leading columns, so they replace the single-column indexes.
+    op.create_index('ix_events_date_time_id', 'events', ['date_time', 'id'])
+    op.create_index('ix_events_location_date_time_id', 'events', ['location', 'date_time', 'id'])
+    op.create_index('ix_events_creator_id_date_time_id', 'events', ['creator_id', 'date_time', 'id'])
+    op.drop_index('ix_events_date_time', table_name='events')
+    op.drop_index('ix_events_creator_id', table_name='events')
+
+
+def downgrade() -> None:
+    op.create_index('ix_events_creator_id', 'events', ['creator_id'])
+    op.create_index('ix_events_date_time', 'events', ['date_time'])
+    op.drop_index('ix_events_creator_id_date_time_id', table_name='events')
+    op.drop_index('ix_events_location_date_time_id', table_name='events')
+    op.drop_index('ix_events_date_time_id', table_name='events')
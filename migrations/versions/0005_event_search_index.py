@@ -0,0 +1,65 @@
+"""full-text search index over event titles and descriptions
+
+PostgreSQL gets a generated tsvector column with a GIN index; SQLite gets an external-content FTS5 table kept in
+sync by triggers. Both are filled from the existing rows.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-02-12 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("""
+            ALTER TABLE events ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_events_search_vector ON events USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE events_fts USING fts5(title, description, content='events', content_rowid='id')")
+        op.execute("""
+            CREATE TRIGGER events_fts_insert AFTER INSERT ON events BEGIN
+                INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER events_fts_delete AFTER DELETE ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER events_fts_update AFTER UPDATE OF title, description ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+        op.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX ix_events_search_vector")
+        op.execute("ALTER TABLE events DROP COLUMN search_vector")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER events_fts_update")
+        op.execute("DROP TRIGGER events_fts_delete")
+        op.execute("DROP TRIGGER events_fts_insert")
+        op.execute("DROP TABLE events_fts")
@@ -0,0 +1,33 @@
+"""optional event coordinates with a grid-cell spatial index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-02-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('events', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('events', sa.Column('geo_cell', sa.Integer(), nullable=True))
+    op.create_index('ix_events_geo_cell', 'events', ['geo_cell', 'latitude', 'longitude'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_geo_cell', table_name='events')
+    # Plain ALTER TABLE ... DROP COLUMN (SQLite >= 3.35): a batch table copy would drop the search triggers.
+    op.drop_column('events', 'geo_cell')
+    op.drop_column('events', 'longitude')
+    op.drop_column('events', 'latitude')
@@ -0,0 +1,37 @@
+"""updated_at timestamps on events and comments for conditional GET
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-02-26 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in ('events', 'comments'):
+        if sqlite:
+            # SQLite cannot ADD COLUMN with a non-constant default, and a batch table copy of events would drop the
+            # search triggers: add the column with a constant default and stamp the existing rows afterwards. The
+            # application always sets updated_at itself.
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                           server_default=sa.text("'1970-01-01 00:00:00.000000'")))
+            op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        else:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+
+
+def downgrade() -> None:
+    op.drop_column('comments', 'updated_at')
+    op.drop_column('events', 'updated_at')
@@ -0,0 +1,42 @@
+"""denormalized comment count and last activity on events
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-03-04 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    if op.get_bind().dialect.name == 'sqlite':
+        # Constant default, see 0007.
+        last_activity_default = sa.text("'1970-01-01 00:00:00.000000'")
+    else:
+        last_activity_default = sa.func.now()
+    op.add_column('events', sa.Column('last_activity_at', sa.DateTime(), nullable=False,
+                                      server_default=last_activity_default))
+    op.execute("""
+        UPDATE events SET
+            comment_count = (SELECT count(*) FROM comments WHERE comments.event_id = events.id),
+            last_activity_at = coalesce((SELECT max(comments.updated_at) FROM comments
+                                         WHERE comments.event_id = events.id), events.updated_at)
+    """)
+    op.create_index('ix_events_comment_count_activity_id', 'events', ['comment_count', 'last_activity_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_comment_count_activity_id', table_name='events')
+    op.drop_column('events', 'last_activity_at')
+    op.drop_column('events', 'comment_count')
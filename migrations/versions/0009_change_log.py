@@ -0,0 +1,55 @@
+"""change log feeding the incremental sync endpoint
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-03-11 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_changes_entity_entity_id_id', 'changes', ['entity', 'entity_id', 'id'])
+    op.create_index('ix_changes_deleted_changed_at', 'changes', ['deleted', 'changed_at'])
+    op.create_table(
+        'change_compactions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('compacted_at', sa.DateTime(), nullable=False),
+        sa.Column('horizon', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Rows written before the log existed get an entry each, so syncing from token 0 lists every row.
+    changes = sa.table('changes', sa.column('entity'), sa.column('entity_id'), sa.column('deleted'),
+                       sa.column('changed_at'))
+    for entity, name in (('user', 'users'), ('event', 'events'), ('comment', 'comments')):
+        source = sa.table(name, sa.column('id'))
+        rows = (sa.select(sa.literal(entity), source.c.id, sa.false(), sa.func.current_timestamp())
+                .order_by(source.c.id))
+        op.execute(changes.insert().from_select(['entity', 'entity_id', 'deleted', 'changed_at'], rows))
+
+
+def downgrade() -> None:
+    op.drop_table('change_compactions')
+    op.drop_index('ix_changes_deleted_changed_at', table_name='changes')
+    op.drop_index('ix_changes_entity_entity_id_id', table_name='changes')
+    op.drop_table('changes')